@@ -1,7 +1,16 @@
 import os
+from functools import lru_cache
 from langchain_openai import ChatOpenAI
 from .models import ProductSearchPreferences
 
+@lru_cache(maxsize=8)
+def get_llm(api_key: str, temperature: float) -> ChatOpenAI:
+    """
+    Shared ChatOpenAI client per (key, temperature), so its HTTP connection
+    pool is reused across requests instead of rebuilt on every call.
+    """
+    return ChatOpenAI(model="gpt-4o-mini", temperature=temperature, api_key=api_key)
+
 def analyze_prompt(prompt: str) -> ProductSearchPreferences:
     """
     Uses OpenAI to parse a natural language prompt into structured search preferences.
@@ -10,7 +19,7 @@ def analyze_prompt(prompt: str) -> ProductSearchPreferences:
     if not api_key:
         raise ValueError("OPENAI_API_KEY not found in environment variables.")
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key=api_key)
+    llm = get_llm(api_key, 0)
     
     # Structured output using Pydantic
     structured_llm = llm.with_structured_output(ProductSearchPreferences)
@@ -52,7 +61,7 @@ def generate_quick_notes(products: list) -> str:
             "Do not mention specific product names in the bullets if possible, focus on the range of options available."
         )
 
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, api_key=api_key)
+        llm = get_llm(api_key, 0.7)
         response = llm.invoke(prompt)
         return response.content
     except Exception as e:
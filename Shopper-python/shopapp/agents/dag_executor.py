@@ -0,0 +1,138 @@
+import asyncio
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+
+class Node:
+    """
+    One step of an agent pipeline.
+
+    `func` receives the declared inputs as keyword arguments and returns the
+    value of its single output, or a dict keyed by output name when it
+    declares several. Sync functions run in a worker thread so they never
+    block the event loop. On timeout or error, `fallback` (same signature) is
+    used instead; without one the error propagates.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        inputs: Sequence[str] = (),
+        outputs: Sequence[str] = (),
+        timeout: Optional[float] = None,
+        fallback: Optional[Callable[..., Any]] = None,
+    ):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs) or [name]
+        self.timeout = timeout
+        self.fallback = fallback
+
+
+class DAGExecutionError(RuntimeError):
+    """A node failed without a working fallback, or the graph cannot make progress"""
+
+
+class DAGExecutor:
+    """
+    Runs a dependency graph of nodes, starting each one as soon as all of
+    its inputs exist.
+
+    Independent nodes run concurrently, so a node that only needs the
+    intent (e.g. a speculative scrape of the refined query) overlaps with
+    slower siblings (e.g. gift ideation). Every node is timed.
+    """
+
+    def __init__(self, nodes: List[Node]):
+        self.nodes = nodes
+        produced = {}
+        for node in nodes:
+            for output in node.outputs:
+                if output in produced:
+                    raise ValueError(f"Output '{output}' produced by both {produced[output]} and {node.name}")
+                produced[output] = node.name
+        self.timings: Dict[str, Dict[str, Any]] = {}
+
+    async def run(self, initial: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute the graph; returns every value produced (including `initial`)"""
+        values = dict(initial)
+        pending = {node.name: node for node in self.nodes}
+        running: Dict[asyncio.Task, Node] = {}
+        self.timings = {}
+        started_at = time.perf_counter()
+
+        def start_ready_nodes():
+            for name, node in list(pending.items()):
+                if all(key in values for key in node.inputs):
+                    del pending[name]
+                    task = asyncio.create_task(self._run_node(node, values, started_at))
+                    running[task] = node
+
+        start_ready_nodes()
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    node = running.pop(task)
+                    values.update(self._outputs_of(node, task.result()))
+                start_ready_nodes()
+        finally:
+            for task in running:
+                task.cancel()
+
+        if pending:
+            missing = {name: [k for k in node.inputs if k not in values] for name, node in pending.items()}
+            raise DAGExecutionError(f"Nodes never became ready: {missing}")
+
+        return values
+
+    async def _run_node(self, node: Node, values: Dict[str, Any], started_at: float) -> Any:
+        kwargs = {key: values[key] for key in node.inputs}
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            result = await self._call(node.func, kwargs, node.timeout)
+        except Exception as e:
+            if node.fallback is None:
+                self._record(node, start, started_at, f"error: {type(e).__name__}")
+                raise DAGExecutionError(f"Node '{node.name}' failed: {e}") from e
+            status = "timeout" if isinstance(e, asyncio.TimeoutError) else f"fallback: {type(e).__name__}"
+            print(f"[DAG] {node.name} {status}, using fallback")
+            try:
+                result = await self._call(node.fallback, kwargs, None)
+            except Exception as fallback_error:
+                self._record(node, start, started_at, f"fallback error: {type(fallback_error).__name__}")
+                raise DAGExecutionError(
+                    f"Node '{node.name}' failed ({e}) and its fallback failed: {fallback_error}"
+                ) from fallback_error
+
+        self._record(node, start, started_at, status)
+        return result
+
+    async def _call(self, func: Callable[..., Any], kwargs: Dict[str, Any], timeout: Optional[float]) -> Any:
+        if inspect.iscoroutinefunction(func):
+            awaitable: Awaitable = func(**kwargs)
+        else:
+            awaitable = asyncio.to_thread(func, **kwargs)
+        if timeout is None:
+            return await awaitable
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+
+    def _outputs_of(self, node: Node, result: Any) -> Dict[str, Any]:
+        if len(node.outputs) == 1:
+            return {node.outputs[0]: result}
+        if not isinstance(result, dict) or not all(k in result for k in node.outputs):
+            raise DAGExecutionError(f"Node '{node.name}' must return a dict with keys {node.outputs}")
+        return {key: result[key] for key in node.outputs}
+
+    def _record(self, node: Node, start: float, started_at: float, status: str) -> None:
+        end = time.perf_counter()
+        self.timings[node.name] = {
+            "start_s": round(start - started_at, 3),
+            "duration_s": round(end - start, 3),
+            "status": status,
+        }
+        print(f"[DAG] {node.name}: {end - start:.3f}s ({status})")
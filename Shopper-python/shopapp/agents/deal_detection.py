@@ -1,5 +1,9 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import statistics
+import numpy as np
+
+from .market_analysis import MarketSnapshot
+from ..price_history import PriceHistoryStore
 
 class DealDetectionAgent:
     """
@@ -11,133 +15,156 @@ class DealDetectionAgent:
     - Flag best value products
     - Detect pricing anomalies
     - Calculate savings potential
+    - Compare current prices against each listing's price history
     """
 
-    def analyze_deals(self, products: List[Any], location: str) -> Dict[int, Dict[str, Any]]:
+    # Observations needed before history overrides the current-results comparison
+    MIN_HISTORY_POINTS = 3
+
+    def __init__(self, history: Optional[PriceHistoryStore] = None):
+        self.history = history
+
+    def analyze_deals(
+        self,
+        products: List[Any],
+        location: str,
+        snapshot: Optional[MarketSnapshot] = None
+    ) -> Dict[int, Dict[str, Any]]:
         """
         Analyze all products for deals and value
 
+        Prices are parsed once into the shared snapshot and the percentile,
+        savings and value scores are computed as arrays. Each product is
+        compared against its title cluster, not the whole candidate list.
+        With a price history store, listings with enough past observations
+        are also judged against their own historical low and median.
+
         Returns dict mapping product index to deal data
         """
         if not products:
             return {}
 
-        # Extract prices for analysis
-        prices = []
-        for prod in products:
-            try:
-                if prod.price is not None:
-                    price_val = float(prod.price)
-                    if price_val > 0:  # Only include positive prices
-                        prices.append(price_val)
-            except (ValueError, TypeError, AttributeError):
-                pass
-
-        if not prices:
+        snap = snapshot or MarketSnapshot(products)
+        if not snap.priced.any():
             return {}
 
-        # Calculate price statistics
-        avg_price = statistics.mean(prices)
-        median_price = statistics.median(prices)
-        min_price = min(prices)
-        max_price = max(prices)
-
         currency = "₹" if location.lower() == "india" else "$"
 
-        results = {}
-        for idx, product in enumerate(products):
-            try:
-                price = float(product.price) if product.price is not None else 0.0
-            except (ValueError, TypeError, AttributeError):
-                price = 0.0
+        prices = snap.prices
+        ratings = snap.ratings
+        avg_price = snap.ref_avg
+        median_price = snap.ref_median
+        min_price = snap.ref_min
+        max_price = snap.ref_max
+
+        # Where the price falls in the range (0-100), inverted so lower price = higher percentile
+        price_range = max_price - min_price
+        flat_range = price_range == 0
+        percentile = np.where(
+            flat_range,
+            50.0,
+            100 - (prices - min_price) / np.where(flat_range, 1, price_range) * 100
+        )
 
-            if price <= 0:
-                continue
+        savings_vs_avg = avg_price - prices
+        savings_percent = np.divide(
+            savings_vs_avg, avg_price, out=np.zeros(snap.size), where=avg_price > 0
+        ) * 100
 
-            # Calculate deal score
-            deal_analysis = self._analyze_single_product(
-                price, avg_price, median_price, min_price, max_price,
-                product, currency
-            )
+        # Value score: (price_percentile * 0.6) + (rating/5 * 100 * 0.4)
+        value_score = np.where(
+            ratings == 0,
+            percentile * 0.8,
+            (percentile * 0.6) + ((ratings / 5.0) * 100 * 0.4)
+        )
+        # "Lowest price" only means something when there is another comparable listing
+        is_lowest = (prices == min_price) & (snap.comparable_counts > 1)
+
+        # Plain Python lists for the per-product assembly below
+        price_list = prices.tolist()
+        rating_list = ratings.tolist()
+        percentile_list = percentile.tolist()
+        savings_list = savings_vs_avg.tolist()
+        savings_percent_list = savings_percent.tolist()
+        value_list = value_score.tolist()
+        lowest_list = is_lowest.tolist()
+
+        history = self._history_stats(products)
 
-            results[idx] = deal_analysis
+        results = {}
+        for idx in np.flatnonzero(snap.priced).tolist():
+            price_percentile = percentile_list[idx]
+            savings_percent_avg = savings_percent_list[idx]
+            rating = rating_list[idx]
+            value = value_list[idx]
+            lowest = lowest_list[idx]
+
+            hist = history.get(idx)
+            # Savings against the listing's own typical price beat savings against neighbours
+            deal_savings = hist["savings_percent"] if hist else savings_percent_avg
+
+            deal_quality = self._determine_deal_quality(price_percentile, deal_savings)
+            title_lower = snap.titles[idx]
+
+            results[idx] = {
+                "price": price_list[idx],
+                "currency": currency,
+                "price_percentile": round(price_percentile, 1),
+                "savings_vs_average": round(savings_list[idx], 2),
+                "savings_percent": round(savings_percent_avg, 1),
+                "deal_quality": deal_quality,
+                "value_score": round(value, 1),
+                "tags": self._generate_deal_tags(
+                    price_percentile, deal_savings, rating, lowest, hist
+                ),
+                "is_lowest_price": lowest,
+                "is_best_deal": False,
+                "deal_rank": None,
+                "price_position": self._get_price_position(price_percentile),
+                "has_discount_keyword": any(
+                    word in title_lower for word in ['sale', 'off', 'deal', 'discount', 'clearance']
+                ),
+                "recommendation": self._generate_deal_recommendation(
+                    deal_quality, value, lowest
+                ),
+                "price_history": hist
+            }
 
         # Identify best deals
         best_deals = self._identify_best_deals(results)
-        for idx in best_deals:
+        for rank, idx in enumerate(best_deals, 1):
             results[idx]["is_best_deal"] = True
-            results[idx]["deal_rank"] = best_deals.index(idx) + 1
+            results[idx]["deal_rank"] = rank
 
         return results
 
-    def _analyze_single_product(
-        self,
-        price: float,
-        avg_price: float,
-        median_price: float,
-        min_price: float,
-        max_price: float,
-        product: Any,
-        currency: str
-    ) -> Dict[str, Any]:
-        """Analyze a single product for deal potential"""
-
-        # Calculate percentile
-        price_percentile = self._calculate_percentile(price, min_price, max_price)
-
-        # Calculate savings vs average
-        savings_vs_avg = avg_price - price
-        savings_percent_avg = (savings_vs_avg / avg_price * 100) if avg_price > 0 else 0
-
-        # Calculate savings vs median
-        savings_vs_median = median_price - price
-        savings_percent_median = (savings_vs_median / median_price * 100) if median_price > 0 else 0
-
-        # Determine deal quality
-        deal_quality = self._determine_deal_quality(price_percentile, savings_percent_avg)
-
-        # Calculate value score (price + rating)
+    def _history_stats(self, products: List[Any]) -> Dict[int, Dict[str, Any]]:
+        """Historical low/median per product index, for listings with enough history"""
+        if self.history is None:
+            return {}
         try:
-            rating = float(product.rating) if product.rating is not None else 0.0
-        except (ValueError, TypeError):
-            rating = 0.0
-        value_score = self._calculate_value_score(price_percentile, rating)
-
-        # Generate deal tags
-        tags = self._generate_deal_tags(
-            price_percentile, savings_percent_avg, rating, price == min_price
-        )
-
-        # Check for potential discount indicators
-        title_lower = product.title.lower()
-        has_discount_keyword = any(word in title_lower for word in ['sale', 'off', 'deal', 'discount', 'clearance'])
-
-        return {
-            "price": price,
-            "currency": currency,
-            "price_percentile": round(price_percentile, 1),
-            "savings_vs_average": round(savings_vs_avg, 2),
-            "savings_percent": round(savings_percent_avg, 1),
-            "deal_quality": deal_quality,
-            "value_score": round(value_score, 1),
-            "tags": tags,
-            "is_lowest_price": price == min_price,
-            "is_best_deal": False,
-            "deal_rank": None,
-            "price_position": self._get_price_position(price_percentile),
-            "has_discount_keyword": has_discount_keyword,
-            "recommendation": self._generate_deal_recommendation(
-                deal_quality, value_score, price == min_price
-            )
-        }
-
-    def _calculate_percentile(self, price: float, min_price: float, max_price: float) -> float:
-        """Calculate where price falls in the range (0-100)"""
-        if max_price == min_price:
-            return 50.0
+            stats = self.history.lookup(products)
+        except Exception as e:
+            print(f"Price history lookup failed: {e}")
+            return {}
 
-        percentile = ((price - min_price) / (max_price - min_price)) * 100
-        return 100 - percentile  # Invert so lower price = higher percentile
+        results = {}
+        for idx, hist in stats.items():
+            if hist["points"] < self.MIN_HISTORY_POINTS:
+                continue
+            price = float(products[idx].price)
+            median = hist["median"]
+            results[idx] = {
+                **hist,
+                "savings_percent": round((median - price) / median * 100, 1) if median > 0 else 0.0,
+                # Ignore the observation just recorded; a price that never moved is no low
+                "is_all_time_low": (
+                    hist["low"] < hist["high"]
+                    and hist["previous_low"] is not None
+                    and price <= hist["previous_low"]
+                ),
+            }
+        return results
 
     def _determine_deal_quality(self, price_percentile: float, savings_percent: float) -> str:
         """Determine overall deal quality"""
@@ -150,30 +177,22 @@ class DealDetectionAgent:
         else:
             return "average"
 
-    def _calculate_value_score(self, price_percentile: float, rating: float) -> float:
-        """
-        Calculate value score combining price and quality
-
-        Formula: (price_percentile * 0.6) + (rating/5 * 100 * 0.4)
-        """
-        if rating == 0:
-            return price_percentile * 0.8
-
-        rating_score = (rating / 5.0) * 100
-        value_score = (price_percentile * 0.6) + (rating_score * 0.4)
-
-        return value_score
-
     def _generate_deal_tags(
         self,
         price_percentile: float,
         savings_percent: float,
         rating: float,
-        is_lowest: bool
+        is_lowest: bool,
+        history: Optional[Dict[str, Any]] = None
     ) -> List[str]:
         """Generate descriptive tags for the deal"""
         tags = []
 
+        if history and history["is_all_time_low"]:
+            tags.append("All-Time Low")
+        elif history and history["savings_percent"] >= 10:
+            tags.append("Below Usual Price")
+
         if is_lowest:
             tags.append("Lowest Price")
 
@@ -0,0 +1,215 @@
+import re
+from typing import List, Dict, Any, Set
+
+from ..models import Offer
+from ..utils.title_clustering import STOPWORDS
+
+
+class EntityResolutionAgent:
+    """
+    Entity Resolution Agent
+
+    Responsibilities:
+    - Detect the same product listed on several marketplaces
+    - Merge duplicates into one product carrying per-marketplace offers
+    - Surface the best price across stores
+
+    Candidate pairs come from cheap blocking keys (model numbers, brand +
+    leading title words); only pairs sharing a block get the finer title
+    similarity check, so the cost stays close to linear in the number of
+    scraped products.
+    """
+
+    # Minimum Jaccard similarity of title tokens for listings to be one product
+    MIN_TITLE_SIMILARITY = 0.6
+    # A shared model number is strong evidence; titles only need to be loosely similar
+    MIN_MODEL_TITLE_SIMILARITY = 0.3
+    # The same item rarely costs more than twice as much on another store
+    MAX_PRICE_RATIO = 2.0
+    # Blocks larger than this are too generic to be useful (e.g. "samsung")
+    MAX_BLOCK_SIZE = 40
+
+    _TOKEN_RE = re.compile(r"[a-z0-9]+")
+    _HYPHEN_RE = re.compile(r"(?<=[a-z0-9])-(?=[a-z0-9])")
+    # Quantities look like model numbers but are not ("16gb", "6mm", "5000mah")
+    _UNIT_RE = re.compile(r"^\d+(?:gb|tb|mb|mm|cm|m|inch|in|w|mah|hz|khz|l|ml|kg|g|pcs|pc|x)$")
+    # Tier words name a different model of the same line ("iPhone 15" vs "iPhone 15 Pro")
+    VARIANT_TOKENS = {
+        "pro", "max", "plus", "ultra", "mini", "lite", "se", "xl", "xs", "xr",
+        "air", "slim", "fe", "neo",
+    }
+
+    def resolve(self, products: List[Any]) -> List[Any]:
+        """
+        Merge duplicate listings across marketplaces
+
+        Returns a new list in first-seen order. Merged products are copies of
+        their cheapest listing with `offers` holding every listing (cheapest
+        first); products without duplicates are returned unchanged.
+        """
+        if len(products) < 2:
+            return list(products)
+
+        features = [self._features(prod) for prod in products]
+
+        parent = list(range(len(products)))
+        marketplaces = [{f["marketplace"]} for f in features]
+        members = [[i] for i in range(len(products))]
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in self._candidate_pairs(features):
+            root_i, root_j = find(i), find(j)
+            if root_i == root_j:
+                continue
+            # One offer per marketplace: never merge two listings from the same store
+            if marketplaces[root_i] & marketplaces[root_j]:
+                continue
+            if not self._is_match(features[i], features[j]):
+                continue
+            # Complete linkage: a vague listing must not chain two different models together
+            if not all(
+                self._compatible(features[a], features[b])
+                for a in members[root_i] for b in members[root_j]
+            ):
+                continue
+            parent[root_j] = root_i
+            marketplaces[root_i] |= marketplaces[root_j]
+            members[root_i] += members[root_j]
+
+        groups: Dict[int, List[int]] = {}
+        for idx in range(len(products)):
+            groups.setdefault(find(idx), []).append(idx)
+
+        resolved = []
+        for group in groups.values():
+            if len(group) == 1:
+                resolved.append(products[group[0]])
+            else:
+                resolved.append(self._merge([products[i] for i in group]))
+        return resolved
+
+    def _features(self, product: Any) -> Dict[str, Any]:
+        """Normalized title tokens, brand, model numbers and price of a listing"""
+        # "WH-1000XM5" and "WH1000XM5" are the same model
+        title = self._HYPHEN_RE.sub("", (getattr(product, "title", "") or "").lower())
+        tokens = [t for t in self._TOKEN_RE.findall(title) if t not in STOPWORDS]
+
+        # Model numbers mix letters and digits and are not plain quantities
+        models = {
+            t for t in tokens
+            if len(t) >= 4 and not t.isdigit() and not t.isalpha() and not self._UNIT_RE.match(t)
+        }
+
+        try:
+            price = float(product.price) if product.price is not None else 0.0
+        except (ValueError, TypeError):
+            price = 0.0
+
+        return {
+            "marketplace": (getattr(product, "marketplace", "") or "").lower(),
+            "tokens": set(tokens),
+            "numbers": {t for t in tokens if any(c.isdigit() for c in t)},
+            "variants": {t for t in tokens if t in self.VARIANT_TOKENS},
+            "brand": tokens[0] if tokens else "",
+            "leading": tokens[1:4],
+            "models": models,
+            "price": price,
+        }
+
+    def _candidate_pairs(self, features: List[Dict[str, Any]]) -> Set[tuple]:
+        """Index pairs that share at least one blocking key"""
+        blocks: Dict[str, List[int]] = {}
+        for idx, f in enumerate(features):
+            keys = {f"model:{m}" for m in f["models"]}
+            if f["brand"]:
+                keys.update(f"brand:{f['brand']}:{t}" for t in f["leading"])
+            for key in keys:
+                blocks.setdefault(key, []).append(idx)
+
+        pairs = set()
+        for members in blocks.values():
+            if len(members) < 2 or len(members) > self.MAX_BLOCK_SIZE:
+                continue
+            for a in range(len(members)):
+                for b in range(a + 1, len(members)):
+                    if features[members[a]]["marketplace"] != features[members[b]]["marketplace"]:
+                        pairs.add((members[a], members[b]))
+        return pairs
+
+    def _compatible(self, a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        """Whether two listings can be the same product (no conflicting model, tier or number)"""
+        # Different model numbers mean different products
+        if a["models"] and b["models"] and not (a["models"] & b["models"]):
+            return False
+
+        # Tier words must agree exactly: a missing "pro" is a different phone, not a shorter title
+        if a["variants"] != b["variants"]:
+            return False
+
+        # Capacity/generation numbers must agree ("128gb" vs "256gb", "15" vs "14")
+        if a["numbers"] and b["numbers"] and not (
+            a["numbers"] <= b["numbers"] or b["numbers"] <= a["numbers"]
+        ):
+            return False
+        return True
+
+    def _is_match(self, a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        """Fine similarity check for a candidate pair"""
+        if not self._compatible(a, b):
+            return False
+
+        if a["price"] and b["price"]:
+            ratio = max(a["price"], b["price"]) / min(a["price"], b["price"])
+            if ratio > self.MAX_PRICE_RATIO:
+                return False
+
+        union = a["tokens"] | b["tokens"]
+        if not union:
+            return False
+        similarity = len(a["tokens"] & b["tokens"]) / len(union)
+
+        if a["models"] & b["models"]:
+            return similarity >= self.MIN_MODEL_TITLE_SIMILARITY
+        return similarity >= self.MIN_TITLE_SIMILARITY
+
+    def _merge(self, listings: List[Any]) -> Any:
+        """Combine duplicate listings into one product with per-marketplace offers"""
+        def price_key(prod: Any) -> float:
+            try:
+                price = float(prod.price) if prod.price is not None else 0.0
+            except (ValueError, TypeError):
+                price = 0.0
+            return price if price > 0 else float("inf")
+
+        ordered = sorted(listings, key=price_key)
+        best = ordered[0]
+
+        offers = [
+            Offer(
+                marketplace=prod.marketplace,
+                url=prod.url,
+                price=prod.price,
+                currency=prod.currency,
+                rating=prod.rating,
+                rating_count=prod.rating_count,
+            )
+            for prod in ordered
+        ]
+
+        # Rating from the listing with the most reviews; fill gaps from the others
+        rated = [p for p in listings if p.rating]
+        most_reviewed = max(rated, key=lambda p: p.rating_count or 0) if rated else None
+
+        return best.model_copy(update={
+            "rating": most_reviewed.rating if most_reviewed else best.rating,
+            "rating_count": most_reviewed.rating_count if most_reviewed else best.rating_count,
+            "thumbnail_url": best.thumbnail_url or next(
+                (p.thumbnail_url for p in listings if p.thumbnail_url), None
+            ),
+            "offers": offers,
+        })
@@ -0,0 +1,95 @@
+from typing import Any, List
+import numpy as np
+
+from ..utils.title_clustering import cluster_titles
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value) if value is not None else 0.0
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _to_int(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (ValueError, TypeError):
+        return 0
+
+
+class MarketSnapshot:
+    """
+    Market Snapshot
+
+    Columnar view of a scraped candidate list, parsed once and shared by the
+    Seller Reputation and Deal Detection agents:
+    - prices, ratings and review counts as float/int arrays (0 when missing)
+    - lowercased marketplace names and titles
+    - title clusters of comparable products (MinHash/LSH over title words)
+    - per-product reference price statistics (average, median, min, max)
+      over the priced candidates in the same cluster, so a Kindle is not
+      judged against yoga mats
+    """
+
+    def __init__(self, products: List[Any]):
+        self.products = products
+        self.size = len(products)
+
+        self.prices = np.array([_to_float(getattr(p, "price", None)) for p in products], dtype=float)
+        self.ratings = np.array([_to_float(getattr(p, "rating", None)) for p in products], dtype=float)
+        self.rating_counts = np.array(
+            [_to_int(getattr(p, "rating_count", 0)) for p in products], dtype=np.int64
+        )
+        self.marketplaces = [(getattr(p, "marketplace", "") or "").lower() for p in products]
+        self.titles = [(getattr(p, "title", "") or "").lower() for p in products]
+
+        # Only positive prices take part in market statistics
+        self.priced = self.prices > 0
+
+        self.clusters = cluster_titles(self.titles)
+        # Number of priced products each product is compared against (itself included)
+        self.comparable_counts = np.zeros(self.size, dtype=np.int64)
+
+        self.ref_avg = np.zeros(self.size)
+        self.ref_median = np.zeros(self.size)
+        self.ref_min = np.zeros(self.size)
+        self.ref_max = np.zeros(self.size)
+        self._compute_reference_stats()
+
+    def _compute_reference_stats(self) -> None:
+        """Market statistics over the priced candidates of each title cluster"""
+        if not self.priced.any():
+            return
+
+        labels = self.clusters
+        num_clusters = int(labels.max()) + 1
+        priced_labels = labels[self.priced]
+        priced_prices = self.prices[self.priced]
+
+        counts = np.bincount(priced_labels, minlength=num_clusters)
+        sums = np.bincount(priced_labels, weights=priced_prices, minlength=num_clusters)
+
+        mins = np.full(num_clusters, np.inf)
+        maxs = np.full(num_clusters, -np.inf)
+        np.minimum.at(mins, priced_labels, priced_prices)
+        np.maximum.at(maxs, priced_labels, priced_prices)
+
+        # Median: sort prices within each cluster, then pick the middle element(s)
+        order = np.lexsort((priced_prices, priced_labels))
+        sorted_prices = priced_prices[order]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        has_prices = counts > 0
+        lower = starts + (counts - 1) // 2
+        upper = starts + counts // 2
+        medians = np.zeros(num_clusters)
+        medians[has_prices] = (sorted_prices[lower[has_prices]] + sorted_prices[upper[has_prices]]) / 2
+
+        # Products whose cluster has no priced member keep zero references (treated as neutral)
+        covered = has_prices[labels]
+        cluster_of = labels[covered]
+        self.comparable_counts = counts[labels]
+        self.ref_avg[covered] = sums[cluster_of] / counts[cluster_of]
+        self.ref_median[covered] = medians[cluster_of]
+        self.ref_min[covered] = mins[cluster_of]
+        self.ref_max[covered] = maxs[cluster_of]
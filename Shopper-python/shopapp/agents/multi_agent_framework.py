@@ -1,6 +1,7 @@
 import os
-import asyncio
+import time
 from typing import Dict, Any, List
+import numpy as np
 from dotenv import load_dotenv
 
 from .orchestrator import OrchestratorAgent
@@ -8,9 +9,24 @@ from .gift_ideation import GiftIdeationAgent
 from .seller_reputation import SellerReputationAgent
 from .deal_detection import DealDetectionAgent
 from .ranking import IntelligentRankingAgent
+from .entity_resolution import EntityResolutionAgent
+from .market_analysis import MarketSnapshot
+from .dag_executor import DAGExecutor, Node
+from ..scrape_scheduler import scrape_queries
+from ..scraper_runtime import load_scraper
+from ..price_history import price_history
+from ..utils.title_clustering import get_clusterer
 
 load_dotenv()
 
+# Marketplaces the deep agent scrapes per region (subset of scraper_runtime.MARKETPLACES)
+DEEP_AGENT_MARKETPLACES = {
+    "india": ["flipkart", "amazon_in"],
+    "usa": ["walmart", "target", "amazon_us"],
+}
+# One budget for all (query, marketplace) scrapes of a request, across both scrape nodes
+SCRAPE_TIME_BUDGET = 90.0
+
 class MultiAgentShoppingFramework:
     """
     Multi-Agent Shopping Framework
@@ -21,6 +37,7 @@ class MultiAgentShoppingFramework:
     1. Orchestrator + Intent Agent (merged)
     2. Gift Ideation Agent (conditional)
     3. Scraper Agent (external - uses existing scrapers)
+       + Entity Resolution Agent (merges cross-marketplace duplicates)
     4. Seller Reputation Agent
     5. Deal Detection Agent
     6. Intelligent Ranking Agent
@@ -35,202 +52,193 @@ class MultiAgentShoppingFramework:
         self.orchestrator = OrchestratorAgent(api_key)
         self.gift_agent = GiftIdeationAgent(api_key)
         self.reputation_agent = SellerReputationAgent()
-        self.deal_agent = DealDetectionAgent()
+        self.deal_agent = DealDetectionAgent(history=price_history)
+        self.entity_agent = EntityResolutionAgent()
         self.ranking_agent = IntelligentRankingAgent(api_key)
 
+    def warm_up(self) -> None:
+        """
+        Load everything a first request would otherwise pay for: scraper
+        modules (and Playwright) for every region, and the title clusterer
+        """
+        for marketplaces in DEEP_AGENT_MARKETPLACES.values():
+            for marketplace in marketplaces:
+                load_scraper(marketplace)
+        get_clusterer()
+
     async def process_shopping_request(
         self,
         user_query: str,
         location: str = "india"
     ) -> Dict[str, Any]:
         """
-        Main processing pipeline
-
-        Phase 1: Intent Analysis & Planning (parallel)
-        Phase 2: Product Scraping (parallel with gift ideation if needed)
-        Phase 3: Analysis (seller reputation + deal detection)
-        Phase 4: Ranking & Formatting
+        Main processing pipeline, run as a dependency graph
+
+        Each step starts as soon as its inputs are ready:
+        - intent -> plan -> search queries (gift ideation when needed)
+        - intent -> speculative scrape of the refined query (overlaps ideation)
+        - search queries -> scrape of the remaining gift ideas
+        - both scrapes -> entity resolution -> analysis -> risk filter
+          -> ranking -> response
         """
         print(f"\n=== Multi-Agent Framework Processing ===")
         print(f"Query: {user_query}")
         print(f"Location: {location}")
 
-        # PHASE 1: Intent Analysis
-        print("\n[Phase 1] Analyzing intent...")
-        intent_data = self.orchestrator.analyze_intent(user_query, location)
-        print(f"Intent: {intent_data['routing']['query_type']}")
-        print(f"Needs gift ideation: {intent_data['routing']['needs_gift_ideation']}")
+        executor = DAGExecutor(self._build_graph())
+        values = await executor.run({"user_query": user_query, "location": location})
+
+        response = values["response"]
+        response.setdefault("agent_metadata", {})["timings"] = executor.timings
+        return response
+
+    def _build_graph(self) -> List[Node]:
+        """Nodes of the shopping pipeline with their inputs, outputs, timeouts and fallbacks"""
+
+        def analyze_intent(user_query, location):
+            print("\n[Intent] Analyzing intent...")
+            intent_data = self.orchestrator.analyze_intent(user_query, location)
+            print(f"Intent: {intent_data['routing']['query_type']}")
+            print(f"Needs gift ideation: {intent_data['routing']['needs_gift_ideation']}")
+            return intent_data
+
+        def plan(intent_data):
+            return self.orchestrator.plan_execution(intent_data)
 
-        # PHASE 2: Product Discovery
-        print("\n[Phase 2] Product discovery...")
+        # Both scrape nodes share one budget, counted from the first scrape's start
+        scrape_deadline: List[float] = []
 
-        search_queries = []
-        if intent_data['routing']['needs_gift_ideation']:
+        def scrape_budget_left() -> float:
+            if not scrape_deadline:
+                scrape_deadline.append(time.monotonic() + SCRAPE_TIME_BUDGET)
+            return max(0.0, scrape_deadline[0] - time.monotonic())
+
+        def refined_query(intent_data, user_query):
+            return intent_data.get("understanding", {}).get("refined_query") or user_query
+
+        def search_queries(user_query, intent_data, plan, location):
+            if "gift_ideation_agent" not in plan.get("phase_1_parallel", []):
+                return [refined_query(intent_data, user_query)]
             print("Running Gift Ideation Agent...")
-            gift_queries = self.gift_agent.generate_gift_ideas(
-                user_query, intent_data, location
+            gift_queries = self.gift_agent.generate_gift_ideas(user_query, intent_data, location)
+            print(f"Generated {len(gift_queries)} gift ideas: {gift_queries}")
+            return gift_queries
+
+        def search_queries_fallback(user_query, intent_data, plan, location):
+            return [refined_query(intent_data, user_query)]
+
+        async def speculative_scrape(user_query, intent_data, location):
+            # Starts right after intent analysis, while gift ideation may still be running
+            query = refined_query(intent_data, user_query)
+            print(f"Scraping refined query: {query}")
+            return await self._scrape_products(
+                [{"query": query, "priority": "high"}], location, scrape_budget_left()
+            )
+
+        async def idea_scrape(user_query, intent_data, search_queries, location):
+            refined = refined_query(intent_data, user_query).strip().lower()
+            remaining = [q for q in search_queries if q.strip().lower() != refined]
+            time_budget = scrape_budget_left()
+            if not remaining or time_budget <= 0:
+                return []
+            print(f"Scraping products for {len(remaining)} gift ideas...")
+            return await self._scrape_products(
+                self.gift_agent.enhance_with_context(remaining, intent_data), location, time_budget
+            )
+
+        def resolve(refined_products, idea_products):
+            all_products = refined_products + idea_products
+            print(f"Scraped {len(all_products)} products")
+            if not all_products:
+                return []
+            # Merge the same product listed on several marketplaces into one with offers
+            all_products = self.entity_agent.resolve(all_products)
+            print(f"Resolved to {len(all_products)} distinct products")
+            return all_products
+
+        def analyze(all_products, location):
+            print("\n[Analysis] Running analysis agents...")
+            snapshot = MarketSnapshot(all_products)
+            reputation_data = self.reputation_agent.batch_analyze(all_products, snapshot)
+            deal_data = self.deal_agent.analyze_deals(all_products, location, snapshot)
+            print(f"Reputation analysis: {len(reputation_data)} products scored")
+            print(f"Deal detection: {len(deal_data)} deals analyzed")
+            return {"reputation_data": reputation_data, "deal_data": deal_data}
+
+        def filter_risky(all_products, reputation_data, deal_data):
+            safe_mask = self.reputation_agent.safe_mask(
+                reputation_data, len(all_products), max_risk_level="medium"
+            )
+            safe_indices = np.flatnonzero(safe_mask).tolist()
+            print(f"Filtered to {len(safe_indices)} safe products")
+
+            # Re-index products and their metadata to the filtered order
+            return {
+                "safe_products": [all_products[i] for i in safe_indices],
+                "safe_reputation": {new_idx: reputation_data.get(old_idx, {})
+                                    for new_idx, old_idx in enumerate(safe_indices)},
+                "safe_deals": {new_idx: deal_data.get(old_idx, {})
+                               for new_idx, old_idx in enumerate(safe_indices)},
+            }
+
+        async def rank(safe_products, intent_data, safe_reputation, safe_deals, location):
+            print("\n[Ranking] Intelligent ranking...")
+            ranked_products = await self.ranking_agent.arank_products(
+                safe_products, intent_data, safe_reputation, safe_deals, location
             )
-            search_queries = gift_queries
-            print(f"Generated {len(search_queries)} gift ideas: {search_queries}")
-        else:
-            refined_query = intent_data['understanding']['refined_query']
-            search_queries = [refined_query]
-            print(f"Direct search: {refined_query}")
-
-        # Scrape products
-        print(f"Scraping products for {len(search_queries)} queries...")
-        all_products = await self._scrape_products(search_queries, location)
-        print(f"Scraped {len(all_products)} products")
-
-        if not all_products:
-            return self._empty_response(user_query, intent_data)
-
-        # PHASE 3: Analysis (parallel execution)
-        print("\n[Phase 3] Running analysis agents...")
-
-        # Run reputation and deal detection in parallel
-        reputation_task = asyncio.create_task(
-            asyncio.to_thread(self.reputation_agent.batch_analyze, all_products)
-        )
-        deal_task = asyncio.create_task(
-            asyncio.to_thread(self.deal_agent.analyze_deals, all_products, location)
-        )
-
-        reputation_data, deal_data = await asyncio.gather(reputation_task, deal_task)
-
-        print(f"Reputation analysis: {len(reputation_data)} products scored")
-        print(f"Deal detection: {len(deal_data)} deals analyzed")
-        print(f"DEBUG: reputation_data type: {type(reputation_data)}, keys: {list(reputation_data.keys()) if isinstance(reputation_data, dict) else 'N/A'}")
-        print(f"DEBUG: deal_data type: {type(deal_data)}, keys: {list(deal_data.keys()) if isinstance(deal_data, dict) else 'N/A'}")
-
-        # Filter out high-risk products
-        safe_indices = self.reputation_agent.filter_risky_products(
-            all_products, reputation_data, max_risk_level="medium"
-        )
-        print(f"Filtered to {len(safe_indices)} safe products")
-        print(f"DEBUG: safe_indices: {safe_indices}")
-        print(f"DEBUG: all_products type: {type(all_products)}, length: {len(all_products)}")
-
-        # Filter products and their metadata with robust error handling
-        safe_products = []
-        for i in safe_indices:
-            try:
-                if isinstance(all_products, list):
-                    if 0 <= i < len(all_products):
-                        safe_products.append(all_products[i])
-                    else:
-                        print(f"WARNING: Index {i} out of range for all_products (length: {len(all_products)})")
-                elif isinstance(all_products, dict):
-                    if i in all_products:
-                        safe_products.append(all_products[i])
-                    else:
-                        print(f"WARNING: Key {i} not found in all_products dict")
-                else:
-                    print(f"ERROR: all_products is neither list nor dict, it's {type(all_products)}")
-            except Exception as e:
-                print(f"ERROR: Failed to access all_products[{i}]: {e}")
-
-        safe_reputation = {new_idx: reputation_data.get(old_idx, {}) if isinstance(reputation_data, dict)
-                          else (reputation_data[old_idx] if old_idx < len(reputation_data) else {})
-                          for new_idx, old_idx in enumerate(safe_indices) if old_idx in safe_indices}
-        safe_deals = {new_idx: deal_data.get(old_idx, {}) if isinstance(deal_data, dict)
-                     else (deal_data[old_idx] if old_idx < len(deal_data) else {})
-                     for new_idx, old_idx in enumerate(safe_indices) if old_idx in safe_indices}
-                     
-        # PHASE 4: Intelligent Ranking
-        print("\n[Phase 4] Intelligent ranking...")
-        ranked_products = self.ranking_agent.rank_products(
-            safe_products,
-            intent_data,
-            safe_reputation,
-            safe_deals,
-            location
-        )
-        print(f"Ranked {len(ranked_products)} products")
-
-        # PHASE 5: Format Response
-        print("\n[Phase 5] Formatting response...")
-        return self._format_response(
-            user_query,
-            intent_data,
-            ranked_products,
-            deal_data,
-            location
-        )
+            print(f"Ranked {len(ranked_products)} products")
+            return ranked_products
+
+        def rank_fallback(safe_products, intent_data, safe_reputation, safe_deals, location):
+            return self.ranking_agent.rank_without_llm(
+                safe_products, intent_data, safe_reputation, safe_deals
+            )
+
+        def format_response(user_query, intent_data, all_products, ranked_products, deal_data, location):
+            if not all_products:
+                return self._empty_response(user_query, intent_data)
+            return self._format_response(
+                user_query, intent_data, ranked_products, deal_data, location
+            )
+
+        return [
+            Node("intent", analyze_intent, ["user_query", "location"], ["intent_data"]),
+            Node("plan", plan, ["intent_data"]),
+            Node("search_queries", search_queries, ["user_query", "intent_data", "plan", "location"],
+                 timeout=20.0, fallback=search_queries_fallback),
+            Node("speculative_scrape", speculative_scrape, ["user_query", "intent_data", "location"],
+                 ["refined_products"], timeout=120.0, fallback=lambda **_: []),
+            Node("idea_scrape", idea_scrape, ["user_query", "intent_data", "search_queries", "location"],
+                 ["idea_products"], timeout=120.0, fallback=lambda **_: []),
+            Node("entity_resolution", resolve, ["refined_products", "idea_products"], ["all_products"]),
+            Node("analysis", analyze, ["all_products", "location"], ["reputation_data", "deal_data"]),
+            Node("risk_filter", filter_risky, ["all_products", "reputation_data", "deal_data"],
+                 ["safe_products", "safe_reputation", "safe_deals"]),
+            Node("ranking", rank, ["safe_products", "intent_data", "safe_reputation", "safe_deals", "location"],
+                 ["ranked_products"], timeout=60.0, fallback=rank_fallback),
+            Node("response", format_response,
+                 ["user_query", "intent_data", "all_products", "ranked_products", "deal_data", "location"]),
+        ]
 
     async def _scrape_products(
         self,
-        search_queries: List[str],
-        location: str
+        search_queries: List[Any],
+        location: str,
+        time_budget: float = SCRAPE_TIME_BUDGET
     ) -> List[Any]:
-        """Scrape products from multiple marketplaces"""
-        try:
-            if location.lower() == "india":
-                try:
-                    from shopapp.scraper import flipkart_search_products_async
-                    from shopapp.scraper_amazon import amazon_search_products_async
-                except ImportError:
-                    from ..scraper import flipkart_search_products_async
-                    from ..scraper_amazon import amazon_search_products_async
-
-                scrapers = [
-                    (flipkart_search_products_async, "Flipkart"),
-                    (amazon_search_products_async, "Amazon.in"),
-                ]
-            else:
-                try:
-                    from shopapp.scraper_walmart import walmart_search_products_async
-                    from shopapp.scraper_target import target_search_products_async
-                    from shopapp.scraper_amazon_us import amazon_us_search_products_async
-                except ImportError:
-                    from ..scraper_walmart import walmart_search_products_async
-                    from ..scraper_target import target_search_products_async
-                    from ..scraper_amazon_us import amazon_us_search_products_async
-
-                scrapers = [
-                    (walmart_search_products_async, "Walmart"),
-                    (target_search_products_async, "Target"),
-                    (amazon_us_search_products_async, "Amazon.com"),
-                ]
-
-            all_products = []
-
-            # Scrape for each search query
-            for query in search_queries[:2]:  # Max 2 queries to control latency
-                def run_scraper_sync(scraper_func, source_name, search_query):
-                    import asyncio
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    try:
-                        result = loop.run_until_complete(
-                            scraper_func(search_query, max_results=10, headless=True)
-                        )
-                        for prod in result:
-                            prod.marketplace = source_name
-                        return result
-                    except Exception as e:
-                        print(f"Scraper error {source_name}: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        return []
-                    finally:
-                        loop.close()
-
-                scraper_tasks = []
-                for scraper_func, source_name in scrapers:
-                    task = asyncio.to_thread(run_scraper_sync, scraper_func, source_name, query)
-                    scraper_tasks.append(task)
-
-                results = await asyncio.wait_for(
-                    asyncio.gather(*scraper_tasks, return_exceptions=True),
-                    timeout=90.0
-                )
-
-                for result in results:
-                    if isinstance(result, list):
-                        all_products.extend(result)
+        """
+        Scrape products from multiple marketplaces
 
-            return all_products
+        Every (query, marketplace) pair runs concurrently under the shared
+        browser limit within `time_budget` seconds (what is left of the
+        request's scrape budget); queries may carry priorities from
+        GiftIdeationAgent.enhance_with_context.
+        """
+        try:
+            marketplaces = DEEP_AGENT_MARKETPLACES.get(location.lower(), DEEP_AGENT_MARKETPLACES["usa"])
+            return await scrape_queries(
+                search_queries, marketplaces, max_results=10, time_budget=time_budget
+            )
 
         except Exception as e:
             print(f"Scraping error: {e}")
@@ -293,7 +301,18 @@ class MultiAgentShoppingFramework:
                 "seller_risk_level": rep.get("risk_level", "unknown"),
                 "deal_quality": deal.get("deal_quality", "average"),
                 "deal_tags": deal.get("tags", []),
-                "is_best_deal": deal.get("is_best_deal", False)
+                "is_best_deal": deal.get("is_best_deal", False),
+                "price_history": deal.get("price_history"),
+                "offers": [
+                    {
+                        "source": offer.marketplace,
+                        "price": offer.price,
+                        "currency": offer.currency,
+                        "url": offer.url,
+                        "rating": offer.rating
+                    }
+                    for offer in getattr(prod, "offers", [])
+                ]
             })
 
         return {
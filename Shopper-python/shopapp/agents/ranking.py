@@ -1,8 +1,43 @@
+import asyncio
 import json
-from typing import List, Dict, Any
+import os
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
+from ..cache import TTLCache, fingerprint
+
+# How many pre-scored candidates may reach the LLM, and the prompt budget for their table
+MAX_LLM_CANDIDATES = int(os.getenv("RANKING_MAX_CANDIDATES", "15"))
+CANDIDATE_TOKEN_BUDGET = int(os.getenv("RANKING_TOKEN_BUDGET", "1200"))
+
+# Chunked (async) ranking: how many candidates in total, per LLM call, and calls in flight
+MAX_CHUNKED_CANDIDATES = int(os.getenv("RANKING_MAX_CHUNKED_CANDIDATES", "60"))
+RANKING_CHUNK_SIZE = int(os.getenv("RANKING_CHUNK_SIZE", "12"))
+RANKING_CONCURRENCY = int(os.getenv("RANKING_CONCURRENCY", "5"))
+
+# LLM rankings reused for the same candidates and intent (shared by all agent instances)
+RANKING_CACHE_TTL = float(os.getenv("RANKING_CACHE_TTL", "900"))
+RANKING_CACHE_SIZE = int(os.getenv("RANKING_CACHE_SIZE", "256"))
+ranking_cache = TTLCache(maxsize=RANKING_CACHE_SIZE, ttl=RANKING_CACHE_TTL)
+
+# Rank fields worth caching; product_index is stored as the product URL instead
+CACHED_RANK_FIELDS = (
+    "rank", "overall_score", "match_score", "value_assessment", "reasoning", "recommendation"
+)
+
+# Rough chars-per-token for English product text; only used to stay under the budget
+CHARS_PER_TOKEN = 4
+
+CANDIDATE_COLUMNS = "idx|title|price|rating|source|trust|risk|deal|value|lowest|tags|warn"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer download needed)"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
 class IntelligentRankingAgent:
     """
     Intelligent Ranking Agent (Enhanced)
@@ -13,6 +48,11 @@ class IntelligentRankingAgent:
     - Consider deal quality
     - Personalize to user requirements
     - Provide detailed reasoning for each rank
+
+    Ranking runs in two stages: every candidate gets a cheap algorithmic
+    pre-score, and only the best pre-scored candidates are sent to the LLM
+    as a compact pipe-separated table that fits the token budget. Large
+    shortlists are ranked in concurrent chunks plus a final tournament.
     """
 
     def __init__(self, api_key: str):
@@ -21,6 +61,13 @@ class IntelligentRankingAgent:
             temperature=0.2,
             api_key=api_key
         )
+        self.max_candidates = MAX_LLM_CANDIDATES
+        self.token_budget = CANDIDATE_TOKEN_BUDGET
+        self.max_chunked_candidates = MAX_CHUNKED_CANDIDATES
+        self.chunk_size = max(2, RANKING_CHUNK_SIZE)
+        self.concurrency = max(1, RANKING_CONCURRENCY)
+        self.last_token_usage: Dict[str, int] = {}
+        self.token_usage = {"input_tokens": 0, "output_tokens": 0, "calls": 0}
 
     def rank_products(
         self,
@@ -41,50 +88,246 @@ class IntelligentRankingAgent:
         understanding = intent_data.get("understanding", {})
         constraints = intent_data.get("constraints", {})
 
-        # Prepare product summaries for LLM
-        product_summaries = []
-        for idx, prod in enumerate(products[:15]):  # Limit to 15 for LLM context
-            rep = reputation_data.get(idx, {})
-            deal = deal_data.get(idx, {})
+        # Stage 1: pre-score every candidate and shortlist the best for the LLM
+        prescores, order, shortlist = self._shortlist(
+            products, reputation_data, deal_data, understanding, constraints, self.max_candidates
+        )
 
-            # Safe float conversion
-            try:
-                price = float(prod.price) if prod.price is not None else 0.0
-            except (ValueError, TypeError):
-                price = 0.0
+        cache_key = self._cache_key(products, shortlist, intent_data, location, self.max_candidates)
+        final_rankings = self._cached_rankings(cache_key, products, shortlist)
+        if final_rankings is None:
+            # Stage 2: LLM ranking of the shortlist
+            ranked_data = self._get_llm_ranking(
+                shortlist, understanding, constraints, location
+            )
+
+            # Combine LLM ranking with algorithmic scoring
+            final_rankings = self._combine_rankings(
+                ranked_data, shortlist, understanding
+            )
+            self._store_rankings(cache_key, products, final_rankings)
+
+        return self._build_results(
+            final_rankings, order, prescores, products, reputation_data, deal_data
+        )
 
-            try:
-                rating = float(prod.rating) if prod.rating is not None else 0.0
-            except (ValueError, TypeError):
-                rating = 0.0
+    async def arank_products(
+        self,
+        products: List[Any],
+        intent_data: Dict[str, Any],
+        reputation_data: Dict[int, Dict[str, Any]],
+        deal_data: Dict[int, Dict[str, Any]],
+        location: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Async ranking that scales to large candidate sets
 
-            summary = {
-                "index": idx,
-                "title": prod.title[:100] if prod.title else "Unknown Product",
-                "price": price,
-                "rating": rating,
-                "source": prod.marketplace if hasattr(prod, 'marketplace') else "Unknown",
-                "seller_trust_score": rep.get("trust_score", 50),
-                "seller_risk_level": rep.get("risk_level", "medium"),
-                "deal_quality": deal.get("deal_quality", "average"),
-                "value_score": deal.get("value_score", 50),
-                "is_lowest_price": deal.get("is_lowest_price", False),
-                "deal_tags": deal.get("tags", []),
-                "has_warnings": len(rep.get("red_flags", [])) > 0
-            }
-            product_summaries.append(summary)
+        Up to `max_chunked_candidates` pre-scored candidates are split into
+        chunks that are ranked concurrently; the best few of each chunk then
+        meet in one final tournament call. Small shortlists take a single call.
+        """
+        if not products:
+            return []
+
+        understanding = intent_data.get("understanding", {})
+        constraints = intent_data.get("constraints", {})
+
+        prescores, order, shortlist = self._shortlist(
+            products, reputation_data, deal_data, understanding, constraints,
+            self.max_chunked_candidates
+        )
+
+        cache_key = self._cache_key(
+            products, shortlist, intent_data, location, self.max_chunked_candidates
+        )
+        final_rankings = self._cached_rankings(cache_key, products, shortlist)
+        if final_rankings is None:
+            if len(shortlist) <= self.chunk_size:
+                ranked_data = await self._aget_llm_ranking(
+                    shortlist, understanding, constraints, location
+                )
+                final_rankings = self._combine_rankings(ranked_data, shortlist, understanding)
+            else:
+                final_rankings = await self._tournament_ranking(
+                    shortlist, understanding, constraints, location
+                )
+            self._store_rankings(cache_key, products, final_rankings)
+
+        return self._build_results(
+            final_rankings, order, prescores, products, reputation_data, deal_data
+        )
+
+    def rank_without_llm(
+        self,
+        products: List[Any],
+        intent_data: Dict[str, Any],
+        reputation_data: Dict[int, Dict[str, Any]],
+        deal_data: Dict[int, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Pure pre-score ranking, used when the LLM is unavailable or too slow"""
+        if not products:
+            return []
 
-        # Get LLM ranking
-        ranked_data = self._get_llm_ranking(
-            product_summaries, understanding, constraints, location
+        prescores, order, _ = self._shortlist(
+            products, reputation_data, deal_data,
+            intent_data.get("understanding", {}), intent_data.get("constraints", {}), 0
         )
+        return self._build_results([], order, prescores, products, reputation_data, deal_data)
 
-        # Combine LLM ranking with algorithmic scoring
-        final_rankings = self._combine_rankings(
-            ranked_data, product_summaries, understanding
+    async def _tournament_ranking(
+        self,
+        shortlist: List[Dict[str, Any]],
+        understanding: Dict[str, Any],
+        constraints: Dict[str, Any],
+        location: str
+    ) -> List[Dict[str, Any]]:
+        """Rank chunks concurrently, then re-rank the chunk winners together"""
+        # Deal candidates round-robin so every chunk gets a share of the strongest pre-scores
+        num_chunks = -(-len(shortlist) // self.chunk_size)
+        chunks = [shortlist[i::num_chunks] for i in range(num_chunks)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def rank_chunk(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                ranked = await self._aget_llm_ranking(chunk, understanding, constraints, location)
+            return self._combine_rankings(ranked, chunk, understanding)
+
+        chunk_rankings = await asyncio.gather(*(rank_chunk(chunk) for chunk in chunks))
+
+        # The final round must fit in one chunk
+        winners_per_chunk = max(1, self.chunk_size // num_chunks)
+        by_index = {summary["index"]: summary for summary in shortlist}
+        finalists = [
+            by_index[info["product_index"]]
+            for ranking in chunk_rankings
+            for info in ranking[:winners_per_chunk]
+        ]
+        final_ranked = await self._aget_llm_ranking(finalists, understanding, constraints, location)
+        final_rankings = self._combine_rankings(final_ranked, finalists, understanding)
+
+        # Everyone else follows, interleaved by their rank within their chunk
+        placed = {info["product_index"] for info in final_rankings}
+        runners_up = sorted(
+            (info for ranking in chunk_rankings for info in ranking
+             if info["product_index"] not in placed),
+            key=lambda info: (info["rank"], -info["overall_score"])
+        )
+        final_rankings.extend(runners_up)
+        for new_rank, item in enumerate(final_rankings, 1):
+            item["rank"] = new_rank
+
+        return final_rankings
+
+    def _shortlist(
+        self,
+        products: List[Any],
+        reputation_data: Dict[int, Dict[str, Any]],
+        deal_data: Dict[int, Dict[str, Any]],
+        understanding: Dict[str, Any],
+        constraints: Dict[str, Any],
+        limit: int
+    ) -> Tuple[np.ndarray, List[int], List[Dict[str, Any]]]:
+        """Pre-scores, best-first product order and the top `limit` summaries"""
+        product_summaries = self._summarize_products(products, reputation_data, deal_data)
+        prescores = self._prescore(product_summaries, understanding, constraints)
+        order = np.argsort(-prescores, kind="stable").tolist()
+        shortlist = [product_summaries[i] for i in order[:limit]]
+        return prescores, order, shortlist
+
+    def _cache_key(
+        self,
+        products: List[Any],
+        shortlist: List[Dict[str, Any]],
+        intent_data: Dict[str, Any],
+        location: str,
+        limit: int
+    ) -> str:
+        """Fingerprint of the candidates (URL + price, order-independent) and ranking-relevant intent"""
+        understanding = intent_data.get("understanding", {})
+        constraints = intent_data.get("constraints", {})
+        candidates = sorted(
+            (getattr(products[s["index"]], "url", "") or "", s["price"]) for s in shortlist
         )
+        return fingerprint({
+            "candidates": candidates,
+            "limit": limit,
+            "location": location.lower(),
+            "category": understanding.get("product_category"),
+            "budget_min": understanding.get("budget_min"),
+            "budget_max": understanding.get("budget_max"),
+            "key_features": sorted(understanding.get("key_features") or []),
+            "is_gift": bool(understanding.get("is_gift")),
+            "must_have": sorted(constraints.get("must_have") or []),
+            "nice_to_have": sorted(constraints.get("nice_to_have") or []),
+            "exclude": sorted(constraints.get("exclude") or []),
+        })
+
+    def _cached_rankings(
+        self,
+        cache_key: str,
+        products: List[Any],
+        shortlist: List[Dict[str, Any]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Cached rankings re-mapped onto the current product indices, or None"""
+        cached = ranking_cache.get(cache_key)
+        if cached is None:
+            return None
+
+        index_by_url = {getattr(products[s["index"]], "url", ""): s["index"] for s in shortlist}
+        rankings = []
+        for entry in cached:
+            idx = index_by_url.get(entry["url"])
+            if idx is None:
+                return None
+            info = {field: entry[field] for field in CACHED_RANK_FIELDS if field in entry}
+            info["product_index"] = idx
+            rankings.append(info)
+
+        print(f"Ranking cache hit ({len(rankings)} ranked products)")
+        return rankings
+
+    def _store_rankings(
+        self,
+        cache_key: str,
+        products: List[Any],
+        final_rankings: List[Dict[str, Any]]
+    ) -> None:
+        """Cache LLM rankings; rankings that fell back to the algorithmic scorer are not kept"""
+        if not final_rankings or any(info.get("fallback") for info in final_rankings):
+            return
+
+        entries = []
+        for info in final_rankings:
+            entry = {field: info[field] for field in CACHED_RANK_FIELDS if field in info}
+            entry["url"] = getattr(products[info["product_index"]], "url", "")
+            entries.append(entry)
+        ranking_cache.set(cache_key, entries)
+
+    def _build_results(
+        self,
+        final_rankings: List[Dict[str, Any]],
+        order: List[int],
+        prescores: np.ndarray,
+        products: List[Any],
+        reputation_data: Dict[int, Dict[str, Any]],
+        deal_data: Dict[int, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Attach products and metadata to the ranking; unranked candidates follow by pre-score"""
+        # Candidates the LLM did not see follow in pre-score order
+        ranked_indices = {info["product_index"] for info in final_rankings}
+        for idx in order:
+            if idx in ranked_indices:
+                continue
+            final_rankings.append({
+                "product_index": idx,
+                "rank": len(final_rankings) + 1,
+                "overall_score": round(float(prescores[idx]), 1),
+                "match_score": 50,
+                "value_assessment": "average",
+                "reasoning": "Ranked by algorithmic pre-score",
+                "recommendation": "Review product details before purchase"
+            })
 
-        # Build final result
         results = []
         for rank_info in final_rankings:
             idx = rank_info["product_index"]
@@ -108,16 +351,164 @@ class IntelligentRankingAgent:
 
         return results
 
-    def _get_llm_ranking(
+    def _summarize_products(
+        self,
+        products: List[Any],
+        reputation_data: Dict[int, Dict[str, Any]],
+        deal_data: Dict[int, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Per-product summary of the fields the ranker looks at"""
+        product_summaries = []
+        for idx, prod in enumerate(products):
+            rep = reputation_data.get(idx, {})
+            deal = deal_data.get(idx, {})
+
+            # Safe float conversion
+            try:
+                price = float(prod.price) if prod.price is not None else 0.0
+            except (ValueError, TypeError):
+                price = 0.0
+
+            try:
+                rating = float(prod.rating) if prod.rating is not None else 0.0
+            except (ValueError, TypeError):
+                rating = 0.0
+
+            product_summaries.append({
+                "index": idx,
+                "title": prod.title[:100] if prod.title else "Unknown Product",
+                "price": price,
+                "rating": rating,
+                "source": prod.marketplace if hasattr(prod, 'marketplace') else "Unknown",
+                "seller_trust_score": rep.get("trust_score", 50),
+                "seller_risk_level": rep.get("risk_level", "medium"),
+                "deal_quality": deal.get("deal_quality", "average"),
+                "value_score": deal.get("value_score", 50),
+                "is_lowest_price": deal.get("is_lowest_price", False),
+                "deal_tags": deal.get("tags", []),
+                "has_warnings": len(rep.get("red_flags", [])) > 0
+            })
+        return product_summaries
+
+    def _prescore(
+        self,
+        product_summaries: List[Dict[str, Any]],
+        understanding: Dict[str, Any],
+        constraints: Dict[str, Any]
+    ) -> np.ndarray:
+        """
+        Cheap 0-100 pre-score for every candidate
+
+        Trust, value and rating carry most of the weight; requirement terms
+        found in the title add relevance, and budget misses, exclusions,
+        high risk and red flags are penalised.
+        """
+        if not product_summaries:
+            return np.zeros(0)
+
+        trust = np.array([p["seller_trust_score"] for p in product_summaries], dtype=float)
+        value = np.array([p["value_score"] for p in product_summaries], dtype=float)
+        rating = np.array([p["rating"] for p in product_summaries], dtype=float)
+        price = np.array([p["price"] for p in product_summaries], dtype=float)
+        titles = [p["title"].lower() for p in product_summaries]
+
+        terms = []
+        for phrase in (understanding.get("key_features") or []) + (constraints.get("must_have") or []):
+            terms.extend(w for w in str(phrase).lower().split() if len(w) > 2)
+        if terms:
+            relevance = np.array(
+                [sum(term in title for term in terms) / len(terms) for title in titles]
+            ) * 100
+        else:
+            relevance = np.full(len(titles), 50.0)
+
+        score = trust * 0.3 + value * 0.3 + (rating / 5.0) * 100 * 0.2 + relevance * 0.2
+
+        budget_max = understanding.get("budget_max")
+        budget_min = understanding.get("budget_min")
+        priced = price > 0
+        if budget_max:
+            score -= np.where(priced & (price > float(budget_max) * 1.1), 20, 0)
+        if budget_min:
+            score -= np.where(priced & (price < float(budget_min) * 0.9), 10, 0)
+
+        excluded = [str(e).lower() for e in (constraints.get("exclude") or []) if e]
+        if excluded:
+            score -= np.array([30 if any(e in title for e in excluded) else 0 for title in titles])
+
+        score -= np.array([15 if p["seller_risk_level"] == "high" else 0 for p in product_summaries])
+        score -= np.array([10 if p["has_warnings"] else 0 for p in product_summaries])
+        return np.clip(score, 0, 100)
+
+    def _encode_row(self, summary: Dict[str, Any]) -> str:
+        """One pipe-separated table row for a candidate"""
+        title = summary["title"].replace("|", "/").replace("\n", " ")
+        tags = ",".join(summary["deal_tags"][:3])
+        return "|".join([
+            str(summary["index"]),
+            title,
+            f"{summary['price']:g}",
+            f"{summary['rating']:g}",
+            summary["source"],
+            f"{summary['seller_trust_score']:g}",
+            summary["seller_risk_level"],
+            summary["deal_quality"],
+            f"{summary['value_score']:g}",
+            "y" if summary["is_lowest_price"] else "n",
+            tags,
+            "y" if summary["has_warnings"] else "n",
+        ])
+
+    def _encode_candidates(
+        self,
+        product_summaries: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Compact table of candidates within the token budget
+
+        Candidates are taken in the given (best-first) order until the next
+        row would exceed the budget; the first candidate is always included.
+        Returns the included summaries and the encoded table.
+        """
+        lines = [CANDIDATE_COLUMNS]
+        used = estimate_tokens(CANDIDATE_COLUMNS)
+        included = []
+        for summary in product_summaries:
+            row = self._encode_row(summary)
+            cost = estimate_tokens(row)
+            if included and used + cost > self.token_budget:
+                break
+            lines.append(row)
+            used += cost
+            included.append(summary)
+        return included, "\n".join(lines)
+
+    def _record_usage(self, response: Any, messages: List[Any]) -> None:
+        """Track prompt/completion tokens, estimating when the provider reports none"""
+        usage = getattr(response, "usage_metadata", None) or {}
+        content = response.content if isinstance(response, AIMessage) else str(response)
+        input_tokens = usage.get("input_tokens") or sum(estimate_tokens(m.content) for m in messages)
+        output_tokens = usage.get("output_tokens") or estimate_tokens(content)
+
+        self.last_token_usage = {"input_tokens": input_tokens, "output_tokens": output_tokens}
+        self.token_usage["input_tokens"] += input_tokens
+        self.token_usage["output_tokens"] += output_tokens
+        self.token_usage["calls"] += 1
+        print(f"Ranking LLM tokens: {input_tokens} in / {output_tokens} out")
+
+    def _ranking_messages(
         self,
         product_summaries: List[Dict],
         understanding: Dict[str, Any],
         constraints: Dict[str, Any],
         location: str
-    ) -> List[Dict[str, Any]]:
-        """Get intelligent ranking from LLM"""
+    ) -> List[Any]:
+        """System + user messages for one ranking call"""
         system_prompt = """You are an expert shopping advisor. Rank these products based on user requirements.
 
+Products are given as a pipe-separated table with columns:
+idx|title|price|rating|source|trust (seller trust 0-100)|risk (seller risk)|deal (deal quality)|value (value score 0-100)|lowest (lowest price y/n)|tags|warn (red flags y/n)
+
 For each product, consider:
 1. How well it matches user requirements (features, category)
 2. Price vs value (deal quality, value score)
@@ -125,20 +516,8 @@ For each product, consider:
 4. Product quality (ratings)
 5. Overall value proposition
 
-Return ONLY a JSON array ranked from best to worst:
-[
-  {
-    "product_index": original_index,
-    "rank": new_rank_1_to_N,
-    "overall_score": 0-100,
-    "match_score": 0-100,
-    "value_assessment": "excellent|good|average|poor",
-    "reasoning": "concise 1-2 sentence explanation",
-    "recommendation": "brief actionable recommendation",
-    "key_strengths": ["strength1", "strength2"],
-    "concerns": ["concern1"] or []
-  }
-]
+Return ONLY a compact JSON array ranked from best to worst:
+[{"product_index": idx, "rank": 1, "overall_score": 0-100, "match_score": 0-100, "value_assessment": "excellent|good|average|poor", "reasoning": "one sentence", "recommendation": "few words"}]
 
 Prioritize:
 - Seller trust and safety (avoid high-risk sellers)
@@ -147,6 +526,7 @@ Prioritize:
 - Deal quality (best deals rank higher)"""
 
         currency = "₹" if location.lower() == "india" else "$"
+        _, candidate_table = self._encode_candidates(product_summaries)
 
         context = f"""User Requirements:
 - Category: {understanding.get('product_category', 'general')}
@@ -158,30 +538,63 @@ Prioritize:
 - Urgency: {understanding.get('urgency', 'medium')}
 
 Products to rank:
-{json.dumps(product_summaries, indent=2)}
+{candidate_table}"""
 
-Rank these products based on overall value, safety, and user requirements."""
-
-        messages = [
+        return [
             SystemMessage(content=system_prompt),
             HumanMessage(content=context)
         ]
 
+    def _parse_ranking(self, response: Any) -> List[Dict[str, Any]]:
+        """Parse the LLM's JSON array, tolerating markdown code fences"""
+        content = response.content if isinstance(response, AIMessage) else str(response)
+
+        # Clean and parse JSON
+        clean_content = content.strip()
+        if clean_content.startswith('```json'):
+            clean_content = clean_content[7:]
+        if clean_content.startswith('```'):
+            clean_content = clean_content[3:]
+        if clean_content.endswith('```'):
+            clean_content = clean_content[:-3]
+
+        rankings = json.loads(clean_content.strip())
+        return rankings if isinstance(rankings, list) else []
+
+    def _get_llm_ranking(
+        self,
+        product_summaries: List[Dict],
+        understanding: Dict[str, Any],
+        constraints: Dict[str, Any],
+        location: str
+    ) -> List[Dict[str, Any]]:
+        """Get intelligent ranking from LLM"""
+        messages = self._ranking_messages(product_summaries, understanding, constraints, location)
+
         try:
             response = self.llm.invoke(messages)
-            content = response.content if isinstance(response, AIMessage) else str(response)
+            self._record_usage(response, messages)
+            return self._parse_ranking(response)
 
-            # Clean and parse JSON
-            clean_content = content.strip()
-            if clean_content.startswith('```json'):
-                clean_content = clean_content[7:]
-            if clean_content.startswith('```'):
-                clean_content = clean_content[3:]
-            if clean_content.endswith('```'):
-                clean_content = clean_content[:-3]
+        except Exception as e:
+            print(f"LLM ranking error: {e}")
+            # Fallback to algorithmic ranking
+            return self._algorithmic_fallback(product_summaries)
+
+    async def _aget_llm_ranking(
+        self,
+        product_summaries: List[Dict],
+        understanding: Dict[str, Any],
+        constraints: Dict[str, Any],
+        location: str
+    ) -> List[Dict[str, Any]]:
+        """Async variant of _get_llm_ranking (does not block the event loop)"""
+        messages = self._ranking_messages(product_summaries, understanding, constraints, location)
 
-            rankings = json.loads(clean_content.strip())
-            return rankings if isinstance(rankings, list) else []
+        try:
+            response = await self.llm.ainvoke(messages)
+            self._record_usage(response, messages)
+            return self._parse_ranking(response)
 
         except Exception as e:
             print(f"LLM ranking error: {e}")
@@ -205,7 +618,8 @@ Rank these products based on overall value, safety, and user requirements."""
                 "match_score": 50,
                 "value_assessment": "average",
                 "reasoning": "Automatically scored based on multiple factors",
-                "recommendation": "Review product details before purchase"
+                "recommendation": "Review product details before purchase",
+                "fallback": True
             })
 
         scored.sort(key=lambda x: x["overall_score"], reverse=True)
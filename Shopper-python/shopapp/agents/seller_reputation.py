@@ -1,4 +1,7 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+from .market_analysis import MarketSnapshot
 
 class SellerReputationAgent:
     """
@@ -33,9 +36,13 @@ class SellerReputationAgent:
         "new_seller": "New or unverified seller",
     }
 
-    def analyze_seller(self, product: Any, all_products: List[Any]) -> Dict[str, Any]:
+    def analyze_seller(self, snapshot: MarketSnapshot, idx: int) -> Dict[str, Any]:
         """
-        Analyze seller reputation for a single product
+        Analyze seller reputation for product `idx` of a market snapshot
+
+        Per-product reference for batch_analyze, which produces the same
+        result for every product at once; the market average comes from the
+        snapshot's title clusters.
 
         Returns:
         {
@@ -47,7 +54,8 @@ class SellerReputationAgent:
             "recommendations": []
         }
         """
-        marketplace = getattr(product, 'marketplace', '').lower()
+        product = snapshot.products[idx]
+        marketplace = (getattr(product, 'marketplace', '') or '').lower()
 
         # Safe conversions
         try:
@@ -69,7 +77,7 @@ class SellerReputationAgent:
         marketplace_score = self.MARKETPLACE_TRUST_SCORES.get(marketplace, 50)
 
         # Calculate price anomaly
-        avg_price = self._calculate_average_price(all_products, product.title)
+        avg_price = float(snapshot.ref_avg[idx])
         price_anomaly = self._detect_price_anomaly(price, avg_price)
 
         # Detect red flags
@@ -146,21 +154,6 @@ class SellerReputationAgent:
             }
         }
 
-    def _calculate_average_price(self, all_products: List[Any], product_title: str) -> float:
-        """Calculate average price for similar products"""
-        prices = []
-        for prod in all_products:
-            if prod.price:
-                try:
-                    prices.append(float(prod.price))
-                except:
-                    pass
-
-        if not prices:
-            return 0
-
-        return sum(prices) / len(prices)
-
     def _detect_price_anomaly(self, price: float, avg_price: float) -> str:
         """Detect if price is anomalously high or low"""
         if avg_price == 0 or price == 0:
@@ -202,33 +195,116 @@ class SellerReputationAgent:
 
         return recommendations
 
-    def batch_analyze(self, products: List[Any]) -> Dict[int, Dict[str, Any]]:
-        """Analyze seller reputation for all products"""
-        results = {}
+    def batch_analyze(
+        self,
+        products: List[Any],
+        snapshot: Optional[MarketSnapshot] = None
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Analyze seller reputation for all products in one pass
+
+        Scores are computed on the snapshot's shared price/rating arrays, so
+        market statistics are calculated once instead of once per product.
+        """
+        if not products:
+            return {}
+
+        snap = snapshot or MarketSnapshot(products)
 
-        for idx, product in enumerate(products):
-            results[idx] = self.analyze_seller(product, products)
+        marketplace_scores = np.array(
+            [self.MARKETPLACE_TRUST_SCORES.get(m, 50) for m in snap.marketplaces], dtype=float
+        )
+        prices = snap.prices
+        ratings = snap.ratings
+        rating_counts = snap.rating_counts
+
+        # Price anomaly vs. market average
+        comparable = (snap.ref_avg != 0) & (prices != 0)
+        ratio = np.divide(prices, snap.ref_avg, out=np.ones(snap.size), where=comparable)
+        too_low = comparable & (ratio < 0.5)
+        too_high = comparable & (ratio > 1.5)
+
+        # Trust score
+        trust = marketplace_scores.copy()
+        trust += np.where(ratings > 0, (ratings - 3.0) * 10, -15)
+        has_count = rating_counts > 0
+        trust += np.where(has_count & (rating_counts < 5), -10, 0)
+        trust += np.where(has_count & (rating_counts > 100), 10, 0)
+        trust -= np.where(too_low, 20, 0)
+        trust -= np.where(too_high, 5, 0)
+        trust = np.clip(trust, 0, 100)
+
+        risk_levels = np.select([trust >= 75, trust >= 50], ["low", "medium"], "high")
+
+        # Plain Python lists for the per-product assembly below
+        rating_list = ratings.tolist()
+        count_list = rating_counts.tolist()
+        market_list = marketplace_scores.astype(int).tolist()
+        trust_list = trust.tolist()
+        risk_list = risk_levels.tolist()
+        too_low_list = too_low.tolist()
+        too_high_list = too_high.tolist()
+
+        results = {}
+        for idx in range(snap.size):
+            rating = rating_list[idx]
+            rating_count = count_list[idx]
+            price_anomaly = "too_low" if too_low_list[idx] else ("too_high" if too_high_list[idx] else "normal")
+
+            red_flags = []
+            warnings = []
+
+            if price_anomaly == "too_low":
+                red_flags.append(self.RED_FLAGS["price_too_low"])
+
+            if rating == 0:
+                red_flags.append(self.RED_FLAGS["no_rating"])
+            elif rating < 3.0:
+                red_flags.append(self.RED_FLAGS["very_low_rating"])
+
+            if rating_count and rating_count < 5:
+                warnings.append(self.RED_FLAGS["few_reviews"])
+
+            if price_anomaly == "too_low":
+                warnings.append("Verify product authenticity before purchase")
+            elif price_anomaly == "too_high":
+                warnings.append("Price higher than average - check for additional features")
+
+            marketplace_score = market_list[idx]
+
+            results[idx] = {
+                "trust_score": round(trust_list[idx], 1),
+                "marketplace_score": marketplace_score,
+                "risk_level": risk_list[idx],
+                "red_flags": red_flags,
+                "warnings": warnings,
+                "recommendations": self._generate_recommendations(
+                    marketplace_score, rating, rating_count, price_anomaly
+                ),
+                "details": {
+                    "marketplace": snap.marketplaces[idx],
+                    "has_rating": rating > 0,
+                    "rating_value": rating,
+                    "review_count": rating_count,
+                    "price_status": price_anomaly
+                }
+            }
 
         return results
 
-    def filter_risky_products(
+    def safe_mask(
         self,
-        products: List[Any],
         reputation_data: Dict[int, Dict[str, Any]],
+        size: int,
         max_risk_level: str = "medium"
-    ) -> List[int]:
-        """
-        Filter out high-risk products
-
-        Returns indices of products to keep
-        """
+    ) -> np.ndarray:
+        """Boolean mask over product indices that are within the allowed risk level"""
         risk_order = {"low": 0, "medium": 1, "high": 2}
         max_risk = risk_order.get(max_risk_level, 1)
 
-        safe_indices = []
+        levels = np.full(size, 2, dtype=np.int8)
         for idx, rep_data in reputation_data.items():
-            risk_level = rep_data.get("risk_level", "high")
-            if risk_order.get(risk_level, 2) <= max_risk:
-                safe_indices.append(idx)
+            if 0 <= idx < size:
+                levels[idx] = risk_order.get(rep_data.get("risk_level", "high"), 2)
 
-        return safe_indices
+        return levels <= max_risk
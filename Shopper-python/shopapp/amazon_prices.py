@@ -0,0 +1,191 @@
+"""
+Price extraction for Amazon.in and Amazon.com search result cards.
+
+Amazon renders prices in several shapes (hidden a-offscreen spans, whole +
+fraction parts, "2 options from $14.47" variant buttons, ...), so both
+scrapers try a list of strategies. Each DOM strategy costs browser
+round-trips per card. Strategies come in groups tried in a fixed order,
+because groups read different prices: the "N options from" price of a
+multi-variant card takes precedence over its default variant's price.
+Within a group every strategy reads the same displayed price, so they are
+tried in the order selector_stats ranks them (best recent success first).
+The card-text regexes only read text the scraper already has, so they cost
+nothing and always come last.
+"""
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .extraction_telemetry import note_strategy
+from .selector_stats import selector_stats
+
+VARIANT_BUTTONS = "button, .a-button-inner, [role='button'], li, .a-button-text"
+OFFSCREEN_SELECTORS = [
+    "span.a-offscreen",
+    ".a-price span.a-offscreen",
+    "span[aria-hidden='true'] + span.a-offscreen"
+]
+VARIANT_SELECTORS = [
+    ".a-button-text",
+    "[data-a-button-text]",
+    ".a-size-base.a-color-base",
+    "li.a-spacing-mini"
+]
+
+
+def _amount(text: str, symbol: str) -> float:
+    return float(text.replace(symbol, "").replace(",", "").strip())
+
+
+async def offscreen(card: Any, symbol: str) -> Optional[float]:
+    """Standard hidden price element (a-offscreen within a-price)"""
+    price_el = await card.query_selector(".a-price .a-offscreen")
+    if price_el:
+        return _amount(await price_el.inner_text(), symbol)
+    return None
+
+
+async def variant_options(card: Any, symbol: str) -> Optional[float]:
+    """"2 options from $14.47" on size/type option buttons"""
+    sym = re.escape(symbol)
+    patterns = [
+        rf'\d+\s+options?\s+from\s*{sym}\s*([\d,]+\.\d{{2}})',
+        rf'\d+\s+options?\s+from\s*{sym}\s*([\d,]+)',
+        rf'from\s*{sym}\s*([\d,]+\.\d{{2}})',
+        rf'from\s*{sym}\s*([\d,]+)'
+    ]
+    for button in await card.query_selector_all(VARIANT_BUTTONS):
+        # Normalize whitespace (handle newlines between "from" and price)
+        button_text = " ".join((await button.inner_text()).split())
+        for pattern in patterns:
+            variant_match = re.search(pattern, button_text, re.IGNORECASE)
+            if variant_match:
+                return float(variant_match.group(1).replace(",", ""))
+    return None
+
+
+async def whole_fraction(card: Any, symbol: str) -> Optional[float]:
+    """Price whole + fraction (e.g. "19" + "99")"""
+    price_whole = await card.query_selector(".a-price-whole")
+    if not price_whole:
+        return None
+    price_fraction = await card.query_selector(".a-price-fraction")
+    whole_text = await price_whole.inner_text()
+    fraction_text = await price_fraction.inner_text() if price_fraction else "00"
+    whole_text = whole_text.replace(".", "").replace(",", "").strip()
+    fraction_text = fraction_text.replace(".", "").replace(",", "").strip()
+    return float(f"{whole_text}.{fraction_text}")
+
+
+async def offscreen_any(card: Any, symbol: str) -> Optional[float]:
+    """Any a-offscreen span holding a plain number"""
+    for selector in OFFSCREEN_SELECTORS:
+        price_el = await card.query_selector(selector)
+        if price_el:
+            price_text = (await price_el.inner_text()).replace(symbol, "").replace(",", "").strip()
+            if price_text and price_text.replace(".", "").isdigit():
+                return float(price_text)
+    return None
+
+
+async def symbol_parent(card: Any, symbol: str) -> Optional[float]:
+    """Visible price next to an a-price-symbol"""
+    for symbol_el in await card.query_selector_all(".a-price-symbol"):
+        symbol_parent_el = await symbol_el.evaluate_handle("el => el.parentElement")
+        if symbol_parent_el:
+            numeric = re.search(r'([\d,]+\.?\d*)', await symbol_parent_el.inner_text())
+            if numeric:
+                return float(numeric.group(1).replace(",", ""))
+    return None
+
+
+async def variant_button(card: Any, symbol: str) -> Optional[float]:
+    """"from $15.99" inside variant option elements"""
+    pattern = rf'from\s+{re.escape(symbol)}\s*([\d,]+\.\d{{2}})'
+    for selector in VARIANT_SELECTORS:
+        for variant_el in await card.query_selector_all(selector):
+            variant_price_match = re.search(pattern, await variant_el.inner_text())
+            if variant_price_match:
+                return float(variant_price_match.group(1).replace(",", ""))
+    return None
+
+
+STRATEGIES: Dict[str, Callable[[Any, str], Awaitable[Optional[float]]]] = {
+    "offscreen": offscreen,
+    "variant_options": variant_options,
+    "whole_fraction": whole_fraction,
+    "offscreen_any": offscreen_any,
+    "symbol_parent": symbol_parent,
+    "variant_button": variant_button,
+}
+
+# Per marketplace: currency symbol, groups of DOM strategies (groups in fixed
+# order, members in default order), card-text patterns and the last-resort
+# "any amount" pattern
+PROFILES: Dict[str, Tuple[str, List[List[str]], List[Tuple[str, str]], str]] = {
+    "amazon_in": (
+        "₹",
+        [["variant_options"], ["offscreen", "whole_fraction", "offscreen_any"]],
+        [
+            (r'\d+\s+options?\s+from\s+₹\s*([\d,]+)', "Pattern: X option(s) from ₹XX"),
+            (r'from\s+₹\s*([\d,]+)', "Pattern: from ₹XX"),
+            (r'Price:\s*₹\s*([\d,]+)', "Pattern: Price: ₹XX"),
+            (r'₹\s*([\d,]+)', "Pattern: ₹XX"),
+        ],
+        r'₹\s*([\d,]+)',
+    ),
+    "amazon_us": (
+        "$",
+        [["variant_options"], ["offscreen", "whole_fraction", "offscreen_any", "symbol_parent"], ["variant_button"]],
+        [
+            # Variant patterns (higher priority for multi-option cards)
+            (r'\d+\s+options?\s+from\s+\$\s*([\d,]+\.\d{2})', "Pattern: X option(s) from $XX.XX"),
+            (r'from\s+\$\s*([\d,]+\.\d{2})', "Pattern: from $XX.XX"),
+            # Standard patterns
+            (r'Price:\s*\$\s*([\d,]+\.\d{2})', "Pattern: Price: $XX.XX"),
+            (r'\$\s*([\d,]+\.\d{2})', "Pattern: $XX.XX"),
+            (r'\$\s*([\d,]+)', "Pattern: $XX (no decimals)"),
+            (r'([\d,]+\.\d{2})\s+with', "Pattern: XX.XX with"),
+        ],
+        r'\$\s*([\d,]+\.?\d*)',
+    ),
+}
+
+
+def price_from_text(card_text: str, patterns: List[Tuple[str, str]], any_amount: str) -> Tuple[Optional[float], Optional[str]]:
+    """Regexes over the card text, then the first positive amount anywhere"""
+    for pattern, desc in patterns:
+        price_match = re.search(pattern, card_text)
+        if price_match:
+            try:
+                return float(price_match.group(1).replace(",", "")), f"Text: {desc}"
+            except ValueError:
+                pass
+    for price_str in re.findall(any_amount, card_text):
+        try:
+            price = float(price_str.replace(",", ""))
+        except ValueError:
+            continue
+        if price > 0:
+            return price, "Text: first amount"
+    return None, None
+
+
+async def extract_price(card: Any, card_text: str, marketplace: str) -> Tuple[Optional[float], Optional[str]]:
+    """(price, strategy name) for one result card; (None, None) if nothing matched"""
+    symbol, groups, text_patterns, any_amount = PROFILES[marketplace]
+    for group in groups:
+        tried = []
+        for name in selector_stats.order(marketplace, "price", group):
+            tried.append(name)
+            try:
+                price = await STRATEGIES[name](card, symbol)
+            except Exception:
+                price = None
+            if price is not None:
+                selector_stats.record(marketplace, "price", tried, name)
+                return price, name
+        selector_stats.record(marketplace, "price", tried, None)
+    price, name = price_from_text(card_text, text_patterns, any_amount)
+    if name:
+        note_strategy("price", name)
+    return price, name
@@ -1,30 +1,66 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
-from fastapi import FastAPI, HTTPException, Request, Depends
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response, Depends
+from fastapi.security import HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 import nest_asyncio
 
 try:
-    from .agent import analyze_prompt, generate_quick_notes
-    from .scraper import flipkart_search_products_async
-    from .ranking import rank_products
-    from .deep_agent import DeepShoppingAgent
+    from .scrape_scheduler import drain, browser_slots, size_browser_slots
+    from .scraper_pool import scraper_pool
+    from .query_warmer import query_warmer, search_region, WARMER_ENABLED
+    from .enrichment import details_cache
+    from .scraper_runtime import marketplaces_for_region, display_name
     from .utils.region import get_region_from_ip
     from .logging_system import setup_logging, get_recent_logs
-    from .auth import get_current_user, optional_verify_token
+    from .responses import render, project, parse_fields
+    from .jobs import JobQueue, QueueFullError
+    from .rate_limit import RateLimited, marketplace_limiter, user_limiter, user_key
+    from .circuit_breaker import circuit_breakers
+    from .extraction_telemetry import extraction_telemetry
+    from .startup import (
+        LazyModule, BackgroundWarmup, STARTUP_BUDGET_S, start_import_profile_if_requested,
+    )
 except ImportError:
     import sys
     import os
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from shopapp.agent import analyze_prompt, generate_quick_notes
-    from shopapp.scraper import flipkart_search_products_async
-    from shopapp.ranking import rank_products
-    from shopapp.deep_agent import DeepShoppingAgent
+    from shopapp.scrape_scheduler import drain, browser_slots, size_browser_slots
+    from shopapp.scraper_pool import scraper_pool
+    from shopapp.query_warmer import query_warmer, search_region, WARMER_ENABLED
+    from shopapp.enrichment import details_cache
+    from shopapp.scraper_runtime import marketplaces_for_region, display_name
     from shopapp.utils.region import get_region_from_ip
     from shopapp.logging_system import setup_logging, get_recent_logs
-    from shopapp.auth import get_current_user, optional_verify_token
+    from shopapp.responses import render, project, parse_fields
+    from shopapp.jobs import JobQueue, QueueFullError
+    from shopapp.rate_limit import RateLimited, marketplace_limiter, user_limiter, user_key
+    from shopapp.circuit_breaker import circuit_breakers
+    from shopapp.extraction_telemetry import extraction_telemetry
+    from shopapp.startup import (
+        LazyModule, BackgroundWarmup, STARTUP_BUDGET_S, start_import_profile_if_requested,
+    )
+
+# Heavy modules (langchain/openai, playwright, numpy) load on first use or in the warmup thread
+_PACKAGE = __package__ or "shopapp"
+agent_module = LazyModule(f"{_PACKAGE}.agent")
+ranking_module = LazyModule(f"{_PACKAGE}.ranking")
+deep_agent_module = LazyModule(f"{_PACKAGE}.deep_agent")
+entity_resolution_module = LazyModule(f"{_PACKAGE}.agents.entity_resolution")
+agent_ranking_module = LazyModule(f"{_PACKAGE}.agents.ranking")
+price_history_module = LazyModule(f"{_PACKAGE}.price_history")
+thumbnails_module = LazyModule(f"{_PACKAGE}.thumbnails")
+auth_module = LazyModule(f"{_PACKAGE}.auth")
+
+# How long a request waits for the background warmup before loading what it needs itself
+WARMUP_WAIT_S = 30.0
 
 # Apply nest_asyncio to allow nested event loops
 nest_asyncio.apply()
@@ -32,12 +68,81 @@ nest_asyncio.apply()
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="Shopper Agent API")
 
-@app.on_event("startup")
-async def startup_event():
+def _build_deep_agent(app: FastAPI) -> None:
+    deep_agent = deep_agent_module.DeepShoppingAgent()
+    deep_agent.warm_up()
+    app.state.deep_agent = deep_agent
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build long-lived resources once per process and release them on exit.
+
+    Startup only wires things up, so health checks are served immediately;
+    heavy imports and the shared deep shopping agent are built and warmed by
+    a background thread. If the agent cannot be built there (e.g. missing
+    OPENAI_API_KEY) requests retry lazily via _get_deep_agent.
+    """
     setup_logging()
-    print("Shopper Agent API started - logging system initialized")
+    start_import_profile_if_requested()
+    app.state.deep_agent = None
+    app.state.warmup = BackgroundWarmup([
+        ("imports", lambda: [m.load() for m in (
+            agent_module, ranking_module, entity_resolution_module, deep_agent_module
+        )]),
+        ("deep_agent", lambda: _build_deep_agent(app)),
+    ]).start()
+
+    app.state.started_at = time.time()
+    app.state.startup_s = round(time.perf_counter() - _IMPORT_STARTED, 3)
+    print(f"Shopper Agent API started in {app.state.startup_s:.2f}s - logging system initialized")
+    if app.state.startup_s > STARTUP_BUDGET_S:
+        print(f"WARNING: startup took {app.state.startup_s:.2f}s, budget is {STARTUP_BUDGET_S:.2f}s")
+
+    scraper_pool.start()
+    size_browser_slots()
+    if WARMER_ENABLED:
+        query_warmer.start()
+    app.state.job_queue = JobQueue(_run_search_job).start()
+
+    yield
+
+    await app.state.job_queue.stop()
+    await query_warmer.stop()
+    # Let running scrapes close their browsers before the process exits
+    drained = await drain(timeout=30.0)
+    if not drained:
+        print("Shutdown: some scrapes were still running after 30s")
+    await asyncio.to_thread(scraper_pool.stop)
+    size_browser_slots()
+    if agent_ranking_module.loaded:
+        agent_ranking_module.ranking_cache.clear()
+    if price_history_module.loaded:
+        price_history_module.price_history.close()
+    app.state.deep_agent = None
+    print("Shopper Agent API stopped")
+
+
+app = FastAPI(title="Shopper Agent API", lifespan=lifespan)
+
+
+async def _wait_for_warmup(app: FastAPI) -> None:
+    """Let the first requests ride on the warmup thread instead of importing on the event loop"""
+    warmup = getattr(app.state, "warmup", None)
+    if warmup is not None:
+        await warmup.wait_async(timeout=WARMUP_WAIT_S)
+
+
+async def _get_deep_agent(app: FastAPI) -> Any:
+    """Shared DeepShoppingAgent, built on first use if startup could not create it"""
+    await _wait_for_warmup(app)
+    deep_agent = getattr(app.state, "deep_agent", None)
+    if deep_agent is None:
+        deep_agent = await asyncio.to_thread(deep_agent_module.DeepShoppingAgent)
+        app.state.deep_agent = deep_agent
+    return deep_agent
 
 app.add_middleware(
     CORSMiddleware,
@@ -52,6 +157,12 @@ class SearchRequest(BaseModel):
     marketplace: str = "flipkart"  # Default to flipkart
     mode: str = "scraper"  # "scraper" or "deep-agent"
 
+class ProductOffer(BaseModel):
+    source: str
+    price: float
+    url: str
+    rating: Optional[float] = None
+
 class Product(BaseModel):
     title: str
     price: float
@@ -59,11 +170,14 @@ class Product(BaseModel):
     url: str
     image_url: Optional[str] = None
     source: str = "Flipkart"
+    offers: List[ProductOffer] = []
 
 class SearchResponse(BaseModel):
     products: List[Product]
     analysis: str
     quick_notes: Optional[str] = None
+    # Marketplaces skipped because their scraper keeps failing (circuit open)
+    unavailable_sources: List[str] = []
 
 
 def _get_client_ip(request: Request) -> Optional[str]:
@@ -111,8 +225,148 @@ def _resolve_location(preferred_marketplace: str, detected_country: Optional[str
     return "usa"
 
 
-@app.post("/search", response_model=SearchResponse)
-async def search_products(request: SearchRequest, http_request: Request):
+def _detect_location(request: SearchRequest, http_request: Request) -> str:
+    """Region to scrape: explicit marketplace override, else the caller's IP country"""
+    detected_country = None
+    try:
+        client_ip = _get_client_ip(http_request)
+        detected_country = get_region_from_ip(client_ip)
+    except Exception as region_error:
+        # Region detection must never break the main flow
+        print(f"Region detection failed: {region_error}")
+    return _resolve_location(request.marketplace, detected_country)
+
+
+async def _caller_key(http_request: Request) -> str:
+    """Rate-limit key: the Auth0 subject of a valid bearer token, else the client IP"""
+    claims = None
+    authorization = http_request.headers.get("authorization", "")
+    if authorization.startswith("Bearer "):
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=authorization[7:])
+        try:
+            # verify_token may refresh the cached JWKS over HTTP
+            claims = auth_module.get_current_user(await asyncio.to_thread(auth_module.verify_token, credentials))
+        except Exception:
+            # Searching does not require sign-in; a bad token just counts against the IP
+            claims = None
+    return user_key(claims, _get_client_ip(http_request))
+
+
+async def enforce_user_rate_limit(http_request: Request) -> None:
+    """Per-user token bucket for the search endpoints; 429 with Retry-After on overflow"""
+    try:
+        await user_limiter.acquire(await _caller_key(http_request))
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": e.retry_after_header})
+
+
+async def run_scraper_search(user_prompt: str, location: str, app: FastAPI) -> SearchResponse:
+    """Scraper pipeline: analyze the prompt, search the region's marketplaces, rank, summarize"""
+    await _wait_for_warmup(app)
+
+    # 1. Analyze Prompt
+    print(f"Analyzing prompt: {user_prompt}")
+    try:
+        prefs = agent_module.analyze_prompt(user_prompt)
+        analysis_summary = f"Searching for '{prefs.query}'"
+        if prefs.min_price: analysis_summary += f", Min Price: {prefs.min_price}"
+        if prefs.max_price: analysis_summary += f", Max Price: {prefs.max_price}"
+    except Exception as e:
+        print(f"Agent analysis failed: {e}, using query as-is")
+        try:
+            from .models import ProductSearchPreferences
+        except ImportError:
+            from shopapp.models import ProductSearchPreferences
+        prefs = ProductSearchPreferences(query=user_prompt)
+        analysis_summary = f"Searching for '{user_prompt}'"
+
+    # 2. Scrape for the resolved location
+    print(f"Scraping for location: {location}, query: {prefs.query}")
+
+    query_warmer.record(location, prefs)
+
+    ranked_products_with_score = []
+
+    try:
+        # Popular queries come from the warm cache; otherwise every marketplace for the
+        # region is scraped concurrently under the shared browser limit, then merged and ranked
+        marketplaces = marketplaces_for_region(location)
+        print(f"Searching {location} retailers: {', '.join(display_name(m) for m in marketplaces)}")
+        ranked_products_with_score = await search_region(
+            location, prefs, max_results=10, time_budget=120.0
+        )
+
+    except RateLimited:
+        raise
+    except Exception as scrape_error:
+        print(f"Scraping failed: {scrape_error}")
+        import traceback
+        print(traceback.format_exc())
+
+    unavailable = [display_name(m) for m in circuit_breakers.unavailable(marketplaces_for_region(location))]
+    if unavailable:
+        analysis_summary += f". Temporarily unavailable: {', '.join(unavailable)}"
+
+    if not ranked_products_with_score:
+        return SearchResponse(
+            products=[], analysis=analysis_summary + ". No products found.", unavailable_sources=unavailable
+        )
+
+    # Format response
+    response_products = []
+    for prod, score in ranked_products_with_score:
+        # Ensure price is a float
+        try:
+            price_val = float(prod.price) if prod.price is not None else 0.0
+        except (ValueError, TypeError):
+            price_val = 0.0
+
+        # Ensure rating is a float
+        try:
+            rating_val = float(prod.rating) if prod.rating else 0.0
+        except (ValueError, TypeError):
+            rating_val = 0.0
+
+        response_products.append(Product(
+            title=prod.title,
+            price=price_val,
+            rating=rating_val,
+            url=prod.url,
+            image_url=getattr(prod, 'thumbnail_url', None),
+            source=prod.marketplace,
+            offers=[
+                ProductOffer(
+                    source=offer.marketplace,
+                    price=offer.price or 0.0,
+                    url=offer.url,
+                    rating=offer.rating
+                )
+                for offer in prod.offers
+            ]
+        ))
+
+    # Generate Quick Notes
+    print("Generating quick notes...")
+    quick_notes = agent_module.generate_quick_notes(response_products)
+
+    return SearchResponse(
+        products=response_products,
+        analysis=analysis_summary,
+        quick_notes=quick_notes,
+        unavailable_sources=unavailable,
+    )
+
+
+@app.post("/search", response_model=SearchResponse, dependencies=[Depends(enforce_user_rate_limit)])
+async def search_products(request: SearchRequest, http_request: Request, fields: Optional[str] = None):
+    """
+    Search the marketplaces of the caller's region.
+
+    `fields` (e.g. "title,price,url,image_url") trims every product to the
+    listed columns; large responses are brotli/gzip compressed. Answers 429
+    with Retry-After when the caller or the region's marketplaces are over
+    their rate limits.
+    """
     try:
         user_prompt = request.query
         if not user_prompt:
@@ -120,166 +374,16 @@ async def search_products(request: SearchRequest, http_request: Request):
 
         if request.mode == "deep-agent":
             # Pass along the original HTTP request so deep agent can resolve IP/headers
-            return await search_deep_agent(request, http_request)
-
-        # 1. Analyze Prompt
-        print(f"Analyzing prompt: {user_prompt}")
-        try:
-            prefs = analyze_prompt(user_prompt)
-            analysis_summary = f"Searching for '{prefs.query}'"
-            if prefs.min_price: analysis_summary += f", Min Price: {prefs.min_price}"
-            if prefs.max_price: analysis_summary += f", Max Price: {prefs.max_price}"
-        except Exception as e:
-            print(f"Agent analysis failed: {e}, using query as-is")
-            try:
-                from .models import ProductSearchPreferences
-            except ImportError:
-                from shopapp.models import ProductSearchPreferences
-            prefs = ProductSearchPreferences(query=user_prompt)
-            analysis_summary = f"Searching for '{user_prompt}'"
-
-        # 2. Determine region and scrape based on location
-        detected_country = None
-        try:
-            client_ip = _get_client_ip(http_request)
-            detected_country = get_region_from_ip(client_ip)
-        except Exception as region_error:
-            # Region detection must never break the main flow
-            print(f"Region detection failed: {region_error}")
-
-        location = _resolve_location(request.marketplace, detected_country)
-        print(f"Scraping for location: {location}, country: {detected_country}, query: {prefs.query}")
-        
-        all_products = []
-        
-        try:
-            import asyncio
-            
-            # Run scraper in a separate thread to avoid event loop conflicts
-            def run_scraper_sync(scraper_func, source_name):
-                """Run the async scraper in a new event loop in a separate thread"""
-                import asyncio
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    result = loop.run_until_complete(
-                        scraper_func(prefs.query, max_results=10, headless=True)
-                    )
-                    for prod in result:
-                        prod.marketplace = source_name
-                    return result
-                except Exception as e:
-                    print(f"Error in {source_name} scraper: {e}")
-                    return []
-                finally:
-                    loop.close()
-            
-            # Determine which scrapers to use based on location
-            if location == "india":
-                print("Scraping Indian retailers: Flipkart, Amazon.in")
-                try:
-                    from .scraper import flipkart_search_products_async
-                    from .scraper_amazon import amazon_search_products_async
-                except ImportError:
-                    from shopapp.scraper import flipkart_search_products_async
-                    from shopapp.scraper_amazon import amazon_search_products_async
-                
-                scrapers = [
-                    (flipkart_search_products_async, "Flipkart"),
-                    (amazon_search_products_async, "Amazon.in"),
-                ]
-            else:  # USA
-                print("Scraping US retailers: Walmart, Target, Amazon.com, Etsy, Best Buy")
-                try:
-                    from .scraper_walmart import walmart_search_products_async
-                    from .scraper_target import target_search_products_async
-                    from .scraper_amazon_us import amazon_us_search_products_async
-                    from .scraper_etsy import etsy_search_products_async
-                    from .scraper_bestbuy import bestbuy_search_products_async
-                except ImportError:
-                    from shopapp.scraper_walmart import walmart_search_products_async
-                    from shopapp.scraper_target import target_search_products_async
-                    from shopapp.scraper_amazon_us import amazon_us_search_products_async
-                    from shopapp.scraper_etsy import etsy_search_products_async
-                    from shopapp.scraper_bestbuy import bestbuy_search_products_async
-                
-                scrapers = [
-                    (walmart_search_products_async, "Walmart"),
-                    (target_search_products_async, "Target"),
-                    (amazon_us_search_products_async, "Amazon.com"),
-                    (etsy_search_products_async, "Etsy"),
-                    (bestbuy_search_products_async, "Best Buy"),
-                ]
-            
-            # Run all scrapers concurrently with timeout
-            scraper_tasks = []
-            for scraper_func, source_name in scrapers:
-                task = asyncio.to_thread(run_scraper_sync, scraper_func, source_name)
-                scraper_tasks.append(task)
-            
-            # Wait for all scrapers with timeout
-            results = await asyncio.wait_for(
-                asyncio.gather(*scraper_tasks, return_exceptions=True),
-                timeout=120.0
-            )
-            
-            # Combine results from all scrapers
-            for result in results:
-                if isinstance(result, list):
-                    all_products.extend(result)
-                elif isinstance(result, Exception):
-                    print(f"Scraper failed with exception: {result}")
-            
-            print(f"Total products scraped: {len(all_products)}")
-            
-        except asyncio.TimeoutError:
-            print("Scraping timed out after 120 seconds")
-        except Exception as scrape_error:
-            print(f"Scraping failed: {scrape_error}")
-            import traceback
-            print(traceback.format_exc())
-        
-        if not all_products:
-            return SearchResponse(products=[], analysis=analysis_summary + ". No products found.")
+            return await search_deep_agent(request, http_request, fields)
 
-        # 3. Rank
-        print("Ranking products...")
-        try:
-            ranked_products_with_score = rank_products(all_products, prefs)
-        except Exception as rank_error:
-            print(f"Ranking failed: {rank_error}, returning unranked products")
-            ranked_products_with_score = [(p, 0.0) for p in all_products]
-        
-        # Format response
-        response_products = []
-        for prod, score in ranked_products_with_score:
-            # Ensure price is a float
-            try:
-                price_val = float(prod.price) if prod.price is not None else 0.0
-            except (ValueError, TypeError):
-                price_val = 0.0
-
-            # Ensure rating is a float
-            try:
-                rating_val = float(prod.rating) if prod.rating else 0.0
-            except (ValueError, TypeError):
-                rating_val = 0.0
-
-            response_products.append(Product(
-                title=prod.title,
-                price=price_val,
-                rating=rating_val,
-                url=prod.url,
-                image_url=getattr(prod, 'thumbnail_url', None),
-                source=prod.marketplace
-            ))
-
-        # Generate Quick Notes
-        print("Generating quick notes...")
-        quick_notes = generate_quick_notes(response_products)
-
-        return SearchResponse(products=response_products, analysis=analysis_summary, quick_notes=quick_notes)
+        location = _detect_location(request, http_request)
+        response = await run_scraper_search(user_prompt, location, http_request.app)
+        return render(http_request, response, fields)
 
+    except HTTPException:
+        raise
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": e.retry_after_header})
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -323,58 +427,75 @@ async def search_test(request: SearchRequest):
 async def test_endpoint(request: SearchRequest):
     return {"message": f"Received query: {request.query}"}
 
-@app.post("/search-deep-agent")
-async def search_deep_agent(request: SearchRequest, http_request: Request):
+
+async def run_deep_agent_search(user_prompt: str, location: str, app: FastAPI) -> SearchResponse:
+    """
+    Deep-agent pipeline mapped onto the /search response shape. Raises
+    RateLimited up front when every marketplace of the region is backed up.
+    """
+    marketplace_limiter.check(marketplaces_for_region(location))
+    deep_agent = await _get_deep_agent(app)
+    result = await deep_agent.process_shopping_request(user_prompt, location)
+
+    products = []
+    for prod_data in result.get("products", []):
+        price_str = prod_data.get("price", "0")
+        try:
+            price_val = float(price_str.replace("₹", "").replace("$", "").replace(",", "").strip())
+        except (ValueError, AttributeError):
+            price_val = 0.0
+
+        rating_str = prod_data.get("rating", "0")
+        try:
+            rating_val = float(rating_str) if rating_str else 0.0
+        except (ValueError, TypeError):
+            rating_val = 0.0
+
+        products.append(Product(
+            title=prod_data.get("title", "Unknown Product"),
+            price=price_val,
+            rating=rating_val,
+            url=prod_data.get("url", ""),
+            image_url=prod_data.get("image_url"),
+            source=prod_data.get("source", "Web Search"),
+            offers=[
+                ProductOffer(
+                    source=offer.get("source", ""),
+                    price=offer.get("price") or 0.0,
+                    url=offer.get("url", ""),
+                    rating=offer.get("rating")
+                )
+                for offer in prod_data.get("offers", [])
+            ]
+        ))
+
+    analysis = result.get("query_understanding", {}).get("notes", "Analysis completed")
+    quick_notes = result.get("quick_notes", "")
+
+    return SearchResponse(
+        products=products,
+        analysis=analysis,
+        quick_notes=quick_notes
+    )
+
+
+@app.post("/search-deep-agent", response_model=SearchResponse, dependencies=[Depends(enforce_user_rate_limit)])
+async def search_deep_agent(request: SearchRequest, http_request: Request, fields: Optional[str] = None):
     try:
         user_prompt = request.query
         if not user_prompt:
             raise HTTPException(status_code=400, detail="Query cannot be empty")
 
-        detected_country = None
-        try:
-            client_ip = _get_client_ip(http_request)
-            detected_country = get_region_from_ip(client_ip)
-        except Exception as region_error:
-            print(f"Region detection failed (deep agent): {region_error}")
-
-        location = _resolve_location(request.marketplace, detected_country)
-        print(f"Deep Agent Mode - Processing: {user_prompt}, Location: {location}, Country: {detected_country}")
-
-        deep_agent = DeepShoppingAgent()
-        result = await deep_agent.process_shopping_request(user_prompt, location)
-
-        products = []
-        for prod_data in result.get("products", []):
-            price_str = prod_data.get("price", "0")
-            try:
-                price_val = float(price_str.replace("₹", "").replace("$", "").replace(",", "").strip())
-            except (ValueError, AttributeError):
-                price_val = 0.0
-
-            rating_str = prod_data.get("rating", "0")
-            try:
-                rating_val = float(rating_str) if rating_str else 0.0
-            except (ValueError, TypeError):
-                rating_val = 0.0
-
-            products.append(Product(
-                title=prod_data.get("title", "Unknown Product"),
-                price=price_val,
-                rating=rating_val,
-                url=prod_data.get("url", ""),
-                image_url=prod_data.get("image_url"),
-                source=prod_data.get("source", "Web Search")
-            ))
-
-        analysis = result.get("query_understanding", {}).get("notes", "Analysis completed")
-        quick_notes = result.get("quick_notes", "")
+        location = _detect_location(request, http_request)
+        print(f"Deep Agent Mode - Processing: {user_prompt}, Location: {location}")
 
-        return SearchResponse(
-            products=products,
-            analysis=analysis,
-            quick_notes=quick_notes
-        )
+        response = await run_deep_agent_search(user_prompt, location, http_request.app)
+        return render(http_request, response, fields)
 
+    except HTTPException:
+        raise
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": e.retry_after_header})
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -382,6 +503,127 @@ async def search_deep_agent(request: SearchRequest, http_request: Request):
         print(f"Full traceback:\n{error_details}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _run_search_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Job-queue runner: the same pipelines as /search and /search-deep-agent"""
+    if params["mode"] == "deep-agent":
+        response = await run_deep_agent_search(params["query"], params["location"], app)
+    else:
+        response = await run_scraper_search(params["query"], params["location"], app)
+    return response.model_dump(mode="json")
+
+
+@app.post("/search/jobs", status_code=202, dependencies=[Depends(enforce_user_rate_limit)])
+async def create_search_job(request: SearchRequest, http_request: Request):
+    """
+    Queue a search and return its job ID immediately.
+
+    Poll GET /search/jobs/{job_id}?wait=30 for the result. Answers 503 with
+    Retry-After when the job backlog is full.
+    """
+    if not request.query:
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    # Region lookup is a blocking HTTP call; keep it off the event loop
+    location = await asyncio.to_thread(_detect_location, request, http_request)
+    try:
+        job = await http_request.app.state.job_queue.submit({
+            "query": request.query,
+            "mode": request.mode,
+            "marketplace": request.marketplace,
+            "location": location,
+        })
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    return {"job_id": job["id"], "status": job["status"], "poll_url": f"/search/jobs/{job['id']}"}
+
+
+@app.get("/search/jobs/{job_id}")
+async def get_search_job(job_id: str, http_request: Request, wait: float = 0.0, fields: Optional[str] = None):
+    """
+    Job status, and the SearchResponse once done.
+
+    `wait` long-polls up to that many seconds (max 60) for the job to
+    finish; `fields` projects the result's products like /search.
+    """
+    job = await http_request.app.state.job_queue.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    result = job["result"]
+    return render(http_request, {
+        "job_id": job["id"],
+        "status": job["status"],
+        "query": job["params"]["query"],
+        "mode": job["params"]["mode"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"],
+        "result": project(result, parse_fields(fields)) if result else None,
+    })
+
+
+@app.get("/thumb")
+async def thumbnail(url: str, request: Request, w: Optional[int] = None):
+    """
+    Downsized, disk-cached copy of a marketplace product image.
+
+    Served with a strong ETag and a one-year immutable Cache-Control;
+    If-None-Match revalidation answers 304 without a body.
+    """
+    thumbs = thumbnails_module
+    try:
+        content, content_type, etag = await thumbs.thumbnail_cache.fetch(url, w)
+    except thumbs.ThumbnailError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    if thumbs.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=thumbs.thumb_headers(etag))
+    return Response(content=content, media_type=content_type, headers=thumbs.thumb_headers(etag))
+
+
+@app.get("/healthz")
+async def healthz(request: Request):
+    """Liveness check; answers as soon as the app is up, warm or not"""
+    warmup = getattr(request.app.state, "warmup", None)
+    started_at = getattr(request.app.state, "started_at", None)
+    return {
+        "status": "ok",
+        "startup_s": getattr(request.app.state, "startup_s", None),
+        "uptime_s": round(time.time() - started_at, 1) if started_at else None,
+        "warmup": warmup.status() if warmup else None,
+    }
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    """Queue depths and cache stats of the scraping pipeline"""
+    job_queue = getattr(request.app.state, "job_queue", None)
+    return {
+        "browser_slots": {
+            "limit": browser_slots.limit,
+            "pool_capacity": scraper_pool.capacity if scraper_pool.active else None,
+            "in_use": browser_slots.in_use,
+            "waiting": browser_slots.waiting,
+        },
+        "scraper_pool": scraper_pool.stats() if scraper_pool.active else None,
+        "search_jobs": job_queue.stats() if job_queue else None,
+        "query_warmer": query_warmer.stats(),
+        "circuit_breakers": circuit_breakers.stats(),
+        "extraction": extraction_telemetry.stats(),
+        "rate_limits": {
+            "marketplaces": marketplace_limiter.stats(),
+            "users": user_limiter.stats(),
+        },
+        "caches": {
+            "details": details_cache.stats(),
+            "ranking": agent_ranking_module.ranking_cache.stats() if agent_ranking_module.loaded else None,
+            "thumbnails": thumbnails_module.thumbnail_cache.stats() if thumbnails_module.loaded else None,
+        },
+        "price_history": price_history_module.price_history.stats() if price_history_module.loaded else None,
+    }
+
 @app.get("/")
 async def root():
     return {"message": "Shopper Agent API is running"}
@@ -1,4 +1,6 @@
 import os
+import threading
+import time
 from typing import Optional
 from fastapi import HTTPException, Security, Depends
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
@@ -9,17 +11,51 @@ AUTH0_DOMAIN = os.getenv('AUTH0_DOMAIN')
 AUTH0_AUDIENCE = os.getenv('AUTH0_AUDIENCE')
 ALGORITHMS = ["RS256"]
 
+# Auth0 signing keys rotate rarely: keep the JWKS for this long
+JWKS_CACHE_TTL_S = float(os.getenv('JWKS_CACHE_TTL_S', '3600'))
+# A token signed by an unknown key triggers a refetch at most this often
+JWKS_MIN_REFRESH_S = 60
+
 security = HTTPBearer()
 
-def get_public_key():
+_jwks = None
+_jwks_fetched_at = 0.0
+_jwks_lock = threading.Lock()
+
+def get_public_key(force_refresh: bool = False):
+    """Cached JWKS; refetched after JWKS_CACHE_TTL_S, or on force_refresh (rate-limited)"""
+    global _jwks, _jwks_fetched_at
+    with _jwks_lock:
+        age = time.monotonic() - _jwks_fetched_at
+        if _jwks and age < JWKS_CACHE_TTL_S and (not force_refresh or age < JWKS_MIN_REFRESH_S):
+            return _jwks
+
     jwks_url = f'https://{AUTH0_DOMAIN}/.well-known/jwks.json'
     try:
         response = requests.get(jwks_url, timeout=10)
         response.raise_for_status()
-        return response.json()
+        jwks = response.json()
     except Exception as e:
         print(f"Error fetching JWKS: {e}")
-        return None
+        # A stale key set still verifies tokens while Auth0 is unreachable
+        return _jwks
+
+    with _jwks_lock:
+        _jwks = jwks
+        _jwks_fetched_at = time.monotonic()
+    return jwks
+
+def _find_rsa_key(jwks: dict, kid: str) -> dict:
+    for key in jwks.get("keys", []):
+        if key["kid"] == kid:
+            return {
+                "kty": key["kty"],
+                "kid": key["kid"],
+                "use": key["use"],
+                "n": key["n"],
+                "e": key["e"]
+            }
+    return {}
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
     if not AUTH0_DOMAIN or not AUTH0_AUDIENCE:
@@ -33,18 +69,11 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Security(security))
             raise HTTPException(status_code=500, detail="Unable to fetch JWKS")
 
         unverified_header = jwt.get_unverified_header(token)
-        rsa_key = {}
-
-        for key in jwks.get("keys", []):
-            if key["kid"] == unverified_header["kid"]:
-                rsa_key = {
-                    "kty": key["kty"],
-                    "kid": key["kid"],
-                    "use": key["use"],
-                    "n": key["n"],
-                    "e": key["e"]
-                }
-                break
+        rsa_key = _find_rsa_key(jwks, unverified_header["kid"])
+        if not rsa_key:
+            # The key may have been rotated since the JWKS was cached
+            jwks = get_public_key(force_refresh=True) or jwks
+            rsa_key = _find_rsa_key(jwks, unverified_header["kid"])
 
         if not rsa_key:
             raise HTTPException(status_code=401, detail="Unable to find appropriate key")
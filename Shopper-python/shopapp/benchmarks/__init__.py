@@ -0,0 +1 @@
+# Offline benchmarks and load tools for the scrapers and API
@@ -0,0 +1,70 @@
+"""
+Record live scrapes into HAR archives and replay them offline.
+
+Usage (from Shopper-python/):
+    python -m shopapp.benchmarks.capture record --marketplaces walmart,target --query "laptop"
+    python -m shopapp.benchmarks.capture replay --marketplaces walmart,target --query "laptop"
+
+Archives are written to captures/<marketplace>/<query-slug>-<sha1[:8]>.har, the
+slug being cut to 60 characters and the hash taken over the full query (override with
+--capture-dir or SHOPPER_CAPTURE_DIR). Replay serves only recorded responses,
+so it is deterministic and runs without network access.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List, Optional
+
+try:
+    from ..scraper_runtime import (
+        MARKETPLACES, CAPTURE_MODE_ENV, CAPTURE_DIR_ENV, DEFAULT_CAPTURE_DIR,
+        capture_path, load_scraper,
+    )
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from shopapp.scraper_runtime import (
+        MARKETPLACES, CAPTURE_MODE_ENV, CAPTURE_DIR_ENV, DEFAULT_CAPTURE_DIR,
+        capture_path, load_scraper,
+    )
+
+
+async def run_capture(mode: str, marketplaces: List[str], queries: List[str], max_results: int) -> None:
+    os.environ[CAPTURE_MODE_ENV] = mode
+
+    for marketplace in marketplaces:
+        scraper = load_scraper(marketplace)
+        for query in queries:
+            start = time.perf_counter()
+            try:
+                products = await scraper(query, max_results=max_results, headless=True)
+            except Exception as e:
+                print(f"{mode} failed for {marketplace} / '{query}': {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            print(f"{mode}: {marketplace} / '{query}' -> {len(products)} products "
+                  f"in {elapsed:.1f}s ({capture_path(marketplace, query)})")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Record/replay Playwright scraper traffic")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--marketplaces", default=",".join(MARKETPLACES))
+    parser.add_argument("--query", action="append", dest="queries",
+                        help="Search query (repeatable)")
+    parser.add_argument("--max-results", type=int, default=10)
+    parser.add_argument("--capture-dir", default=os.getenv(CAPTURE_DIR_ENV, DEFAULT_CAPTURE_DIR))
+    args = parser.parse_args(argv)
+
+    os.environ[CAPTURE_DIR_ENV] = args.capture_dir
+    marketplaces = [m.strip() for m in args.marketplaces.split(",") if m.strip()]
+    unknown = [m for m in marketplaces if m not in MARKETPLACES]
+    if unknown:
+        parser.error(f"Unknown marketplaces: {', '.join(unknown)}")
+
+    asyncio.run(run_capture(args.mode, marketplaces, args.queries or ["laptop"], args.max_results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import re
+import time
+from typing import Any, List
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+# Modules that construct ChatOpenAI clients at call or init time
+PATCHED_MODULES = [
+    "agent",
+    "agents.orchestrator",
+    "agents.gift_ideation",
+    "agents.ranking",
+]
+
+
+class FakeChatOpenAI:
+    """
+    Deterministic stand-in for langchain_openai.ChatOpenAI.
+
+    Recognises each agent by its system prompt and answers with a canned but
+    well-formed response. `invoke` blocks for `latency_ms` like the real sync
+    client does; `ainvoke` awaits instead.
+    """
+
+    latency_ms = 0
+    calls = 0
+
+    def __init__(self, *args, **kwargs):
+        self.kwargs = kwargs
+
+    def invoke(self, messages: Any, *args, **kwargs) -> AIMessage:
+        FakeChatOpenAI.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return AIMessage(content=self._respond(messages))
+
+    async def ainvoke(self, messages: Any, *args, **kwargs) -> AIMessage:
+        FakeChatOpenAI.calls += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return AIMessage(content=self._respond(messages))
+
+    def with_structured_output(self, schema):
+        return _FakeStructuredOutput(self, schema)
+
+    def _respond(self, messages: Any) -> str:
+        system, human = _split_messages(messages)
+
+        if "shopping orchestrator" in system:
+            return json.dumps(_intent_for(human))
+        if "gift ideation specialist" in system:
+            return json.dumps(["Kindle Paperwhite e-reader", "Premium yoga mat", "Wireless headphones"])
+        if "expert shopping advisor" in system:
+            return json.dumps(_ranking_for(human))
+        return "- Solid range of options across budgets\n- Well reviewed picks available"
+
+
+class _FakeStructuredOutput:
+    def __init__(self, llm: FakeChatOpenAI, schema):
+        self.llm = llm
+        self.schema = schema
+
+    def invoke(self, prompt: Any, *args, **kwargs):
+        FakeChatOpenAI.calls += 1
+        if self.llm.latency_ms:
+            time.sleep(self.llm.latency_ms / 1000)
+        _, human = _split_messages(prompt)
+        return self.schema(query=human)
+
+
+def _split_messages(messages: Any):
+    if isinstance(messages, str):
+        return "", messages
+    system, human = "", ""
+    for msg in messages if isinstance(messages, list) else [messages]:
+        content = msg.content if isinstance(msg, BaseMessage) else str(msg)
+        if getattr(msg, "type", "") == "system":
+            system += content
+        else:
+            human += content
+    return system, human
+
+
+def _intent_for(human: str) -> dict:
+    match = re.search(r"User query:\s*(.+)", human)
+    query = match.group(1).strip() if match else human.strip()
+    is_gift = "gift" in query.lower()
+    return {
+        "understanding": {
+            "refined_query": query,
+            "product_category": "electronics",
+            "budget_min": None,
+            "budget_max": None,
+            "key_features": [],
+            "is_gift": is_gift,
+            "occasion": "birthday" if is_gift else None,
+            "recipient_profile": None,
+            "urgency": "medium",
+        },
+        "routing": {
+            "needs_gift_ideation": is_gift,
+            "needs_research": False,
+            "query_type": "gift_shopping" if is_gift else "direct_search",
+            "complexity": "simple",
+            "estimated_search_queries": 3 if is_gift else 1,
+        },
+        "constraints": {"must_have": [], "nice_to_have": [], "exclude": []},
+    }
+
+
+def _ranking_for(human: str) -> List[dict]:
+    # Candidate table rows start with the product index: "12|title|price|..."
+    indices = [int(i) for i in re.findall(r"^(\d+)\|", human, flags=re.MULTILINE)]
+    return [
+        {
+            "product_index": idx,
+            "rank": rank,
+            "overall_score": max(0, 90 - rank * 3),
+            "match_score": 70,
+            "value_assessment": "good",
+            "reasoning": "Matches the request at a fair price",
+            "recommendation": "Good pick",
+        }
+        for rank, idx in enumerate(indices, 1)
+    ]
+
+
+def install(package: str = "shopapp", latency_ms: int = 0) -> None:
+    """Swap ChatOpenAI for FakeChatOpenAI in every module that uses it"""
+    import importlib
+
+    FakeChatOpenAI.latency_ms = latency_ms
+    for name in PATCHED_MODULES:
+        module = importlib.import_module(f"{package}.{name}")
+        module.ChatOpenAI = FakeChatOpenAI
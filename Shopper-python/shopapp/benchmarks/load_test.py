@@ -0,0 +1,207 @@
+"""
+End-to-end load test for /search and /search-deep-agent.
+
+Runs the FastAPI app in-process against a deterministic fake LLM and the
+local marketplace stand-in, drives it at a fixed concurrency and reports
+throughput, latency percentiles, browser count, RSS and event-loop lag.
+The app's lifespan runs around the load (httpx's ASGITransport does not
+start it), so scrapes go through the scraper pool and search jobs as in
+production.
+
+Usage (from Shopper-python/):
+    python -m shopapp.benchmarks.load_test --endpoint search --concurrency 8 --requests 32
+    python -m shopapp.benchmarks.load_test --endpoint search-deep-agent --llm-latency-ms 400
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    from ..scraper_runtime import ORIGIN_OVERRIDE_ENV
+    from . import fake_llm
+    from .metrics import percentile, process_tree_stats
+    from .server import MarketplaceStandIn
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from shopapp.scraper_runtime import ORIGIN_OVERRIDE_ENV
+    from shopapp.benchmarks import fake_llm
+    from shopapp.benchmarks.metrics import percentile, process_tree_stats
+    from shopapp.benchmarks.server import MarketplaceStandIn
+
+DEFAULT_QUERIES = [
+    "gaming laptop under 60000",
+    "noise cancelling headphones",
+    "birthday gift for my sister who likes reading",
+    "air fryer",
+]
+DEFAULT_OUTPUT_DIR = "bench_results"
+
+
+class ResourceSampler:
+    """Background thread sampling process-tree RSS and live browser count"""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self.samples: List[Dict[str, float]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        pid = os.getpid()
+        while not self._stop.is_set():
+            self.samples.append(process_tree_stats(pid))
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Dict[str, float]:
+        self._stop.set()
+        self._thread.join()
+        if not self.samples:
+            return {}
+        return {
+            "peak_tree_rss_mb": max(s["tree_rss_mb"] for s in self.samples),
+            "peak_browsers": max(s["browsers"] for s in self.samples),
+            "mean_browsers": round(sum(s["browsers"] for s in self.samples) / len(self.samples), 2),
+        }
+
+
+async def monitor_loop_lag(stop: asyncio.Event, lags: List[float], interval: float = 0.05):
+    """Record how late the event loop wakes a sleeping task (ms)"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, (loop.time() - start - interval) * 1000))
+
+
+async def run_load(app, endpoint: str, queries: List[str], marketplace: str,
+                   concurrency: int, total: int, timeout: float) -> Dict[str, Any]:
+    import httpx
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lags: List[float] = []
+    stop = asyncio.Event()
+    next_request = iter(range(total))
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+
+        async def worker():
+            for i in next_request:
+                payload = {"query": queries[i % len(queries)], "marketplace": marketplace}
+                start = time.perf_counter()
+                try:
+                    resp = await client.post(f"/{endpoint}", json=payload)
+                    key = str(resp.status_code)
+                except Exception as e:
+                    key = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                statuses[key] = statuses.get(key, 0) + 1
+
+        lag_task = asyncio.create_task(monitor_loop_lag(stop, lags))
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await lag_task
+
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 3) if elapsed else 0.0,
+        "latency_s": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies), 3) if latencies else 0.0,
+        },
+        "statuses": statuses,
+        "loop_lag_ms": {
+            "p50": round(percentile(lags, 50), 1),
+            "p99": round(percentile(lags, 99), 1),
+            "max": round(max(lags), 1) if lags else 0.0,
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Load-test /search with stubbed LLM and marketplaces")
+    parser.add_argument("--endpoint", choices=["search", "search-deep-agent"], default="search")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--marketplace", default="usa", help="Region override sent in the request body")
+    parser.add_argument("--query", action="append", dest="queries", help="Query to cycle through (repeatable)")
+    parser.add_argument("--llm-latency-ms", type=int, default=300, help="Simulated latency per fake LLM call")
+    parser.add_argument("--server-latency-ms", type=int, default=0, help="Simulated marketplace latency")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request client timeout")
+    parser.add_argument("--output", help="JSON output path (default: bench_results/load_<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("OPENAI_API_KEY", "load-test")
+    # Measure the live scrape path, not the popular-query cache
+    os.environ.setdefault("SEARCH_CACHE_TTL", "0")
+    os.environ.setdefault("QUERY_WARMER_ENABLED", "0")
+    # The stand-in only serves search pages
+    os.environ.setdefault("ENRICHMENT_ENABLED", "0")
+    # Every simulated user shares one IP and hits a local stand-in, not the real sites
+    os.environ.setdefault("USER_RATE_PER_MIN", "0")
+    os.environ.setdefault("MARKETPLACE_RATE_PER_MIN", "0")
+
+    with MarketplaceStandIn(latency_ms=args.server_latency_ms) as stand_in:
+        os.environ[ORIGIN_OVERRIDE_ENV] = stand_in.origin_template()
+
+        from shopapp import api
+        fake_llm.install("shopapp", latency_ms=args.llm_latency_ms)
+        # Region lookup calls external IP services; the body's marketplace decides instead
+        api.get_region_from_ip = lambda *a, **k: "India"
+
+        sampler = ResourceSampler()
+        sampler.start()
+        print(f"Driving /{args.endpoint}: {args.requests} requests at concurrency {args.concurrency}")
+        result = asyncio.run(run_load(
+            api.app, args.endpoint, args.queries or DEFAULT_QUERIES, args.marketplace,
+            args.concurrency, args.requests, args.timeout,
+        ))
+        result.update(sampler.stop())
+        result["marketplace_requests"] = stand_in.requests_served
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "marketplace": args.marketplace,
+        "llm_latency_ms": args.llm_latency_ms,
+        "llm_calls": fake_llm.FakeChatOpenAI.calls,
+        "result": result,
+    }
+
+    lat = result["latency_s"]
+    print(f"throughput: {result['throughput_rps']} req/s")
+    print(f"latency p50/p95/p99: {lat['p50']}s / {lat['p95']}s / {lat['p99']}s")
+    print(f"statuses: {result['statuses']}")
+    print(f"loop lag p99/max: {result['loop_lag_ms']['p99']}ms / {result['loop_lag_ms']['max']}ms")
+    print(f"peak browsers: {result.get('peak_browsers')}, peak RSS: {result.get('peak_tree_rss_mb')} MB")
+
+    output = args.output or os.path.join(
+        DEFAULT_OUTPUT_DIR, f"load_{args.endpoint}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import math
+import os
+import resource
+import sys
+import threading
+from typing import Dict
+
+
+def _maxrss_mb(who: int) -> float:
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(rss / divisor, 1)
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Peak RSS of this process and of its reaped children (browsers, driver)"""
+    return {
+        "python_peak_rss_mb": _maxrss_mb(resource.RUSAGE_SELF),
+        "children_peak_rss_mb": _maxrss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def current_rss_mb(pid: str = "self") -> float:
+    """Current RSS from /proc; returns 0.0 where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return 0.0
+
+
+class RpcCounter:
+    """
+    Counts protocol messages sent from Python to the Playwright driver.
+
+    Every awaited Playwright call (query_selector, inner_text, goto, ...)
+    is one message, so this is the number of browser round-trips a
+    scraper pays for.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.by_method: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._original = None
+
+    def install(self) -> "RpcCounter":
+        from playwright._impl._connection import Connection
+
+        original = Connection._send_message_to_server
+        counter = self
+
+        def counting_send(conn, object, method, params, timeout, no_reply=False):
+            with counter._lock:
+                counter.count += 1
+                counter.by_method[method] = counter.by_method.get(method, 0) + 1
+            return original(conn, object, method, params, timeout, no_reply)
+
+        Connection._send_message_to_server = counting_send
+        self._original = original
+        return self
+
+    def uninstall(self):
+        if self._original is not None:
+            from playwright._impl._connection import Connection
+            Connection._send_message_to_server = self._original
+            self._original = None
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.by_method = {}
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty sample"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def process_tree_stats(root_pid: int) -> Dict[str, float]:
+    """
+    RSS of a process plus all its descendants, and how many of them are
+    browser main processes (Chromium processes without a --type= flag).
+    """
+    children: Dict[int, list] = {}
+    try:
+        pids = [int(p) for p in os.listdir("/proc") if p.isdigit()]
+    except OSError:
+        return {"tree_rss_mb": current_rss_mb(), "browsers": 0}
+
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                stat = f.read()
+            # ppid is the second field after the parenthesised command name
+            ppid = int(stat.rsplit(")", 1)[1].split()[1])
+            children.setdefault(ppid, []).append(pid)
+        except (OSError, ValueError, IndexError):
+            continue
+
+    tree = [root_pid]
+    stack = [root_pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            tree.append(child)
+            stack.append(child)
+
+    rss = 0.0
+    browsers = 0
+    for pid in tree:
+        rss += current_rss_mb(str(pid))
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmd = f.read().replace(b"\0", b" ").decode("utf-8", "ignore")
+        except OSError:
+            continue
+        if ("chrom" in cmd.lower() or "headless_shell" in cmd) and "--type=" not in cmd:
+            browsers += 1
+
+    return {"tree_rss_mb": round(rss, 1), "browsers": browsers}
@@ -0,0 +1,197 @@
+"""
+Offline scraper benchmark suite.
+
+Serves the recorded search pages in benchmarks/fixtures from a local HTTP
+stand-in (or replays HAR captures with --replay), runs each marketplace
+scraper against them in a fresh process and reports wall time, Playwright
+RPC count, peak RSS and products extracted.
+
+Usage (from Shopper-python/):
+    python -m shopapp.benchmarks.run_benchmarks
+    python -m shopapp.benchmarks.run_benchmarks --marketplaces walmart,target --repeat 3
+    python -m shopapp.benchmarks.run_benchmarks --compare bench_results/previous.json
+    python -m shopapp.benchmarks.run_benchmarks --replay captures --query "laptop"
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    from ..scraper_runtime import (
+        MARKETPLACES, ORIGIN_OVERRIDE_ENV, CAPTURE_MODE_ENV, CAPTURE_DIR_ENV, load_scraper,
+    )
+    from .metrics import RpcCounter, peak_rss_mb
+    from .server import FIXTURES_DIR, MarketplaceStandIn
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from shopapp.scraper_runtime import (
+        MARKETPLACES, ORIGIN_OVERRIDE_ENV, CAPTURE_MODE_ENV, CAPTURE_DIR_ENV, load_scraper,
+    )
+    from shopapp.benchmarks.metrics import RpcCounter, peak_rss_mb
+    from shopapp.benchmarks.server import FIXTURES_DIR, MarketplaceStandIn
+
+DEFAULT_QUERY = "laptop"
+DEFAULT_OUTPUT_DIR = "bench_results"
+
+
+def _run_scraper_process(marketplace: str, query: str, env: Dict[str, str], max_results: int, results) -> None:
+    """Child process entry point: one scraper run with fresh RSS accounting"""
+    os.environ.update(env)
+    counter = RpcCounter().install()
+    scraper = load_scraper(marketplace)
+
+    error = None
+    products = []
+    start = time.perf_counter()
+    try:
+        products = asyncio.run(scraper(query, max_results=max_results, headless=True))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall_time = time.perf_counter() - start
+
+    run = {
+        "wall_time_s": round(wall_time, 3),
+        "rpc_count": counter.count,
+        "rpc_by_method": dict(sorted(counter.by_method.items(), key=lambda x: -x[1])),
+        "products": len(products),
+        "products_with_price": sum(1 for p in products if p.price is not None),
+        "products_with_rating": sum(1 for p in products if p.rating is not None),
+        "error": error,
+    }
+    run.update(peak_rss_mb())
+    results.put(run)
+
+
+def run_once(marketplace: str, query: str, env: Dict[str, str], max_results: int, timeout: float) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(
+        target=_run_scraper_process,
+        args=(marketplace, query, env, max_results, results),
+    )
+    proc.start()
+    try:
+        run = results.get(timeout=timeout)
+    except Exception:
+        run = {"error": f"timed out after {timeout}s"}
+    proc.join(timeout=5)
+    if proc.is_alive():
+        proc.kill()
+    return run
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [r for r in runs if not r.get("error")]
+    if not ok:
+        return {"runs_ok": 0, "runs_failed": len(runs)}
+
+    return {
+        "runs_ok": len(ok),
+        "runs_failed": len(runs) - len(ok),
+        "wall_time_s_median": round(statistics.median(r["wall_time_s"] for r in ok), 3),
+        "wall_time_s_min": min(r["wall_time_s"] for r in ok),
+        "rpc_count_median": statistics.median(r["rpc_count"] for r in ok),
+        "python_peak_rss_mb_max": max(r["python_peak_rss_mb"] for r in ok),
+        "children_peak_rss_mb_max": max(r["children_peak_rss_mb"] for r in ok),
+        "products_median": statistics.median(r["products"] for r in ok),
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    header = f"{'marketplace':<12} {'wall s':>8} {'rpcs':>7} {'py MB':>7} {'child MB':>9} {'products':>9}"
+    print(header)
+    print("-" * len(header))
+    for marketplace, result in report["results"].items():
+        s = result["summary"]
+        if not s.get("runs_ok"):
+            print(f"{marketplace:<12} FAILED: {result['runs'][-1].get('error')}")
+            continue
+
+        line = (
+            f"{marketplace:<12} {s['wall_time_s_median']:>8.2f} {s['rpc_count_median']:>7.0f} "
+            f"{s['python_peak_rss_mb_max']:>7.1f} {s['children_peak_rss_mb_max']:>9.1f} {s['products_median']:>9.0f}"
+        )
+        base = (baseline or {}).get("results", {}).get(marketplace, {}).get("summary", {})
+        if base.get("runs_ok"):
+            wall_delta = s["wall_time_s_median"] - base["wall_time_s_median"]
+            rpc_delta = s["rpc_count_median"] - base["rpc_count_median"]
+            line += f"   (wall {wall_delta:+.2f}s, rpcs {rpc_delta:+.0f} vs baseline)"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Offline scraper benchmark suite")
+    parser.add_argument("--marketplaces", default=",".join(MARKETPLACES),
+                        help="Comma-separated marketplace keys")
+    parser.add_argument("--query", default=DEFAULT_QUERY)
+    parser.add_argument("--max-results", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=180.0, help="Per-run timeout in seconds")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Directory of recorded <marketplace>.html pages")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Artificial per-request server latency")
+    parser.add_argument("--replay", metavar="CAPTURE_DIR",
+                        help="Replay HAR captures from this directory instead of serving fixtures")
+    parser.add_argument("--output", help="JSON output path (default: bench_results/scrapers_<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to diff against")
+    args = parser.parse_args(argv)
+
+    marketplaces = [m.strip() for m in args.marketplaces.split(",") if m.strip()]
+    unknown = [m for m in marketplaces if m not in MARKETPLACES]
+    if unknown:
+        parser.error(f"Unknown marketplaces: {', '.join(unknown)}")
+
+    report: Dict[str, Any] = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "query": args.query,
+        "max_results": args.max_results,
+        "repeat": args.repeat,
+        "latency_ms": args.latency_ms,
+        "source": f"replay:{args.replay}" if args.replay else f"fixtures:{args.fixtures}",
+        "python": sys.version.split()[0],
+        "results": {},
+    }
+
+    def bench_all(env: Dict[str, str]) -> None:
+        for marketplace in marketplaces:
+            runs = []
+            for i in range(args.repeat):
+                print(f"Benchmarking {marketplace} (run {i + 1}/{args.repeat})...")
+                runs.append(run_once(marketplace, args.query, env, args.max_results, args.timeout))
+            report["results"][marketplace] = {"runs": runs, "summary": summarize(runs)}
+
+    if args.replay:
+        print(f"Replaying captures from {args.replay}")
+        bench_all({CAPTURE_MODE_ENV: "replay", CAPTURE_DIR_ENV: args.replay})
+    else:
+        with MarketplaceStandIn(fixtures_dir=args.fixtures, latency_ms=args.latency_ms) as stand_in:
+            print(f"Serving fixtures from {args.fixtures} at {stand_in.origin}")
+            bench_all({ORIGIN_OVERRIDE_ENV: stand_in.origin_template()})
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print()
+    print_report(report, baseline)
+
+    output = args.output or os.path.join(
+        DEFAULT_OUTPUT_DIR, f"scrapers_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import base64
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# 1x1 transparent GIF returned for every image request
+PIXEL_GIF = base64.b64decode("R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".avif")
+
+
+class MarketplaceStandIn:
+    """
+    Local HTTP stand-in that serves recorded marketplace search pages.
+
+    Requests are routed by their first path segment, so a scraper pointed
+    at "http://127.0.0.1:<port>/walmart" receives fixtures/walmart.html for
+    its search URL and a placeholder pixel for any image it requests.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        fixtures_dir: str = FIXTURES_DIR,
+        latency_ms: int = 0,
+    ):
+        self.fixtures_dir = fixtures_dir
+        self.latency_ms = latency_ms
+        self.requests_served = 0
+        self._lock = threading.Lock()
+        self._pages = {}
+        for name in os.listdir(fixtures_dir):
+            if name.endswith(".html"):
+                with open(os.path.join(fixtures_dir, name), "rb") as f:
+                    self._pages[name[:-5]] = f.read()
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def origin(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def origin_template(self) -> str:
+        """Value for SHOPPER_MARKETPLACE_ORIGIN"""
+        return f"{self.origin}/{{marketplace}}"
+
+    def start(self) -> "MarketplaceStandIn":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stand_in._lock:
+                    stand_in.requests_served += 1
+                if stand_in.latency_ms:
+                    time.sleep(stand_in.latency_ms / 1000)
+
+                path = self.path.split("?", 1)[0]
+                marketplace = path.strip("/").split("/", 1)[0]
+
+                if path.lower().endswith(IMAGE_EXTENSIONS):
+                    self._send(200, "image/gif", PIXEL_GIF)
+                elif marketplace in stand_in._pages:
+                    self._send(200, "text/html; charset=utf-8", stand_in._pages[marketplace])
+                else:
+                    self._send(404, "text/plain", b"not found")
+
+            def _send(self, status: int, content_type: str, body: bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,189 @@
+"""
+Circuit breakers for the marketplace scrapers.
+
+Every scrape ends as one outcome: success, empty (no products), error or
+timeout. Each marketplace keeps the outcomes of the last CIRCUIT_WINDOW_S
+seconds; once at least CIRCUIT_MIN_CALLS are in the window and the share of
+non-successes reaches CIRCUIT_FAILURE_RATE, the circuit opens and that
+marketplace is skipped outright instead of burning a browser and a minute
+per search. After CIRCUIT_OPEN_S the circuit goes half-open and lets
+CIRCUIT_PROBES trial scrapes through: a success closes it, a failure opens
+it again with the cool-down doubled (up to CIRCUIT_MAX_OPEN_S).
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+CIRCUIT_WINDOW_S = float(os.getenv("CIRCUIT_WINDOW_S", "300"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.6"))
+CIRCUIT_OPEN_S = float(os.getenv("CIRCUIT_OPEN_S", "120"))
+CIRCUIT_MAX_OPEN_S = float(os.getenv("CIRCUIT_MAX_OPEN_S", "1800"))
+CIRCUIT_PROBES = int(os.getenv("CIRCUIT_PROBES", "1"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+SUCCESS, EMPTY, ERROR, TIMEOUT = "success", "empty", "error", "timeout"
+OUTCOMES = (SUCCESS, EMPTY, ERROR, TIMEOUT)
+
+
+class CircuitOpen(Exception):
+    """The marketplace is being skipped; retry after `retry_after` seconds"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit open for {name}, next probe in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def classify(products: Optional[List[Any]], error: Optional[BaseException] = None) -> str:
+    """Outcome of one scrape from its result or exception"""
+    if error is not None:
+        # Playwright raises its own TimeoutError ("Timeout 60000ms exceeded")
+        text = f"{type(error).__name__} {error}".lower()
+        return TIMEOUT if "timeout" in text else ERROR
+    return SUCCESS if products else EMPTY
+
+
+class CircuitBreaker:
+    """Sliding-window breaker for one marketplace; thread-safe"""
+
+    def __init__(
+        self,
+        name: str,
+        window_s: float = CIRCUIT_WINDOW_S,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        failure_rate: float = CIRCUIT_FAILURE_RATE,
+        open_s: float = CIRCUIT_OPEN_S,
+        max_open_s: float = CIRCUIT_MAX_OPEN_S,
+        probes: int = CIRCUIT_PROBES,
+    ):
+        self.name = name
+        self.window_s = window_s
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.base_open_s = open_s
+        self.max_open_s = max_open_s
+        self.probes = max(1, probes)
+        self.state = CLOSED
+        self.open_s = open_s
+        self.opened_at = 0.0
+        self.probing = 0
+        self.times_opened = 0
+        self.skipped = 0
+        self._window: Deque[Tuple[float, str]] = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        while self._window and self._window[0][0] < now - self.window_s:
+            self._window.popleft()
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self.probing = 0
+        self.times_opened += 1
+        print(f"Circuit opened for {self.name} for {self.open_s:.0f}s")
+
+    def retry_in(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.opened_at + self.open_s - now) if self.state == OPEN else 0.0
+
+    def is_open(self, now: Optional[float] = None) -> bool:
+        """Cheap pre-check: True while open and still cooling down"""
+        with self._lock:
+            return self.state == OPEN and self.retry_in(now) > 0
+
+    def check(self, now: Optional[float] = None) -> None:
+        """Raise CircuitOpen (counted as a skip) while open and cooling down"""
+        with self._lock:
+            retry_in = self.retry_in(now)
+            if self.state == OPEN and retry_in > 0:
+                self.skipped += 1
+                raise CircuitOpen(self.name, retry_in)
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """Whether a scrape may run now; half-open admits up to `probes` trials"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == OPEN and self.retry_in(now) <= 0:
+                self.state = HALF_OPEN
+                self.probing = 0
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self.probing < self.probes:
+                self.probing += 1
+                return True
+            self.skipped += 1
+            return False
+
+    def record(self, outcome: str, now: Optional[float] = None) -> None:
+        """Report how an allowed scrape ended"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probing = max(0, self.probing - 1)
+                if outcome == SUCCESS:
+                    print(f"Circuit closed for {self.name}")
+                    self.state = CLOSED
+                    self.open_s = self.base_open_s
+                    self._window.clear()
+                else:
+                    self.open_s = min(self.open_s * 2, self.max_open_s)
+                    self._open(now)
+                return
+            if self.state == OPEN:
+                # Scrape that started before the circuit opened
+                return
+
+            self._window.append((now, outcome))
+            self._prune(now)
+            failures = sum(1 for _, o in self._window if o != SUCCESS)
+            if len(self._window) >= self.min_calls and failures / len(self._window) >= self.failure_rate:
+                self._open(now)
+
+    def stats(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._prune(now)
+            counts = {outcome: 0 for outcome in OUTCOMES}
+            for _, outcome in self._window:
+                counts[outcome] += 1
+            calls = len(self._window)
+            return {
+                "state": self.state,
+                "calls": calls,
+                "outcomes": counts,
+                "failure_rate": round((calls - counts[SUCCESS]) / calls, 3) if calls else 0.0,
+                "retry_in_s": round(self.retry_in(now), 1),
+                "times_opened": self.times_opened,
+                "skipped": self.skipped,
+            }
+
+
+class CircuitBreakers:
+    """One breaker per marketplace key, created on first use"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name)
+            return breaker
+
+    def unavailable(self, names: Iterable[str]) -> List[str]:
+        """Those of `names` currently being skipped"""
+        return [name for name in names if self.get(name).is_open()]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return {name: breaker.stats() for name, breaker in breakers}
+
+
+circuit_breakers = CircuitBreakers()
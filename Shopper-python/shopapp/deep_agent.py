@@ -34,6 +34,10 @@ class DeepShoppingAgent:
         self.framework = MultiAgentShoppingFramework()
         print("Deep Shopping Agent initialized with Multi-Agent Framework")
 
+    def warm_up(self) -> None:
+        """Pre-load scraper modules and shared indexes before the first request"""
+        self.framework.warm_up()
+
     async def process_shopping_request(self, user_request: str, location: str = "india") -> Dict[str, Any]:
         """
         Process shopping request using Multi-Agent Framework
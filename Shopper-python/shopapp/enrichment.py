@@ -0,0 +1,323 @@
+"""
+Product-detail enrichment for the top of a ranking.
+
+Search result cards carry no feature bullets, review counts or delivery
+text, so feature matching in ranking.score_product only sees titles. After
+the first ranking, the detail pages of the top-K products are loaded
+concurrently in a single browser (one slot of the shared browser limit)
+under a strict deadline, their details are merged into the products and
+the list is ranked again. Details are cached per URL, so repeat results
+cost no page loads.
+
+Detail pages hit the same sites as the scrapers, so marketplaces with an
+open circuit are left out and every page load takes a token from the
+marketplace's rate limiter; pages whose token would only come after the
+deadline are dropped.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from .cache import TTLCache
+    from .scrape_scheduler import browser_slots, BrowserSlots
+    from .scraper_runtime import MARKETPLACES, resolve_url, capture_mode
+    from .rate_limit import marketplace_limiter, RateLimited
+    from .circuit_breaker import circuit_breakers
+except ImportError:
+    from shopapp.cache import TTLCache
+    from shopapp.scrape_scheduler import browser_slots, BrowserSlots
+    from shopapp.scraper_runtime import MARKETPLACES, resolve_url, capture_mode
+    from shopapp.rate_limit import marketplace_limiter, RateLimited
+    from shopapp.circuit_breaker import circuit_breakers
+
+ENRICHMENT_ENABLED = os.getenv("ENRICHMENT_ENABLED", "1").lower() in ("1", "true", "yes")
+ENRICHMENT_TOP_K = int(os.getenv("ENRICHMENT_TOP_K", "5"))
+# Whole enrichment stage, including waiting for a browser
+ENRICHMENT_DEADLINE_S = float(os.getenv("ENRICHMENT_DEADLINE_S", "12"))
+ENRICHMENT_CACHE_TTL = float(os.getenv("ENRICHMENT_CACHE_TTL", str(6 * 3600)))
+MAX_FEATURES = 12
+# Shortest time worth starting a page load with
+MIN_PAGE_S = 1.0
+
+details_cache = TTLCache(maxsize=int(os.getenv("ENRICHMENT_CACHE_SIZE", "2048")), ttl=ENRICHMENT_CACHE_TTL)
+
+# Detail-page selectors per marketplace key; JSON-LD is tried first everywhere
+DETAIL_SELECTORS: Dict[str, Dict[str, List[str]]] = {
+    "amazon": {
+        "features": ["#feature-bullets li span.a-list-item", "#productOverview_feature_div tr"],
+        "rating_count": ["#acrCustomerReviewText"],
+        "delivery": ["#mir-layout-DELIVERY_BLOCK", "#deliveryBlockMessage"],
+    },
+    "flipkart": {
+        "features": ["div._1AN87F li", "li._7eSDEz", "div._2418kt li"],
+        "rating_count": ["span._2_R_DZ", "span.Wphh3N"],
+        "delivery": ["div._3XINqE", "div.hVvnXm"],
+    },
+    "walmart": {
+        "features": ["[data-testid='product-highlights'] li", "#product-description-section li"],
+        "rating_count": ["[itemprop='ratingCount']", "a[link-identifier='reviewsLink']"],
+        "delivery": ["[data-testid='fulfillment-shipping-text']"],
+    },
+    "target": {
+        "features": ["[data-test='item-details-specifications'] div > div", "[data-test='item-highlights'] li"],
+        "rating_count": ["[data-test='ratingCountLink']"],
+        "delivery": ["[data-test='fulfillment-cell-shipping']"],
+    },
+    "etsy": {
+        "features": ["#product-details-content-toggle li", "[data-product-details-description-text-content]"],
+        "rating_count": ["[data-reviews-total]"],
+        "delivery": ["[data-estimated-delivery]"],
+    },
+    "bestbuy": {
+        "features": [".feature-list li", "[data-testid='feature-list'] li"],
+        "rating_count": [".c-reviews"],
+        "delivery": ["[data-testid='fulfillment-shipping']"],
+    },
+}
+GENERIC_SELECTORS = {
+    "features": ["[itemprop='description'] li"],
+    "rating_count": ["[itemprop='ratingCount']", "[itemprop='reviewCount']"],
+    "delivery": [],
+}
+
+EXTRACT_SCRIPT = """
+(selectors) => {
+    const out = {features: [], ratingCount: null, delivery: null, description: null};
+    const text = (el) => (el.innerText || el.textContent || "").replace(/\\s+/g, " ").trim();
+    const toInt = (value) => {
+        const digits = String(value || "").replace(/[^0-9]/g, "");
+        return digits ? parseInt(digits, 10) : null;
+    };
+
+    for (const script of document.querySelectorAll('script[type="application/ld+json"]')) {
+        let data;
+        try { data = JSON.parse(script.textContent); } catch (e) { continue; }
+        for (const item of [].concat(data["@graph"] || data)) {
+            if (!item || !String(item["@type"] || "").includes("Product")) continue;
+            const agg = item.aggregateRating || {};
+            out.ratingCount = out.ratingCount || toInt(agg.reviewCount || agg.ratingCount);
+            for (const prop of [].concat(item.additionalProperty || [])) {
+                if (prop && prop.name && prop.value) out.features.push(`${prop.name}: ${prop.value}`);
+            }
+            if (item.description && !out.description) out.description = String(item.description).slice(0, 600);
+        }
+    }
+
+    for (const sel of selectors.features) {
+        for (const el of document.querySelectorAll(sel)) {
+            const t = text(el);
+            if (t.length >= 3 && t.length <= 200) out.features.push(t);
+        }
+    }
+    for (const sel of selectors.rating_count) {
+        if (out.ratingCount) break;
+        const el = document.querySelector(sel);
+        if (el) out.ratingCount = toInt(el.getAttribute("content") || text(el).split(/ratings?|reviews?/i)[0]);
+    }
+    for (const sel of selectors.delivery) {
+        const el = document.querySelector(sel);
+        if (el && text(el)) { out.delivery = text(el).slice(0, 200); break; }
+    }
+    return out;
+}
+"""
+
+_DISPLAY_TO_KEY = {entry[2]: key for key, entry in MARKETPLACES.items()}
+
+
+def _selectors_for(marketplace_key: str) -> Dict[str, List[str]]:
+    for prefix, selectors in DETAIL_SELECTORS.items():
+        if marketplace_key.startswith(prefix):
+            return {name: selectors.get(name, []) + GENERIC_SELECTORS[name] for name in GENERIC_SELECTORS}
+    return GENERIC_SELECTORS
+
+
+def _normalize_details(raw: Dict[str, Any]) -> Dict[str, Any]:
+    features = []
+    seen = set()
+    candidates = list(raw.get("features") or [])
+    if not candidates and raw.get("description"):
+        candidates = [part.strip() for part in raw["description"].split(".")]
+    for feature in candidates:
+        key = feature.lower()
+        if feature and key not in seen:
+            seen.add(key)
+            features.append(feature)
+        if len(features) >= MAX_FEATURES:
+            break
+    return {
+        "primary_features": features,
+        "rating_count": raw.get("ratingCount"),
+        "delivery_info": raw.get("delivery"),
+    }
+
+
+async def _fetch_pages(targets: List[Tuple[str, str, float]], deadline: float) -> Dict[str, Dict[str, Any]]:
+    """Load every (marketplace key, url, delay) in one browser, one page each, until `deadline`"""
+    from playwright.async_api import async_playwright
+
+    results: Dict[str, Dict[str, Any]] = {}
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context(
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+            viewport={"width": 1920, "height": 1080},
+        )
+
+        # Only the DOM and inline JSON matter; skip the heavy assets
+        async def block_assets(route):
+            if route.request.resource_type in ("image", "media", "font", "stylesheet"):
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await context.route("**/*", block_assets)
+
+        async def load(marketplace_key: str, url: str, delay: float) -> None:
+            # Wait for this page's rate-limit token
+            if delay > 0:
+                await asyncio.sleep(delay)
+            page = await context.new_page()
+            try:
+                remaining_ms = max(int(MIN_PAGE_S * 1000), int((deadline - time.monotonic()) * 1000))
+                await page.goto(resolve_url(marketplace_key, url), wait_until="domcontentloaded", timeout=remaining_ms)
+                raw = await page.evaluate(EXTRACT_SCRIPT, _selectors_for(marketplace_key))
+                results[url] = _normalize_details(raw)
+            except Exception as e:
+                print(f"Enrichment failed for {url}: {e}")
+            finally:
+                await page.close()
+
+        tasks = [asyncio.create_task(load(key, url, delay)) for key, url, delay in targets]
+        try:
+            _, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+                print(f"Enrichment deadline reached: {len(pending)} of {len(tasks)} pages dropped")
+        finally:
+            await context.close()
+            await browser.close()
+
+    return results
+
+
+def _fetch_pages_sync(targets: List[Tuple[str, str, float]], deadline: float) -> Dict[str, Dict[str, Any]]:
+    """Run _fetch_pages on a fresh event loop (worker thread), like the scrapers"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(_fetch_pages(targets, deadline))
+    except Exception as e:
+        print(f"Enrichment browser error: {e}")
+        return {}
+    finally:
+        loop.close()
+
+
+async def fetch_details(
+    products: List[Any],
+    deadline_s: float = ENRICHMENT_DEADLINE_S,
+    slots: Optional[BrowserSlots] = None,
+    priority: int = 0,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Details per product URL: cached ones immediately, the rest loaded in
+    parallel within `deadline_s`. Pages that miss the deadline are left out.
+    """
+    slots = slots or browser_slots
+    deadline = time.monotonic() + deadline_s
+
+    details: Dict[str, Dict[str, Any]] = {}
+    targets = []
+    for prod in products:
+        cached = details_cache.get(prod.url)
+        if cached is not None:
+            details[prod.url] = cached
+            continue
+        key = _DISPLAY_TO_KEY.get(prod.marketplace)
+        if key and not circuit_breakers.get(key).is_open() and all(prod.url != url for _, url in targets):
+            targets.append((key, prod.url))
+
+    # Recorded captures only cover search pages
+    if not targets or capture_mode():
+        return details
+
+    try:
+        await asyncio.wait_for(slots.acquire(priority), timeout=max(0.0, deadline - time.monotonic()))
+    except asyncio.TimeoutError:
+        print("Enrichment skipped: no browser became free before the deadline")
+        return details
+
+    paced = []
+    for key, url in targets:
+        try:
+            delay = marketplace_limiter.reserve(key, max_wait=max(0.0, deadline - time.monotonic() - MIN_PAGE_S))
+        except RateLimited:
+            continue
+        paced.append((key, url, delay))
+    if len(paced) < len(targets):
+        print(f"Enrichment rate-limited: {len(targets) - len(paced)} of {len(targets)} pages dropped")
+    if not paced:
+        slots.release()
+        return details
+
+    def run() -> Dict[str, Dict[str, Any]]:
+        try:
+            return _fetch_pages_sync(paced, deadline)
+        finally:
+            slots.release()
+
+    fetched = await asyncio.get_running_loop().run_in_executor(None, run)
+    for url, found in fetched.items():
+        details_cache.set(url, found)
+    details.update(fetched)
+    return details
+
+
+def apply_details(product: Any, details: Optional[Dict[str, Any]]) -> Any:
+    """Copy of `product` with empty fields filled from its detail page"""
+    if not details:
+        return product
+    update = {}
+    if not product.primary_features and details.get("primary_features"):
+        update["primary_features"] = details["primary_features"]
+    if product.rating_count is None and details.get("rating_count"):
+        update["rating_count"] = details["rating_count"]
+    if not product.delivery_info and details.get("delivery_info"):
+        update["delivery_info"] = details["delivery_info"]
+    return product.model_copy(update=update) if update else product
+
+
+async def enrich_and_rerank(
+    ranked: List[Tuple[Any, float]],
+    rank: Callable[[List[Any]], List[Tuple[Any, float]]],
+    top_k: int = ENRICHMENT_TOP_K,
+    deadline_s: float = ENRICHMENT_DEADLINE_S,
+    priority: int = 0,
+) -> List[Tuple[Any, float]]:
+    """
+    Enrich the top-K of a ranking and rank the list again
+
+    `rank` re-scores a list of products (e.g. ranking.rank_products bound to
+    the user's preferences). On any failure the first ranking is returned.
+    """
+    if not ENRICHMENT_ENABLED or not ranked or top_k <= 0:
+        return ranked
+
+    products = [prod for prod, _ in ranked]
+    try:
+        details = await fetch_details(products[:top_k], deadline_s, priority=priority)
+    except Exception as e:
+        print(f"Enrichment failed: {e}")
+        return ranked
+    if not details:
+        return ranked
+
+    enriched = [apply_details(prod, details.get(prod.url)) if i < top_k else prod for i, prod in enumerate(products)]
+    print(f"Enriched {len(details)} of top {min(top_k, len(products))} products")
+    return rank(enriched)
@@ -0,0 +1,179 @@
+"""
+Extraction-yield telemetry per marketplace.
+
+Every finished scrape reports how many result cards the page had, how many
+products came out, how often price, rating, thumbnail and rating_count were
+filled, and which selector or strategy produced each field. Scrapers report
+cards and strategies through `note_cards` / `note_strategy`, which write to
+the ExtractionReport of the scrape running in the current context (a no-op
+outside one); fill rates are computed from the returned products.
+
+Each metric keeps a fast and a slow EWMA per marketplace. When the fast one
+falls more than ALERT_DROP below the slow baseline, an alert is raised
+(printed and listed in /metrics) and the baseline is frozen until the metric
+recovers, so a markup change that empties every Walmart rating shows up
+within a few scrapes instead of when users complain.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+FAST_ALPHA = float(os.getenv("EXTRACTION_FAST_ALPHA", "0.5"))
+SLOW_ALPHA = float(os.getenv("EXTRACTION_SLOW_ALPHA", "0.05"))
+# Relative drop of the fast average below the baseline that raises an alert
+ALERT_DROP = float(os.getenv("EXTRACTION_ALERT_DROP", "0.5"))
+# Scrapes needed before a marketplace's baseline is trusted
+MIN_SCRAPES = int(os.getenv("EXTRACTION_MIN_SCRAPES", "5"))
+# Baselines below these are too weak to alert on (e.g. a field the site rarely shows)
+MIN_BASELINE = {"products": 1.0}
+MIN_RATE_BASELINE = 0.3
+RECENT_SCRAPES = 50
+
+FIELDS = ("price", "rating", "thumbnail", "rating_count")
+METRICS = ("products", "yield") + FIELDS
+
+
+class ExtractionReport:
+    """What one scrape's extraction code observed; filled in by the scraper"""
+
+    def __init__(self, marketplace: str):
+        self.marketplace = marketplace
+        self.cards: Optional[int] = None
+        self.strategies: Dict[str, Counter] = {}
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("extraction_report", default=None)
+
+
+@contextmanager
+def reporting(report: Optional[ExtractionReport]):
+    """Make `report` the target of note_* calls for code run inside (including its event loop)"""
+    token = _current.set(report)
+    try:
+        yield report
+    finally:
+        _current.reset(token)
+
+
+def note_cards(count: int) -> None:
+    report = _current.get()
+    if report is not None:
+        report.cards = count
+
+
+def note_strategy(field: str, name: str) -> None:
+    report = _current.get()
+    if report is not None:
+        report.strategies.setdefault(field, Counter())[name] += 1
+
+
+def _filled(product: Any, field: str) -> bool:
+    if field == "price":
+        return bool(product.price)
+    if field == "thumbnail":
+        url = getattr(product, "thumbnail_url", None)
+        # Lazy-load placeholders are inlined data: URIs
+        return bool(url) and not url.startswith("data:")
+    return getattr(product, field, None) is not None
+
+
+def summarize(report: ExtractionReport, products: List[Any]) -> Dict[str, Any]:
+    """Per-scrape metrics: counts, yield (products per card) and field fill rates"""
+    count = len(products)
+    summary: Dict[str, Any] = {
+        "at": time.time(),
+        "cards": report.cards,
+        "products": count,
+        "yield": round(count / report.cards, 3) if report.cards else None,
+    }
+    for field in FIELDS:
+        summary[field] = round(sum(1 for p in products if _filled(p, field)) / count, 3) if count else None
+    return summary
+
+
+class _MarketplaceYield:
+    def __init__(self):
+        self.scrapes = 0
+        self.fast: Dict[str, float] = {}
+        self.slow: Dict[str, float] = {}
+        self.alerts: Dict[str, Dict[str, Any]] = {}
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=RECENT_SCRAPES)
+        self.strategies: Dict[str, Counter] = {}
+
+
+class ExtractionTelemetry:
+    """Rolling yield statistics and drop alerts for every marketplace; thread-safe"""
+
+    def __init__(self):
+        self._markets: Dict[str, _MarketplaceYield] = {}
+        self._lock = threading.Lock()
+        self.alert_log: Deque[Dict[str, Any]] = deque(maxlen=100)
+
+    def record(self, report: ExtractionReport, products: List[Any]) -> Dict[str, Any]:
+        summary = summarize(report, products)
+        with self._lock:
+            market = self._markets.setdefault(report.marketplace, _MarketplaceYield())
+            market.scrapes += 1
+            market.recent.append(summary)
+            for field, counts in report.strategies.items():
+                market.strategies.setdefault(field, Counter()).update(counts)
+            for metric in METRICS:
+                value = summary[metric]
+                if value is not None:
+                    self._update(report.marketplace, market, metric, float(value))
+        return summary
+
+    def _update(self, marketplace: str, market: _MarketplaceYield, metric: str, value: float) -> None:
+        previous = market.fast.get(metric, value)
+        fast = market.fast[metric] = previous + FAST_ALPHA * (value - previous)
+        alert = market.alerts.get(metric)
+        baseline = market.slow.get(metric, value)
+        floor = MIN_BASELINE.get(metric, MIN_RATE_BASELINE)
+        dropped = market.scrapes > MIN_SCRAPES and baseline >= floor and fast < baseline * (1 - ALERT_DROP)
+
+        if dropped and alert is None:
+            alert = market.alerts[metric] = {
+                "metric": metric,
+                "marketplace": marketplace,
+                "baseline": round(baseline, 3),
+                "recent": round(fast, 3),
+                "since": datetime.now().isoformat(timespec="seconds"),
+            }
+            self.alert_log.append(dict(alert, event="raised"))
+            print(f"ALERT: {marketplace} {metric} dropped from {baseline:.2f} to {fast:.2f}")
+        elif alert is not None and not dropped:
+            del market.alerts[metric]
+            self.alert_log.append(dict(alert, event="cleared", recent=round(fast, 3)))
+            print(f"Recovered: {marketplace} {metric} back to {fast:.2f}")
+        elif alert is not None:
+            alert["recent"] = round(fast, 3)
+
+        # The baseline holds still while degraded, so a lasting drop stays flagged
+        if metric not in market.alerts:
+            market.slow[metric] = baseline + SLOW_ALPHA * (value - baseline)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "marketplaces": {
+                    name: {
+                        "scrapes": market.scrapes,
+                        "last": dict(market.recent[-1]) if market.recent else None,
+                        "recent": {m: round(v, 3) for m, v in market.fast.items()},
+                        "baseline": {m: round(v, 3) for m, v in market.slow.items()},
+                        "strategies": {field: dict(counts.most_common(5)) for field, counts in market.strategies.items()},
+                        "alerts": sorted(market.alerts),
+                    }
+                    for name, market in self._markets.items()
+                },
+                "alerts": [dict(alert) for market in self._markets.values() for alert in market.alerts.values()],
+                "alert_log": list(self.alert_log)[-20:],
+            }
+
+
+extraction_telemetry = ExtractionTelemetry()
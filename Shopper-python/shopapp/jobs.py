@@ -0,0 +1,308 @@
+"""
+Asynchronous search jobs.
+
+POST /search/jobs stores a job and returns its ID at once; a bounded pool
+of worker tasks runs the scraper or deep-agent pipeline and writes the
+result back to a job store. GET /search/jobs/{id}?wait=30 long-polls until
+the job finishes or the wait runs out, so clients never hold a connection
+open for a whole scrape.
+
+Stores share one small interface (create / update / get / purge):
+- InMemoryJobStore: single API process (default).
+- SQLiteJobStore: local stand-in for a shared store such as Redis; several
+  API processes on one host can poll jobs run by any of them.
+Select with JOB_STORE=memory or JOB_STORE=sqlite:/path/to/jobs.db.
+Calls to a blocking store run in a worker thread, so a store busy with
+another process never stalls the event loop.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Jobs allowed to wait for a worker before submissions are refused
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+# Finished jobs are kept this long for polling
+JOB_TTL_S = float(os.getenv("JOB_TTL_S", "3600"))
+JOB_STORE = os.getenv("JOB_STORE", "memory")
+MAX_WAIT_S = 60.0
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+
+class QueueFullError(Exception):
+    """More jobs are waiting than JOB_QUEUE_SIZE allows"""
+
+
+class JobStore(ABC):
+    """Job records are plain dicts: id, status, params, result, error and timestamps"""
+
+    # Whether calls may block on I/O or locks held by other processes
+    blocking = True
+
+    @abstractmethod
+    def create(self, job: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields: Any) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def purge(self, older_than: float) -> int:
+        """Drop finished jobs that finished before `older_than` (epoch seconds)"""
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryJobStore(JobStore):
+    blocking = False
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def purge(self, older_than: float) -> int:
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] in FINISHED and (job.get("finished_at") or 0) < older_than
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+            return len(expired)
+
+
+class SQLiteJobStore(JobStore):
+    """One row per job; params/result are JSON text. WAL mode lets readers poll while workers write."""
+
+    COLUMNS = ("id", "status", "params", "result", "error", "created_at", "started_at", "finished_at")
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT, result TEXT, error TEXT, "
+            "created_at REAL, started_at REAL, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (status, finished_at)")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _encode(field: str, value: Any) -> Any:
+        return json.dumps(value) if field in ("params", "result") and value is not None else value
+
+    def create(self, job: Dict[str, Any]) -> None:
+        values = [self._encode(col, job.get(col)) for col in self.COLUMNS]
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                values,
+            )
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        columns = [col for col in fields if col in self.COLUMNS and col != "id"]
+        if not columns:
+            return
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{col} = ?' for col in columns)} WHERE id = ?",
+                [self._encode(col, fields[col]) for col in columns] + [job_id],
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        for col in ("params", "result"):
+            if job[col] is not None:
+                job[col] = json.loads(job[col])
+        return job
+
+    def purge(self, older_than: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, older_than)
+            )
+            return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_job_store(spec: str = JOB_STORE) -> JobStore:
+    if spec.startswith("sqlite:"):
+        return SQLiteJobStore(spec[len("sqlite:"):] or "jobs.db")
+    if spec != "memory":
+        print(f"Unknown JOB_STORE '{spec}', using memory")
+    return InMemoryJobStore()
+
+
+class JobQueue:
+    """
+    Bounded worker pool over a job store.
+
+    `runner(params)` executes one search and returns a JSON-serialisable
+    result. Completion is signalled in-process for instant long-poll
+    wake-ups; pollers also re-read the store so jobs finished by another
+    process sharing a SQLite store are seen too.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[Dict[str, Any]], Awaitable[Any]],
+        store: Optional[JobStore] = None,
+        workers: int = JOB_WORKERS,
+        max_queued: int = JOB_QUEUE_SIZE,
+    ):
+        self.runner = runner
+        self.store = store or create_job_store()
+        self.workers = max(1, workers)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_queued))
+        self._tasks: List[asyncio.Task] = []
+        self._events: Dict[str, asyncio.Event] = {}
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self) -> "JobQueue":
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        return self
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Whatever never started cannot be run by this process any more
+        while not self._queue.empty():
+            job_id = self._queue.get_nowait()
+            await self._finish(job_id, FAILED, error="Server shut down before the job started")
+        await self._store(self.store.close)
+
+    async def _store(self, method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Call a store method, in a worker thread unless the store never blocks"""
+        if self.store.blocking:
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return method(*args, **kwargs)
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a new job and queue it; raises QueueFullError when the backlog is full"""
+        if self._queue.full():
+            raise QueueFullError(f"{self._queue.qsize()} jobs already waiting")
+        await self._store(self.store.purge, time.time() - JOB_TTL_S)
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "params": params,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        await self._store(self.store.create, job)
+        try:
+            # Other submissions may have filled the queue while the store was written
+            self._queue.put_nowait(job["id"])
+        except asyncio.QueueFull:
+            await self._store(self.store.update, job["id"], status=FAILED, error="Job queue full",
+                              finished_at=time.time())
+            raise QueueFullError(f"{self._queue.qsize()} jobs already waiting")
+        self._events[job["id"]] = asyncio.Event()
+        return job
+
+    async def _worker(self, number: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = await self._store(self.store.get, job_id)
+            if job is None:
+                continue
+            await self._store(self.store.update, job_id, status=RUNNING, started_at=time.time())
+            self.running += 1
+            try:
+                result = await self.runner(job["params"])
+                await self._finish(job_id, DONE, result=result)
+            except asyncio.CancelledError:
+                await self._finish(job_id, FAILED, error="Server shut down while the job was running")
+                raise
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                await self._finish(job_id, FAILED, error=str(e))
+            finally:
+                self.running -= 1
+
+    async def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        await self._store(self.store.update, job_id, status=status, result=result, error=error,
+                          finished_at=time.time())
+        if status == DONE:
+            self.completed += 1
+        else:
+            self.failed += 1
+        event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Job record once finished, or as it stands after `timeout` seconds"""
+        deadline = time.monotonic() + min(max(timeout, 0.0), MAX_WAIT_S)
+        while True:
+            job = await self._store(self.store.get, job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in FINISHED or remaining <= 0:
+                return job
+            event = self._events.get(job_id)
+            try:
+                # Local jobs wake instantly; others are re-read from the store every second
+                await asyncio.wait_for(event.wait() if event else asyncio.sleep(remaining), min(remaining, 1.0))
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
@@ -21,6 +21,17 @@ class ProductSearchPreferences(BaseModel):
     exclude_brands: List[str] = Field(default_factory=list)
     prefer_brands: List[str] = Field(default_factory=list)
 
+class Offer(BaseModel):
+    """
+    One marketplace listing of a product.
+    """
+    marketplace: str
+    url: str
+    price: Optional[float] = None
+    currency: str = "INR"
+    rating: Optional[float] = None
+    rating_count: Optional[int] = None
+
 class Product(BaseModel):
     """
     Normalized product representation.
@@ -36,3 +47,7 @@ class Product(BaseModel):
     thumbnail_url: Optional[str] = None
     primary_features: List[str] = Field(default_factory=list)
     delivery_info: Optional[str] = None
+    offers: List[Offer] = Field(
+        default_factory=list,
+        description="Per-marketplace listings when the same product was found on several stores.",
+    )
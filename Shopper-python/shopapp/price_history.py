@@ -0,0 +1,402 @@
+"""
+Append-only price history for every scraped listing.
+
+Observations are (product key, timestamp, price) rows keyed by a canonical
+product ID derived from the listing URL, so the same listing found by
+different queries shares one history.
+
+On disk (PRICE_HISTORY_DIR):
+- wal.bin: append-only log of fixed-width 16-byte rows
+  (uint64 key hash, uint32 unix seconds, float32 price).
+- seg-<gen>/: compacted columnar segment, rows grouped by key:
+  keys.npy (sorted unique keys), offsets.npy (CSR row ranges),
+  ts.npy / price.npy (by time) and sorted_price.npy (by price).
+  Segments are memory-mapped, so millions of rows cost no heap.
+- CURRENT: name of the live segment.
+
+Compaction freezes the WAL as wal-<gen>.bin, merges it with the live
+segment into seg-<gen>, then switches CURRENT; a crash at any point leaves
+either the old or the new state readable. Scraping only appends to an
+in-memory buffer; a background thread writes and compacts.
+
+Lookups binary-search the key column, then the product's sorted prices:
+O(log n) per product for min, median and percentile.
+"""
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import urllib.parse
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+PRICE_HISTORY_ENABLED = os.getenv("PRICE_HISTORY_ENABLED", "1").lower() in ("1", "true", "yes")
+PRICE_HISTORY_DIR = os.getenv("PRICE_HISTORY_DIR", "price_history")
+# Seconds between background flushes of buffered observations to the WAL
+FLUSH_INTERVAL_S = float(os.getenv("PRICE_HISTORY_FLUSH_S", "5"))
+# WAL rows that trigger a compaction into a new segment
+COMPACT_THRESHOLD = int(os.getenv("PRICE_HISTORY_COMPACT_ROWS", "200000"))
+# An unchanged price is recorded again at most this often per listing
+MIN_OBSERVATION_INTERVAL_S = int(os.getenv("PRICE_HISTORY_MIN_INTERVAL_S", "3600"))
+# Observations older than this are dropped at compaction (0 keeps everything)
+RETENTION_DAYS = int(os.getenv("PRICE_HISTORY_RETENTION_DAYS", "730"))
+
+ROW_DTYPE = np.dtype([("key", "<u8"), ("ts", "<u4"), ("price", "<f4")])
+
+# Marketplace item IDs that survive tracking parameters and slug changes
+_ID_PATTERNS = [
+    ("amazon", re.compile(r"/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})", re.I)),
+    ("flipkart", re.compile(r"[?&]pid=([A-Z0-9]+)", re.I)),
+    ("flipkart", re.compile(r"/p/(itm[a-z0-9]+)", re.I)),
+    ("walmart", re.compile(r"/ip/(?:[^/]+/)?(\d+)")),
+    ("target", re.compile(r"/A-(\d+)")),
+    ("etsy", re.compile(r"/listing/(\d+)")),
+    ("bestbuy", re.compile(r"[?&]skuId=(\d+)")),
+    ("bestbuy", re.compile(r"/(\d{6,})\.p")),
+]
+
+
+def canonical_product_id(url: str) -> Optional[str]:
+    """
+    Stable listing ID such as "amazon.in:B0C8PSMPTH" or "walmart.com:123456"
+
+    Falls back to host + path (query string dropped) for unknown URL shapes.
+    """
+    if not url:
+        return None
+    parsed = urllib.parse.urlparse(url)
+    host = parsed.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    for marketplace, pattern in _ID_PATTERNS:
+        if marketplace in host:
+            match = pattern.search(url)
+            if match:
+                return f"{host}:{match.group(1).upper()}"
+    if not host:
+        return None
+    return f"{host}:{parsed.path.rstrip('/')}"
+
+
+def key_for(product_id: str) -> int:
+    """64-bit key stored in the columns"""
+    return int.from_bytes(hashlib.blake2b(product_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _product_key(product: Any) -> Optional[int]:
+    product_id = canonical_product_id(getattr(product, "url", "") or "")
+    return key_for(product_id) if product_id else None
+
+
+class Segment:
+    """Immutable, memory-mapped compacted rows grouped by key"""
+
+    COLUMNS = ("keys", "offsets", "ts", "price", "sorted_price")
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        if path is None:
+            self.keys = np.empty(0, dtype="<u8")
+            self.offsets = np.zeros(1, dtype="<i8")
+            self.ts = np.empty(0, dtype="<u4")
+            self.price = np.empty(0, dtype="<f4")
+            self.sorted_price = np.empty(0, dtype="<f4")
+        else:
+            for name in self.COLUMNS:
+                setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+
+    @property
+    def rows(self) -> int:
+        return int(self.offsets[-1])
+
+    def find(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(start, end) row ranges per key; empty ranges for unknown keys"""
+        pos = np.searchsorted(self.keys, keys)
+        pos_clipped = np.minimum(pos, max(len(self.keys) - 1, 0))
+        if len(self.keys):
+            found = (pos < len(self.keys)) & (self.keys[pos_clipped] == keys)
+        else:
+            found = np.zeros(len(keys), dtype=bool)
+        start = np.where(found, self.offsets[pos_clipped], 0)
+        end = np.where(found, self.offsets[np.minimum(pos_clipped + 1, len(self.offsets) - 1)], 0)
+        return start, end
+
+    def to_rows(self) -> np.ndarray:
+        rows = np.empty(self.rows, dtype=ROW_DTYPE)
+        rows["key"] = np.repeat(self.keys, np.diff(self.offsets))
+        rows["ts"] = self.ts
+        rows["price"] = self.price
+        return rows
+
+    @staticmethod
+    def write(path: str, rows: np.ndarray) -> None:
+        # Group number in the high 32 bits, ts / price bits in the low 32: one uint64
+        # argsort per column instead of a two-key lexsort (prices are positive, so
+        # their float32 bit patterns sort like the values)
+        keys, group = np.unique(rows["key"], return_inverse=True)
+        group = group.astype(np.uint64) << np.uint64(32)
+        by_time = rows[np.argsort(group | rows["ts"].astype(np.uint64))]
+        sorted_price = rows["price"][np.argsort(group | rows["price"].view("<u4").astype(np.uint64))]
+        offsets = np.searchsorted(by_time["key"], keys, side="left").astype("<i8")
+        offsets = np.append(offsets, len(by_time))
+
+        os.makedirs(path, exist_ok=True)
+        columns = {
+            "keys": keys.astype("<u8"),
+            "offsets": offsets,
+            "ts": by_time["ts"],
+            "price": by_time["price"],
+            "sorted_price": sorted_price.astype("<f4"),
+        }
+        for name, column in columns.items():
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(column))
+
+
+class PriceHistoryStore:
+    """
+    Price time series per listing with a background writer.
+
+    `record` is safe to call from the request path: it only appends to a
+    buffer. Observations that are buffered or in the WAL are held in memory
+    until the next compaction so lookups always see them.
+    """
+
+    def __init__(self, directory: str = PRICE_HISTORY_DIR, enabled: bool = PRICE_HISTORY_ENABLED):
+        self.directory = directory
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._buffer: List[Tuple[int, int, float]] = []
+        # Observations not yet in the segment: key -> prices
+        self._recent: Dict[int, List[float]] = {}
+        self._last_recorded: Dict[int, Tuple[int, float]] = {}
+        self._segment: Optional[Segment] = None
+        self._generation = 0
+        self._wal_rows = 0
+        self._opened = False
+        self._writer: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _open(self) -> None:
+        if self._opened:
+            return
+        with self._lock:
+            if self._opened:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            current = self._read_current()
+            self._segment = Segment(os.path.join(self.directory, current)) if current else Segment()
+            self._generation = int(current.split("-")[1]) if current else 0
+
+            # Replay WAL files not yet folded into the live segment
+            for name in self._pending_wal_files():
+                rows = np.fromfile(os.path.join(self.directory, name), dtype=ROW_DTYPE)
+                self._add_recent(rows)
+                if name == "wal.bin":
+                    self._wal_rows = len(rows)
+            self._opened = True
+
+    def _read_current(self) -> Optional[str]:
+        path = os.path.join(self.directory, "CURRENT")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            name = f.read().strip()
+        return name if os.path.isdir(os.path.join(self.directory, name)) else None
+
+    def _pending_wal_files(self) -> List[str]:
+        frozen = []
+        for name in os.listdir(self.directory):
+            match = re.fullmatch(r"wal-(\d+)\.bin", name)
+            if match and int(match.group(1)) > self._generation:
+                frozen.append((int(match.group(1)), name))
+        names = [name for _, name in sorted(frozen)]
+        if os.path.exists(os.path.join(self.directory, "wal.bin")):
+            names.append("wal.bin")
+        return names
+
+    def _add_recent(self, rows: np.ndarray) -> None:
+        for key, price in zip(rows["key"].tolist(), rows["price"].tolist()):
+            self._recent.setdefault(key, []).append(price)
+
+    def record(self, products: List[Any], now: Optional[float] = None) -> int:
+        """Buffer the current price of each product; returns how many were recorded"""
+        if not self.enabled or not products:
+            return 0
+        ts = int(time.time() if now is None else now)
+        recorded = 0
+        with self._lock:
+            for prod in products:
+                try:
+                    price = float(prod.price) if prod.price is not None else 0.0
+                except (ValueError, TypeError):
+                    continue
+                key = _product_key(prod)
+                if price <= 0 or key is None:
+                    continue
+                last = self._last_recorded.get(key)
+                if last and last[1] == price and ts - last[0] < MIN_OBSERVATION_INTERVAL_S:
+                    continue
+                self._last_recorded[key] = (ts, price)
+                self._buffer.append((key, ts, price))
+                self._recent.setdefault(key, []).append(price)
+                recorded += 1
+            if len(self._last_recorded) > 200_000:
+                self._last_recorded.clear()
+        self._ensure_writer()
+        return recorded
+
+    def _ensure_writer(self) -> None:
+        if self._writer is None or not self._writer.is_alive():
+            self._stop.clear()
+            self._writer = threading.Thread(target=self._writer_loop, name="price-history", daemon=True)
+            self._writer.start()
+
+    def _writer_loop(self) -> None:
+        while not self._stop.wait(FLUSH_INTERVAL_S):
+            try:
+                self.flush()
+                if self._wal_rows >= COMPACT_THRESHOLD:
+                    self.compact()
+            except Exception as e:
+                print(f"Price history write failed: {e}")
+
+    def flush(self) -> int:
+        """Append buffered observations to the WAL"""
+        self._open()
+        with self._lock:
+            buffered, self._buffer = self._buffer, []
+        if not buffered:
+            return 0
+        rows = np.array(buffered, dtype=ROW_DTYPE)
+        with open(os.path.join(self.directory, "wal.bin"), "ab") as f:
+            rows.tofile(f)
+        self._wal_rows += len(rows)
+        return len(rows)
+
+    def compact(self) -> None:
+        """Fold the WAL into a new segment (runs on the writer thread)"""
+        self.flush()
+        generation = self._generation + 1
+        wal = os.path.join(self.directory, "wal.bin")
+        frozen = os.path.join(self.directory, f"wal-{generation}.bin")
+        if os.path.exists(wal):
+            os.replace(wal, frozen)
+        with self._lock:
+            self._wal_rows = 0
+
+        parts = [self._segment.to_rows()]
+        frozen_files = [name for name in self._pending_wal_files() if name != "wal.bin"]
+        for name in frozen_files:
+            parts.append(np.fromfile(os.path.join(self.directory, name), dtype=ROW_DTYPE))
+        rows = np.concatenate(parts)
+        if RETENTION_DAYS:
+            rows = rows[rows["ts"] >= time.time() - RETENTION_DAYS * 86400]
+
+        name = f"seg-{generation:06d}"
+        Segment.write(os.path.join(self.directory, name), rows)
+        tmp = os.path.join(self.directory, "CURRENT.tmp")
+        with open(tmp, "w") as f:
+            f.write(name)
+        os.replace(tmp, os.path.join(self.directory, "CURRENT"))
+
+        old_segment = self._segment.path
+        segment = Segment(os.path.join(self.directory, name))
+        with self._lock:
+            self._segment = segment
+            self._generation = generation
+            # Only what was written after the WAL was frozen is still outside the segment
+            self._recent = {}
+            for key, _, price in self._buffer:
+                self._recent.setdefault(key, []).append(price)
+            live_wal = os.path.join(self.directory, "wal.bin")
+            if os.path.exists(live_wal):
+                self._add_recent(np.fromfile(live_wal, dtype=ROW_DTYPE))
+
+        for name in frozen_files:
+            os.remove(os.path.join(self.directory, name))
+        if old_segment:
+            shutil.rmtree(old_segment, ignore_errors=True)
+        print(f"Price history compacted: {len(rows)} rows, {len(segment.keys)} listings")
+
+    def close(self) -> None:
+        """Stop the writer and flush what is buffered"""
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join(timeout=5)
+            self._writer = None
+        if self._opened or self._buffer:
+            self.flush()
+
+    def lookup(self, products: List[Any]) -> Dict[int, Dict[str, Any]]:
+        """
+        Historical stats per product index (only products with history)
+
+        {"points", "low", "median", "high", "percentile", "previous_low"}, where
+        percentile is the share of past observations below the product's
+        current price (0 = at its all-time low) and previous_low is the low
+        without one observation at the current price (the scrape being
+        analysed has usually just been recorded); None if that was the only one.
+        """
+        if not self.enabled or not products:
+            return {}
+        self._open()
+
+        keys = [_product_key(prod) for prod in products]
+        present = [i for i, k in enumerate(keys) if k is not None]
+        if not present:
+            return {}
+        key_array = np.array([keys[i] for i in present], dtype="<u8")
+
+        with self._lock:
+            segment = self._segment
+            recent = {keys[i]: list(self._recent.get(keys[i], ())) for i in present}
+        starts, ends = segment.find(key_array)
+
+        results = {}
+        for idx, start, end in zip(present, starts.tolist(), ends.tolist()):
+            history = segment.sorted_price[start:end]
+            extra = recent[keys[idx]]
+            if extra:
+                # Unflushed observations are few; merge them into a sorted copy
+                history = np.sort(np.concatenate([history, np.asarray(extra, dtype="<f4")]))
+            if not len(history):
+                continue
+            try:
+                price = float(products[idx].price) if products[idx].price is not None else 0.0
+            except (ValueError, TypeError):
+                price = 0.0
+            count = len(history)
+            below = int(np.searchsorted(history, price, side="left"))
+            if below == 0 and history[0] == np.float32(price):
+                previous_low = float(history[1]) if count > 1 else None
+            else:
+                previous_low = float(history[0])
+            results[idx] = {
+                "points": count,
+                "low": float(history[0]),
+                "median": float((history[(count - 1) // 2] + history[count // 2]) / 2),
+                "high": float(history[-1]),
+                "percentile": round(float(below) / count * 100, 1),
+                "previous_low": previous_low,
+            }
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+        self._open()
+        with self._lock:
+            return {
+                "enabled": True,
+                "listings": len(self._segment.keys),
+                "segment_rows": self._segment.rows,
+                "wal_rows": self._wal_rows,
+                "buffered": len(self._buffer),
+                "generation": self._generation,
+            }
+
+
+price_history = PriceHistoryStore()
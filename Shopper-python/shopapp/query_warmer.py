@@ -0,0 +1,388 @@
+"""
+Warm cache for the head of the /search query distribution.
+
+Every /search records its (region, query) in a decaying counter. A
+background loop periodically re-scrapes and re-ranks the top-K queries per
+region shortly before their cached results expire, so popular searches are
+answered from memory instead of a live marketplace scrape. Refreshes only
+run inside the configured off-peak hours, use a bounded number of scrape
+jobs per cycle, and queue behind user scrapes for browsers.
+
+Only queries at or above the popularity threshold (QUERY_WARMER_MIN_SCORE)
+are cached; one-off searches always scrape live. A cached answer can be up
+to SEARCH_CACHE_TTL seconds old, so its prices and stock may lag the
+marketplaces by that much; set SEARCH_CACHE_TTL=0 to disable caching.
+The warmer is off by default (QUERY_WARMER_ENABLED=1 turns it on) and
+refreshes only during QUERY_WARMER_OFF_PEAK_HOURS (server local time).
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .cache import TTLCache, fingerprint
+    from .scrape_scheduler import build_jobs, fan_out, browser_slots
+    from .scraper_runtime import marketplaces_for_region
+    from .enrichment import enrich_and_rerank, ENRICHMENT_ENABLED
+    from .rate_limit import marketplace_limiter
+except ImportError:
+    from shopapp.cache import TTLCache, fingerprint
+    from shopapp.scrape_scheduler import build_jobs, fan_out, browser_slots
+    from shopapp.scraper_runtime import marketplaces_for_region
+    from shopapp.enrichment import enrich_and_rerank, ENRICHMENT_ENABLED
+    from shopapp.rate_limit import marketplace_limiter
+
+# Scraped + resolved + ranked results per popular (region, query); also the
+# maximum staleness of a cached answer
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "1800"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+
+# Popularity counter: a search counts half as much after this many seconds
+QUERY_HALF_LIFE_S = float(os.getenv("QUERY_HALF_LIFE_S", str(6 * 3600)))
+QUERY_COUNTER_SIZE = int(os.getenv("QUERY_COUNTER_SIZE", "2000"))
+
+# Warmer settings
+WARMER_ENABLED = os.getenv("QUERY_WARMER_ENABLED", "0").lower() in ("1", "true", "yes")
+WARMER_INTERVAL_S = float(os.getenv("QUERY_WARMER_INTERVAL_S", "300"))
+WARMER_TOP_K = int(os.getenv("QUERY_WARMER_TOP_K", "10"))
+# Ignore one-off queries: decayed count needed before a query is cached or kept warm
+WARMER_MIN_SCORE = float(os.getenv("QUERY_WARMER_MIN_SCORE", "2"))
+# Scrape jobs ((query x marketplace) browsers) a single warm cycle may start
+WARMER_BROWSER_BUDGET = int(os.getenv("QUERY_WARMER_BROWSER_BUDGET", "6"))
+WARMER_TIME_BUDGET_S = float(os.getenv("QUERY_WARMER_TIME_BUDGET_S", "120"))
+# Refresh entries with less than this fraction of their TTL left
+WARMER_REFRESH_AHEAD = float(os.getenv("QUERY_WARMER_REFRESH_AHEAD", "0.25"))
+# Local hours when warming may run, e.g. "0-7,22-24"; empty means any time
+WARMER_OFF_PEAK_HOURS = os.getenv("QUERY_WARMER_OFF_PEAK_HOURS", "1-6")
+WARMER_REGIONS = ("india", "usa")
+
+# Behind every user scrape (PRIORITY_ORDER tops out at 2 for "low")
+WARM_PRIORITY = 3
+
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+
+def parse_hours(spec: str) -> List[Tuple[int, int]]:
+    """"0-7,22-24" -> [(0, 7), (22, 24)]; hour ranges are [start, end)"""
+    windows = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        windows.append((int(start), int(end or int(start) + 1)))
+    return windows
+
+
+def in_windows(windows: List[Tuple[int, int]], hour: int) -> bool:
+    if not windows:
+        return True
+    return any(start <= hour < end for start, end in windows)
+
+
+class DecayingCounter:
+    """
+    Exponentially decaying frequency counter with a bounded number of keys.
+
+    Scores are stored scaled to a fixed reference time, so recording a hit
+    is O(1) and never touches other keys; they are divided back down when
+    read. When the counter is full the weakest half is dropped.
+    """
+
+    def __init__(self, half_life_s: float = QUERY_HALF_LIFE_S, max_keys: int = QUERY_COUNTER_SIZE):
+        self.rate = math.log(2) / half_life_s
+        self.max_keys = max_keys
+        self._scores: Dict[Any, float] = {}
+        self._ref = time.time()
+        self._lock = threading.Lock()
+
+    def _scale(self, now: float) -> float:
+        return math.exp(self.rate * (now - self._ref))
+
+    def add(self, key: Any, weight: float = 1.0, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            scale = self._scale(now)
+            if scale > 1e100:
+                # Rebase before scaled scores overflow
+                self._scores = {k: v / scale for k, v in self._scores.items()}
+                self._ref, scale = now, 1.0
+            self._scores[key] = self._scores.get(key, 0.0) + weight * scale
+            if len(self._scores) > self.max_keys:
+                keep = sorted(self._scores.items(), key=lambda kv: kv[1], reverse=True)
+                self._scores = dict(keep[: self.max_keys // 2])
+
+    def score(self, key: Any, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._scores.get(key, 0.0) / self._scale(now)
+
+    def top(self, k: int, now: Optional[float] = None) -> List[Tuple[Any, float]]:
+        """The k highest-scoring keys with their current decayed scores"""
+        now = time.time() if now is None else now
+        with self._lock:
+            scale = self._scale(now)
+            items = sorted(self._scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        return [(key, value / scale) for key, value in items]
+
+    def __contains__(self, key: Any) -> bool:
+        with self._lock:
+            return key in self._scores
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._scores)
+
+
+search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+
+
+def _resolve_and_rank(products: List[Any], prefs: Any) -> Tuple[List[Any], List[Tuple[Any, float]]]:
+    """Merge cross-marketplace duplicates, then rank; returns (resolved, ranked)"""
+    # Imported here so the API does not pay for numpy/clustering at startup
+    try:
+        from .agents.entity_resolution import EntityResolutionAgent
+    except ImportError:
+        from shopapp.agents.entity_resolution import EntityResolutionAgent
+
+    resolved = EntityResolutionAgent().resolve(products)
+    print(f"Resolved to {len(resolved)} distinct products")
+    return resolved, _rank(resolved, prefs)
+
+
+def _rank(products: List[Any], prefs: Any) -> List[Tuple[Any, float]]:
+    try:
+        from .ranking import rank_products
+    except ImportError:
+        from shopapp.ranking import rank_products
+
+    try:
+        return rank_products(products, prefs)
+    except Exception as rank_error:
+        print(f"Ranking failed: {rank_error}, returning unranked products")
+        return [(p, 0.0) for p in products]
+
+
+def _cache_key(region: str, query: str) -> Tuple[str, str]:
+    return (region, normalize_query(query))
+
+
+def cached_search(region: str, prefs: Any) -> Optional[List[Tuple[Any, float]]]:
+    """Ranked results for these preferences if the warm cache has the query"""
+    entry = search_cache.get(_cache_key(region, prefs.query))
+    if entry is None:
+        return None
+    if entry["prefs"] == fingerprint(prefs.model_dump()):
+        return entry["ranked"]
+    # Same query with other filters: the listings are still good, re-rank them
+    return _rank(entry["products"], prefs)
+
+
+def store_search(region: str, prefs: Any, products: List[Any], ranked: List[Tuple[Any, float]]) -> None:
+    if not products:
+        return
+    search_cache.set(_cache_key(region, prefs.query), {
+        "products": products,
+        "prefs": fingerprint(prefs.model_dump()),
+        "ranked": ranked,
+    })
+
+
+async def search_region(
+    region: str,
+    prefs: Any,
+    max_results: int = 10,
+    time_budget: Optional[float] = None,
+    use_cache: bool = True,
+) -> List[Tuple[Any, float]]:
+    """
+    Scrape every marketplace of `region` for prefs.query, merge duplicates and rank
+
+    Served from the warm cache when possible; fresh results are cached if
+    the query is popular. Raises rate_limit.RateLimited when every
+    marketplace of the region is backlogged beyond its allowed wait.
+    """
+    if use_cache:
+        ranked = cached_search(region, prefs)
+        if ranked is not None:
+            print(f"Search cache hit: {region} / '{prefs.query}'")
+            return ranked
+
+    marketplaces = marketplaces_for_region(region)
+    marketplace_limiter.check(marketplaces)
+    jobs = build_jobs([prefs.query], marketplaces, max_results)
+    store = use_cache and query_warmer.is_popular(region, prefs.query)
+    return await _scrape_and_rank(region, prefs, jobs, time_budget, store=store)
+
+
+async def _scrape_and_rank(
+    region: str,
+    prefs: Any,
+    jobs: List[Any],
+    time_budget: Optional[float],
+    priority: int = 0,
+    store: bool = True
+) -> List[Tuple[Any, float]]:
+    """Run the scrape jobs, merge, rank, enrich the top results, re-rank and (if `store`) cache"""
+    products = (await fan_out(jobs, time_budget))["products"]
+    print(f"Total products scraped: {len(products)}")
+    if not products:
+        return []
+
+    resolved, ranked = await asyncio.to_thread(_resolve_and_rank, products, prefs)
+    ranked = await enrich_and_rerank(ranked, lambda items: _rank(items, prefs), priority=priority)
+
+    if store:
+        # Cache the enriched copies so a re-rank for other filters keeps their details
+        enriched = {prod.url: prod for prod, _ in ranked}
+        resolved = [enriched.get(prod.url, prod) for prod in resolved]
+        store_search(region, prefs, resolved, ranked)
+    return ranked
+
+
+class QueryWarmer:
+    """
+    Keeps the most popular queries per region warm in `search_cache`.
+
+    `record` is called on every /search. The background loop (started from
+    the API lifespan) wakes every `interval_s`, and inside the off-peak
+    window refreshes top-K queries whose cache entry is missing or close to
+    expiry, spending at most `browser_budget` scrape jobs per cycle.
+    """
+
+    def __init__(
+        self,
+        top_k: int = WARMER_TOP_K,
+        min_score: float = WARMER_MIN_SCORE,
+        interval_s: float = WARMER_INTERVAL_S,
+        browser_budget: int = WARMER_BROWSER_BUDGET,
+        off_peak_hours: str = WARMER_OFF_PEAK_HOURS,
+        counter: Optional[DecayingCounter] = None,
+    ):
+        self.top_k = top_k
+        self.min_score = min_score
+        self.interval_s = interval_s
+        self.browser_budget = browser_budget
+        self.windows = parse_hours(off_peak_hours)
+        self.counter = counter or DecayingCounter()
+        # Latest preferences seen per key, used to pre-rank
+        self._prefs: Dict[Tuple[str, str], Any] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.refreshed = 0
+        self.last_cycle: Dict[str, Any] = {}
+
+    def record(self, region: str, prefs: Any) -> None:
+        key = _cache_key(region, prefs.query)
+        if not key[1]:
+            return
+        self.counter.add(key)
+        self._prefs[key] = prefs
+        if len(self._prefs) > 2 * self.counter.max_keys:
+            self._prefs = {k: v for k, v in self._prefs.items() if k in self.counter}
+
+    def is_popular(self, region: str, query: str) -> bool:
+        """Whether the query's decayed count has reached the threshold for caching"""
+        return self.counter.score(_cache_key(region, query)) >= self.min_score
+
+    def popular(self, region: str) -> List[Tuple[str, float]]:
+        """Top-K queries for a region above the minimum score"""
+        ranked = self.counter.top(self.counter.max_keys)
+        result = []
+        for (key_region, query), score in ranked:
+            if score < self.min_score:
+                break
+            if key_region == region:
+                result.append((query, score))
+                if len(result) >= self.top_k:
+                    break
+        return result
+
+    def due(self) -> List[Tuple[str, str]]:
+        """(region, query) pairs whose cache entry is missing or about to expire"""
+        refresh_below = search_cache.ttl * WARMER_REFRESH_AHEAD
+        due = []
+        for region in WARMER_REGIONS:
+            for query, _ in self.popular(region):
+                remaining = search_cache.expires_in((region, query))
+                if remaining is None or remaining < refresh_below:
+                    due.append((region, query))
+        return due
+
+    async def run_cycle(self, force: bool = False) -> Dict[str, Any]:
+        """Refresh due queries (most popular first) within the browser budget"""
+        self.cycles += 1
+        cycle = {"at": datetime.now().isoformat(timespec="seconds"), "refreshed": [], "skipped": None}
+
+        if not force and not in_windows(self.windows, datetime.now().hour):
+            cycle["skipped"] = "peak hours"
+        elif not force and browser_slots.waiting:
+            # Users are already queueing for browsers
+            cycle["skipped"] = "browsers busy"
+        else:
+            budget = self.browser_budget
+            for region, query in self.due():
+                prefs = self._prefs.get((region, query))
+                if prefs is None:
+                    continue
+                # One browser per marketplace, plus one for detail-page enrichment
+                marketplaces = marketplaces_for_region(region)
+                cost = len(marketplaces) + (1 if ENRICHMENT_ENABLED else 0)
+                if cost > budget:
+                    break
+                if not force and any(marketplace_limiter.bucket(m).delay() > 0 for m in marketplaces):
+                    # Leave rate-limited marketplaces' tokens to user searches
+                    continue
+                budget -= cost
+                jobs = build_jobs([prefs.query], marketplaces)
+                for job in jobs:
+                    job.priority = WARM_PRIORITY
+                if await _scrape_and_rank(region, prefs, jobs, WARMER_TIME_BUDGET_S, WARM_PRIORITY):
+                    cycle["refreshed"].append(f"{region}:{query}")
+                    self.refreshed += 1
+
+        if cycle["refreshed"]:
+            print(f"Query warmer refreshed {len(cycle['refreshed'])} queries: {cycle['refreshed']}")
+        self.last_cycle = cycle
+        return cycle
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                print(f"Query warmer cycle failed: {e}")
+
+    def start(self) -> "QueryWarmer":
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+        return self
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked_queries": len(self.counter),
+            "popular": {region: self.popular(region) for region in WARMER_REGIONS},
+            "cycles": self.cycles,
+            "refreshed": self.refreshed,
+            "last_cycle": self.last_cycle,
+            "cache": search_cache.stats(),
+        }
+
+
+query_warmer = QueryWarmer()
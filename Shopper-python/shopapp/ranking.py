@@ -1,7 +1,12 @@
 from typing import List, Tuple
 import math
+from functools import lru_cache
+import numpy as np
 from .models import Product, ProductSearchPreferences
 
+# Vectorized substring search (numpy >= 2 ufunc, np.char on older releases)
+_str_find = np.strings.find if hasattr(np, "strings") else np.char.find
+
 def score_product(prod: Product, prefs: ProductSearchPreferences) -> float:
     """
     Compute a numeric score for a single product given user preferences.
@@ -59,6 +64,128 @@ def score_product(prod: Product, prefs: ProductSearchPreferences) -> float:
 
     return score
 
+class PreferenceMatcher:
+    """
+    Brand and feature terms from a ProductSearchPreferences, lowercased once.
+
+    Each term is matched against a whole column of candidate texts with a
+    vectorized substring search instead of a per-product Python scan.
+    """
+
+    def __init__(
+        self,
+        prefer_brands: Tuple[str, ...],
+        exclude_brands: Tuple[str, ...],
+        must_have_features: Tuple[str, ...],
+        nice_to_have_features: Tuple[str, ...],
+    ):
+        self.prefer_brands = [t.lower() for t in prefer_brands]
+        self.exclude_brands = [t.lower() for t in exclude_brands]
+        self.must_have_features = [t.lower() for t in must_have_features]
+        self.nice_to_have_features = [t.lower() for t in nice_to_have_features]
+
+    @staticmethod
+    def text_column(texts: List[str]) -> np.ndarray:
+        return np.array([t.lower() for t in texts], dtype=str)
+
+    @staticmethod
+    def count_hits(terms: List[str], column: np.ndarray) -> np.ndarray:
+        """Number of terms found in each text of the column"""
+        hits = np.zeros(len(column), dtype=np.int64)
+        for term in terms:
+            hits += _str_find(column, term) >= 0
+        return hits
+
+@lru_cache(maxsize=256)
+def _cached_matcher(key: Tuple[Tuple[str, ...], ...]) -> PreferenceMatcher:
+    return PreferenceMatcher(*key)
+
+def get_matcher(prefs: ProductSearchPreferences) -> PreferenceMatcher:
+    """Matcher for a set of preferences, built once and reused across calls"""
+    return _cached_matcher((
+        tuple(prefs.prefer_brands),
+        tuple(prefs.exclude_brands),
+        tuple(prefs.must_have_features),
+        tuple(prefs.nice_to_have_features),
+    ))
+
+def score_products(products: List[Product], prefs: ProductSearchPreferences) -> np.ndarray:
+    """
+    Batch equivalent of score_product: one score per product, computed on
+    columnar arrays.
+    """
+    n = len(products)
+    if n == 0:
+        return np.zeros(0)
+
+    price = np.array([p.price if p.price is not None else np.nan for p in products], dtype=float)
+    rating = np.array([p.rating if p.rating is not None else np.nan for p in products], dtype=float)
+    rating_count = np.array([p.rating_count or 0 for p in products], dtype=float)
+    sponsored = np.array([p.is_sponsored for p in products], dtype=bool)
+
+    score = np.zeros(n)
+
+    # 1. Price band
+    has_price = ~np.isnan(price)
+    if prefs.min_price is not None:
+        score -= np.where(has_price & (price < prefs.min_price), 100, 0)
+    if prefs.max_price is not None:
+        score -= np.where(has_price & (price > prefs.max_price), 100, 0)
+    if prefs.min_price is not None and prefs.max_price is not None:
+        center = (prefs.min_price + prefs.max_price) / 2
+        dist = np.abs(price - center) / max(center, 1e-6)
+        score -= np.where(has_price, dist * 10, 0)
+
+    # 2. Rating & popularity
+    has_rating = ~np.isnan(rating)
+    rating_term = np.where(rating < prefs.min_rating, -30, (rating - prefs.min_rating) * 8)
+    score += np.where(has_rating, rating_term, 0)
+
+    popular = rating_count > 0
+    popularity = np.minimum(np.log10(np.where(popular, rating_count, 0) + 1) * 2, 10)
+    score += np.where(popular, popularity, 0)
+
+    # 3. Sponsorship penalty
+    score -= np.where(sponsored, 5, 0)
+
+    matcher = get_matcher(prefs)
+
+    # 4. Brand preferences
+    if matcher.prefer_brands or matcher.exclude_brands:
+        titles = matcher.text_column([p.title for p in products])
+        score += 10 * matcher.count_hits(matcher.prefer_brands, titles)
+        score -= 50 * matcher.count_hits(matcher.exclude_brands, titles)
+
+    # 5. Features
+    if matcher.must_have_features or matcher.nice_to_have_features:
+        features = matcher.text_column(
+            [p.title + " " + " ".join(p.primary_features) for p in products]
+        )
+        must_hits = matcher.count_hits(matcher.must_have_features, features)
+        score += 15 * must_hits
+        score -= 20 * (len(matcher.must_have_features) - must_hits)
+        score += 5 * matcher.count_hits(matcher.nice_to_have_features, features)
+
+    return score
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Indices of the top_k scores, best first, ties broken by input order
+    (same result as a stable sort) using a partial sort.
+    """
+    n = len(scores)
+    if n == 0 or top_k <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if top_k < n:
+        kth = np.partition(scores, n - top_k)[n - top_k]
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(n)
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:top_k]
+
 def rank_products(
     products: List[Product],
     prefs: ProductSearchPreferences,
@@ -67,10 +194,5 @@ def rank_products(
     """
     Rank a list of products according to preferences.
     """
-    scored: List[Tuple[Product, float]] = []
-    for p in products:
-        s = score_product(p, prefs)
-        scored.append((p, s))
-
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return scored[:top_k]
+    scores = score_products(products, prefs)
+    return [(products[i], float(scores[i])) for i in top_k_indices(scores, top_k)]
@@ -0,0 +1,209 @@
+"""
+Token-bucket rate limits for marketplaces and API users.
+
+Each marketplace gets a bucket refilled at its sustainable request rate
+(MARKETPLACE_RATE_PER_MIN, overridable per key via MARKETPLACE_RATES, e.g.
+"flipkart=20,amazon_in=30"), so bursts are smoothed out before they turn
+into CAPTCHAs. A scrape takes a token before it takes a browser; when none
+is left it waits for the next refill, but never longer than
+MARKETPLACE_MAX_WAIT_S: beyond that the backlog is full and the scrape is
+refused with RateLimited instead of queueing indefinitely.
+
+Users (Auth0 `sub`, or client IP when anonymous) get their own buckets on
+the search endpoints, which answer 429 with Retry-After on overflow.
+
+Buckets hand out reservations: a caller that cannot be served right away
+is told how long to sleep and the tokens go negative, so waiters are served
+in arrival order at exactly the refill rate.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+MARKETPLACE_RATE_PER_MIN = float(os.getenv("MARKETPLACE_RATE_PER_MIN", "30"))
+MARKETPLACE_BURST = float(os.getenv("MARKETPLACE_BURST", "5"))
+MARKETPLACE_MAX_WAIT_S = float(os.getenv("MARKETPLACE_MAX_WAIT_S", "20"))
+MARKETPLACE_RATES = os.getenv("MARKETPLACE_RATES", "")
+
+USER_RATE_PER_MIN = float(os.getenv("USER_RATE_PER_MIN", "10"))
+USER_BURST = float(os.getenv("USER_BURST", "5"))
+USER_MAX_WAIT_S = float(os.getenv("USER_MAX_WAIT_S", "5"))
+# Idle user buckets beyond this many are forgotten (they would be full again anyway)
+MAX_TRACKED_USERS = 10000
+
+
+class RateLimited(Exception):
+    """No token within the allowed wait; retry after `retry_after` seconds"""
+
+    def __init__(self, key: str, retry_after: float):
+        self.key = key
+        self.retry_after = retry_after
+        super().__init__(f"Rate limit reached for {key}, retry in {self.retry_after_header}s")
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """`rate` tokens per second up to `burst`; thread-safe"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = max(rate, 1e-6)
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """Seconds until a token would be free, without taking it"""
+        with self._lock:
+            self._refill(time.monotonic() if now is None else now)
+            return max(0.0, (1.0 - self.tokens) / self.rate)
+
+    def reserve(self, max_wait: float, now: Optional[float] = None) -> Optional[float]:
+        """Take a token and return how long to wait for it, or None if that exceeds `max_wait`"""
+        with self._lock:
+            self._refill(time.monotonic() if now is None else now)
+            wait = max(0.0, (1.0 - self.tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self.tokens -= 1.0
+            return wait
+
+
+class KeyedLimiter:
+    """One TokenBucket per key, created on first use"""
+
+    def __init__(
+        self,
+        name: str,
+        rate_per_min: float,
+        burst: float,
+        max_wait: float,
+        overrides: Optional[Dict[str, float]] = None,
+        max_keys: Optional[int] = None,
+    ):
+        self.name = name
+        self.rate_per_min = rate_per_min
+        self.burst = burst
+        self.max_wait = max_wait
+        self.overrides = overrides or {}
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.delayed = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate_per_min > 0
+
+    def bucket(self, key: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate = self.overrides.get(key, self.rate_per_min)
+                bucket = self._buckets[key] = TokenBucket(rate / 60.0, self.burst)
+                if self.max_keys and len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def reserve(self, key: str, max_wait: Optional[float] = None) -> float:
+        """
+        Seconds to wait before proceeding; raises RateLimited when the backlog
+        is full. `max_wait` can only tighten the limiter's own.
+        """
+        if not self.enabled:
+            return 0.0
+        max_wait = self.max_wait if max_wait is None else min(max_wait, self.max_wait)
+        bucket = self.bucket(key)
+        wait = bucket.reserve(max_wait)
+        if wait is None:
+            self.rejected += 1
+            raise RateLimited(key, bucket.delay() - max_wait)
+        self.granted += 1
+        if wait > 0:
+            self.delayed += 1
+        return wait
+
+    async def acquire(self, key: str) -> None:
+        wait = self.reserve(key)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def check(self, keys: Iterable[str]) -> None:
+        """Raise RateLimited if none of `keys` could be served within max_wait"""
+        if not self.enabled:
+            return
+        keys = list(keys)
+        if not keys:
+            return
+        waits = {key: self.bucket(key).delay() for key in keys}
+        if all(wait > self.max_wait for wait in waits.values()):
+            key = min(waits, key=waits.get)
+            raise RateLimited(key, waits[key] - self.max_wait)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = list(self._buckets.items())
+        stats: Dict[str, Any] = {
+            "rate_per_min": self.rate_per_min,
+            "burst": self.burst,
+            "max_wait_s": self.max_wait,
+            "granted": self.granted,
+            "delayed": self.delayed,
+            "rejected": self.rejected,
+            "tracked": len(buckets),
+        }
+        if not self.max_keys:
+            # Few fixed keys (marketplaces): show each backlog
+            stats["wait_s"] = {key: round(bucket.delay(), 2) for key, bucket in buckets}
+        return stats
+
+
+def parse_rates(spec: str) -> Dict[str, float]:
+    """"flipkart=20, amazon_in=30" -> {"flipkart": 20.0, "amazon_in": 30.0}"""
+    rates = {}
+    for part in spec.split(","):
+        key, _, value = part.partition("=")
+        try:
+            rates[key.strip()] = float(value)
+        except ValueError:
+            if part.strip():
+                print(f"Ignoring malformed rate '{part.strip()}'")
+    return rates
+
+
+def user_key(claims: Optional[Dict[str, Any]], client_ip: Optional[str]) -> str:
+    """Auth0 subject when the caller is signed in, else their IP"""
+    if claims and claims.get("sub"):
+        return f"user:{claims['sub']}"
+    return f"ip:{client_ip or 'unknown'}"
+
+
+marketplace_limiter = KeyedLimiter(
+    "marketplace",
+    MARKETPLACE_RATE_PER_MIN,
+    MARKETPLACE_BURST,
+    MARKETPLACE_MAX_WAIT_S,
+    overrides=parse_rates(MARKETPLACE_RATES),
+)
+user_limiter = KeyedLimiter(
+    "user",
+    USER_RATE_PER_MIN,
+    USER_BURST,
+    USER_MAX_WAIT_S,
+    max_keys=MAX_TRACKED_USERS,
+)
@@ -0,0 +1,111 @@
+"""
+Fast response path for the search endpoints.
+
+- Serialization goes through orjson when installed (stdlib json otherwise)
+  and skips FastAPI's response_model re-validation and jsonable_encoder.
+- `fields=title,price,url` projects every product down to the columns the
+  client renders.
+- Bodies above COMPRESSION_MIN_BYTES are compressed with brotli or gzip,
+  whichever the client accepts (brotli needs the optional `brotli` package).
+"""
+import gzip
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
+# Brotli quality 4-5 compresses better than gzip at similar speed; 11 is far too slow per request
+BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """"title, price,url" -> ["title", "price", "url"]; None/empty means everything"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    return names or None
+
+
+def project(payload: Dict[str, Any], fields: Optional[List[str]], key: str = "products") -> Dict[str, Any]:
+    """Keep only `fields` in every item of payload[key]; other top-level keys are untouched"""
+    if not fields or not isinstance(payload.get(key), list):
+        return payload
+    wanted = set(fields)
+    return {
+        **payload,
+        key: [
+            {name: value for name, value in item.items() if name in wanted}
+            for item in payload[key]
+        ],
+    }
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported content-coding ("br" or "gzip") from an Accept-Encoding header"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    def q(coding: str) -> float:
+        return accepted.get(coding, accepted.get("*", 0.0))
+
+    candidates = [coding for coding in ("br", "gzip") if q(coding) > 0]
+    if brotli is None and "br" in candidates:
+        candidates.remove("br")
+    if not candidates:
+        return None
+    return max(candidates, key=q)
+
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return body, None
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def render(request: Request, payload: Any, fields: Optional[str] = None, status_code: int = 200) -> Response:
+    """JSON response for `payload` (dict or Pydantic model), projected and compressed"""
+    if isinstance(payload, BaseModel):
+        payload = payload.model_dump(mode="json")
+    payload = project(payload, parse_fields(fields))
+
+    body, encoding = compress(dumps(payload), request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,345 @@
+"""
+Concurrent (query x marketplace) scrape fan-out.
+
+Every (query, marketplace) pair becomes one job. Jobs for a marketplace
+whose circuit is open (circuit_breaker.py) are skipped at once; the others
+first wait for their marketplace's rate-limit token (rate_limit.py), then run
+concurrently under a process-wide limit on live browsers, highest priority
+first, and the whole fan-out shares a single time budget: whatever has
+finished when the budget runs out is returned and jobs still waiting for a
+token or a browser never start.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    from .scraper_runtime import load_scraper, display_name
+    from .scraper_pool import scraper_pool
+    from .rate_limit import marketplace_limiter
+    from .circuit_breaker import circuit_breakers, classify, CircuitBreaker, CircuitOpen, ERROR
+    from .extraction_telemetry import ExtractionReport, extraction_telemetry, reporting
+except ImportError:
+    from shopapp.scraper_runtime import load_scraper, display_name
+    from shopapp.scraper_pool import scraper_pool
+    from shopapp.rate_limit import marketplace_limiter
+    from shopapp.circuit_breaker import circuit_breakers, classify, CircuitBreaker, CircuitOpen, ERROR
+    from shopapp.extraction_telemetry import ExtractionReport, extraction_telemetry, reporting
+
+# Browsers allowed at once across all requests in this process when scrapes run
+# in threads; with the scraper pool running the limit is the pool's capacity
+MAX_CONCURRENT_BROWSERS = int(os.getenv("SCRAPER_MAX_CONCURRENCY", "5"))
+DEFAULT_TIME_BUDGET = float(os.getenv("SCRAPER_TIME_BUDGET", "90"))
+
+# GiftIdeationAgent.enhance_with_context priorities; lower runs first
+PRIORITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+
+
+class BrowserSlots:
+    """
+    Priority-ordered concurrency limit shared by every event loop and thread.
+
+    Scrapers each run their own event loop in a worker thread, so an
+    asyncio.Semaphore (bound to one loop) cannot cap them process-wide.
+    Waiters queue by (priority, arrival) and are woken on their own loop.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.in_use = 0
+        self._lock = threading.Lock()
+        self._waiters: List[tuple] = []
+        self._counter = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        with self._lock:
+            return sum(1 for *_, fut in self._waiters if not fut.done())
+
+    async def acquire(self, priority: int = 0) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._waiters and all(w[3].done() for w in self._waiters):
+                # Only cancelled waiters left
+                self._waiters.clear()
+            if self.in_use < self.limit and not self._waiters:
+                self.in_use += 1
+                return
+            fut = loop.create_future()
+            heapq.heappush(self._waiters, (priority, next(self._counter), loop, fut))
+
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # Woken just before being cancelled: the slot was handed over, give it back
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                _, _, loop, fut = heapq.heappop(self._waiters)
+                if fut.done():
+                    continue
+                # Hand the slot straight to the next waiter
+                loop.call_soon_threadsafe(self._wake, fut)
+                return
+            self.in_use -= 1
+
+    def resize(self, limit: int) -> None:
+        """Change the limit; if it grew, waiters are let in right away"""
+        with self._lock:
+            self.limit = max(1, limit)
+            while self.in_use < self.limit and self._waiters:
+                _, _, loop, fut = heapq.heappop(self._waiters)
+                if fut.done():
+                    continue
+                self.in_use += 1
+                loop.call_soon_threadsafe(self._wake, fut)
+
+    def _wake(self, fut: asyncio.Future) -> None:
+        if fut.done():
+            # Cancelled after being picked; pass the slot on
+            self.release()
+        else:
+            fut.set_result(None)
+
+
+browser_slots = BrowserSlots(MAX_CONCURRENT_BROWSERS)
+
+
+def size_browser_slots(slots: Optional[BrowserSlots] = None) -> int:
+    """
+    Match the browser limit to where scrapes run: every browser of the pool
+    workers while the pool is up, else MAX_CONCURRENT_BROWSERS threads
+    """
+    slots = slots or browser_slots
+    slots.resize(scraper_pool.capacity if scraper_pool.active else MAX_CONCURRENT_BROWSERS)
+    return slots.limit
+
+
+class ScrapeJob:
+    """One (query, marketplace) scrape with its scheduling priority"""
+
+    def __init__(self, query: str, marketplace: str, priority: int = 1, max_results: int = 10):
+        self.query = query
+        self.marketplace = marketplace
+        self.priority = priority
+        self.max_results = max_results
+
+
+def scrape(
+    marketplace: str,
+    query: str,
+    max_results: int = 10,
+    report: Optional[ExtractionReport] = None
+) -> List[Any]:
+    """
+    Run one marketplace scraper to completion on a fresh event loop (worker thread); errors propagate
+
+    The scraper's card counts and extraction strategies are noted in `report`.
+    """
+    scraper = load_scraper(marketplace)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        with reporting(report):
+            result = loop.run_until_complete(
+                scraper(query, max_results=max_results, headless=True)
+            )
+    finally:
+        loop.close()
+    source_name = display_name(marketplace)
+    for prod in result:
+        prod.marketplace = source_name
+    return result
+
+
+def run_scraper_sync(marketplace: str, query: str, max_results: int = 10) -> List[Any]:
+    """scrape() with errors logged as an empty result, and the prices and yield recorded"""
+    report = ExtractionReport(marketplace)
+    try:
+        result = scrape(marketplace, query, max_results, report)
+    except Exception as e:
+        print(f"Scraper error {display_name(marketplace)}: {e}")
+        return []
+    extraction_telemetry.record(report, result)
+    _record_prices(result)
+    return result
+
+
+def _record_prices(products: List[Any]) -> None:
+    """Feed the price history store; imported here to keep numpy off the API import path"""
+    try:
+        from .price_history import price_history
+    except ImportError:
+        from shopapp.price_history import price_history
+    try:
+        price_history.record(products)
+    except Exception as e:
+        print(f"Price history record failed: {e}")
+
+
+def build_jobs(
+    queries: Sequence[Any],
+    marketplaces: Sequence[str],
+    max_results: int = 10
+) -> List[ScrapeJob]:
+    """
+    Jobs for every (query, marketplace) pair
+
+    `queries` are plain strings (earlier = more important) or the dicts
+    produced by GiftIdeationAgent.enhance_with_context, whose "priority"
+    field is honoured.
+    """
+    jobs = []
+    for idx, entry in enumerate(queries):
+        if isinstance(entry, dict):
+            query = entry.get("query", "")
+            priority = PRIORITY_ORDER.get(entry.get("priority"), 1)
+        else:
+            query = str(entry)
+            priority = 0 if idx == 0 else 1
+        if not query:
+            continue
+        for marketplace in marketplaces:
+            jobs.append(ScrapeJob(query, marketplace, priority, max_results))
+    return jobs
+
+
+async def _run_job(job: ScrapeJob, slots: BrowserSlots) -> List[Any]:
+    breaker = circuit_breakers.get(job.marketplace)
+    breaker.check()
+
+    # Marketplace token first: a rate-limited job must not sit on a browser slot
+    await marketplace_limiter.acquire(job.marketplace)
+    await slots.acquire(job.priority)
+    # Decided only now, so a half-open probe is never lost waiting for a slot
+    if not breaker.allow():
+        slots.release()
+        raise CircuitOpen(job.marketplace, breaker.retry_in())
+
+    if scraper_pool.active:
+        return await _run_in_pool(job, slots, breaker)
+
+    def run() -> List[Any]:
+        # Released from the worker thread, so a scrape that outlives the budget keeps its slot
+        report = ExtractionReport(job.marketplace)
+        try:
+            products = scrape(job.marketplace, job.query, job.max_results, report)
+        except Exception as e:
+            breaker.record(classify(None, e))
+            print(f"Scraper error {display_name(job.marketplace)}: {e}")
+            return []
+        finally:
+            slots.release()
+        breaker.record(classify(products))
+        extraction_telemetry.record(report, products)
+        _record_prices(products)
+        return products
+
+    # Shielded: cancelling a queued executor future would drop run() and leak the slot
+    # (and leave a half-open breaker probing forever)
+    return await asyncio.shield(asyncio.get_running_loop().run_in_executor(None, run))
+
+
+async def _run_in_pool(job: ScrapeJob, slots: BrowserSlots, breaker: CircuitBreaker) -> List[Any]:
+    """Scrape in a worker process; the slot is held until the worker finishes, like the threaded path"""
+    try:
+        future = scraper_pool.submit(job.marketplace, job.query, job.max_results)
+    except Exception:
+        slots.release()
+        breaker.record(ERROR)
+        raise
+
+    def finished(done) -> None:
+        slots.release()
+        error = done.exception()
+        breaker.record(classify(None if error else done.result(), error))
+
+    future.add_done_callback(finished)
+    try:
+        # Shielded: a budget cancellation must not cancel the future and free the slot early
+        products = await asyncio.shield(asyncio.wrap_future(future))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Scraper error {display_name(job.marketplace)}: {e}")
+        return []
+    await asyncio.to_thread(_record_prices, products)
+    return products
+
+
+async def fan_out(
+    jobs: List[ScrapeJob],
+    time_budget: Optional[float] = None,
+    slots: Optional[BrowserSlots] = None
+) -> Dict[str, Any]:
+    """
+    Run all jobs concurrently within one time budget
+
+    Returns {"products": [...], "completed": n, "timed_out": n, "skipped":
+    [marketplaces with an open circuit], "elapsed_s": s} with products in job
+    order (priority first, then marketplace order).
+    """
+    slots = slots or browser_slots
+    budget = DEFAULT_TIME_BUDGET if time_budget is None else time_budget
+    ordered = sorted(jobs, key=lambda job: job.priority)
+    start = time.perf_counter()
+
+    tasks = [asyncio.create_task(_run_job(job, slots)) for job in ordered]
+    if not tasks:
+        return {"products": [], "completed": 0, "timed_out": 0, "skipped": [], "elapsed_s": 0.0}
+
+    done, pending = await asyncio.wait(tasks, timeout=budget)
+    for task in pending:
+        task.cancel()
+
+    products = []
+    skipped = set()
+    for job, task in zip(ordered, tasks):
+        if task in done and not task.cancelled() and task.exception() is None:
+            products.extend(task.result())
+        elif task in done and isinstance(task.exception(), CircuitOpen):
+            skipped.add(job.marketplace)
+        elif task in done and task.exception() is not None:
+            print(f"Scrape {job.marketplace} / '{job.query}' failed: {task.exception()}")
+
+    elapsed = time.perf_counter() - start
+    if pending:
+        print(f"Scrape budget of {budget:.0f}s reached: {len(pending)} of {len(tasks)} jobs dropped")
+    if skipped:
+        print(f"Skipped (circuit open): {', '.join(sorted(skipped))}")
+    print(f"Scraped {len(products)} products from {len(done)} jobs in {elapsed:.1f}s")
+    return {
+        "products": products,
+        "completed": len(done),
+        "timed_out": len(pending),
+        "skipped": sorted(skipped),
+        "elapsed_s": round(elapsed, 3),
+    }
+
+
+async def scrape_queries(
+    queries: Sequence[Any],
+    marketplaces: Sequence[str],
+    max_results: int = 10,
+    time_budget: Optional[float] = None
+) -> List[Any]:
+    """Scrape every query on every marketplace concurrently; returns the products"""
+    result = await fan_out(build_jobs(queries, marketplaces, max_results), time_budget)
+    return result["products"]
+
+
+async def drain(timeout: float = 30.0, slots: Optional[BrowserSlots] = None) -> bool:
+    """Wait for in-flight scrapes to finish (graceful shutdown); True if fully drained"""
+    slots = slots or browser_slots
+    deadline = time.monotonic() + timeout
+    while slots.in_use and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    return slots.in_use == 0
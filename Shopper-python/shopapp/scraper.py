@@ -4,6 +4,8 @@ import re
 from typing import List
 from playwright.async_api import async_playwright
 from .models import Product
+from .scraper_runtime import resolve_url, capture_context_options, prepare_context, close_browser
+from .extraction_telemetry import note_cards
 
 async def flipkart_search_products_async(
     query: str,
@@ -20,7 +22,9 @@ async def flipkart_search_products_async(
         context = await browser.new_context(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
             viewport={"width": 1920, "height": 1080},
+            **capture_context_options("flipkart", query),
         )
+        await prepare_context(context, "flipkart", query)
 
         await context.add_init_script("""
             Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
@@ -29,13 +33,14 @@ async def flipkart_search_products_async(
         page = await context.new_page()
 
         encoded_query = urllib.parse.quote_plus(query)
-        url = f"https://www.flipkart.com/search?q={encoded_query}"
+        url = resolve_url("flipkart", f"https://www.flipkart.com/search?q={encoded_query}")
 
         try:
             await page.goto(url, wait_until="load", timeout=60000)
             await page.wait_for_timeout(6000)
 
             cards = await page.query_selector_all('div[data-id]')
+            note_cards(min(len(cards), max_results))
 
             for idx, card in enumerate(cards):
                 if len(products) >= max_results:
@@ -155,9 +160,12 @@ async def flipkart_search_products_async(
                 except Exception:
                     continue
 
-        except Exception:
-            pass
+        except Exception as e:
+            print(f"Error scraping Flipkart: {e}")
+            if not products:
+                # Surface the failure (circuit breaker); partial results are still returned
+                raise
         finally:
-            await browser.close()
+            await close_browser(context, browser)
 
     return products
@@ -4,6 +4,10 @@ import urllib.parse
 from typing import List
 from playwright.async_api import async_playwright
 from .models import Product
+from .scraper_runtime import resolve_url, capture_context_options, prepare_context, close_browser
+from .extraction_telemetry import note_cards
+from .selector_stats import selector_stats
+from .amazon_prices import extract_price
 
 async def amazon_search_products_async(
     query: str,
@@ -19,8 +23,10 @@ async def amazon_search_products_async(
             locale="en-IN",
             timezone_id="Asia/Kolkata",
             geolocation={"longitude": 77.2090, "latitude": 28.6139},
-            permissions=["geolocation"]
+            permissions=["geolocation"],
+            **capture_context_options("amazon_in", query),
         )
+        await prepare_context(context, "amazon_in", query)
         page = await context.new_page()
 
         await context.set_extra_http_headers({
@@ -28,7 +34,7 @@ async def amazon_search_products_async(
         })
 
         encoded_query = urllib.parse.quote_plus(query)
-        url = f"https://www.amazon.in/s?k={encoded_query}"
+        url = resolve_url("amazon_in", f"https://www.amazon.in/s?k={encoded_query}")
         print(f"Navigating to: {url}")
 
         try:
@@ -44,11 +50,12 @@ async def amazon_search_products_async(
             await page.wait_for_selector("div[data-component-type='s-search-result']", timeout=10000)
         except Exception as e:
             print(f"Error loading Amazon.in page: {e}")
-            await browser.close()
+            await close_browser(context, browser)
             return []
 
         cards = await page.query_selector_all("div[data-component-type='s-search-result']")
         print(f"Found {len(cards)} Amazon product cards")
+        note_cards(min(len(cards), max_results))
 
         for idx, card in enumerate(cards):
             if len(products) >= max_results:
@@ -81,110 +88,7 @@ async def amazon_search_products_async(
 
                 card_text = await card.inner_text()
 
-                price = None
-                price_strategy_used = None
-
-                try:
-                    variant_buttons = await card.query_selector_all("button, .a-button-inner, [role='button'], li, .a-button-text")
-                    for button in variant_buttons:
-                        button_text = await button.inner_text()
-                        button_text = " ".join(button_text.split())
-
-                        patterns = [
-                            r'\d+\s+options?\s+from\s*₹\s*([\d,]+)',
-                            r'from\s*₹\s*([\d,]+)'
-                        ]
-
-                        for pattern in patterns:
-                            variant_match = re.search(pattern, button_text, re.IGNORECASE)
-                            if variant_match:
-                                price_text = variant_match.group(1).replace(",", "")
-                                try:
-                                    price = float(price_text)
-                                    price_strategy_used = f"Strategy 0: Variant button"
-                                    break
-                                except:
-                                    continue
-
-                        if price:
-                            break
-                except Exception as e:
-                    pass
-
-                if price is None:
-                    try:
-                        price_el = await card.query_selector(".a-price .a-offscreen")
-                        if price_el:
-                            price_text = await price_el.inner_text()
-                            price_text = price_text.replace("₹", "").replace(",", "").strip()
-                            price = float(price_text)
-                            price_strategy_used = "Strategy 1: .a-price .a-offscreen"
-                    except:
-                        pass
-
-                if price is None:
-                    try:
-                        price_whole = await card.query_selector(".a-price-whole")
-                        price_fraction = await card.query_selector(".a-price-fraction")
-                        if price_whole:
-                            whole_text = await price_whole.inner_text()
-                            fraction_text = await price_fraction.inner_text() if price_fraction else "00"
-                            whole_text = whole_text.replace(".", "").replace(",", "").strip()
-                            fraction_text = fraction_text.replace(".", "").replace(",", "").strip()
-                            price = float(f"{whole_text}.{fraction_text}")
-                            price_strategy_used = "Strategy 2: .a-price-whole + .a-price-fraction"
-                    except:
-                        pass
-
-                if price is None:
-                    offscreen_selectors = [
-                        "span.a-offscreen",
-                        ".a-price span.a-offscreen",
-                        "span[aria-hidden='true'] + span.a-offscreen"
-                    ]
-                    for selector in offscreen_selectors:
-                        try:
-                            price_el = await card.query_selector(selector)
-                            if price_el:
-                                price_text = await price_el.inner_text()
-                                price_text = price_text.replace("₹", "").replace(",", "").strip()
-                                if price_text and price_text.replace(".", "").isdigit():
-                                    price = float(price_text)
-                                    price_strategy_used = f"Strategy 3: {selector}"
-                                    break
-                        except:
-                            continue
-
-                if price is None:
-                    price_patterns = [
-                        (r'\d+\s+options?\s+from\s+₹\s*([\d,]+)', "Pattern: X option(s) from ₹XX"),
-                        (r'from\s+₹\s*([\d,]+)', "Pattern: from ₹XX"),
-                        (r'Price:\s*₹\s*([\d,]+)', "Pattern: Price: ₹XX"),
-                        (r'₹\s*([\d,]+)', "Pattern: ₹XX"),
-                    ]
-                    for pattern, desc in price_patterns:
-                        price_match = re.search(pattern, card_text)
-                        if price_match:
-                            price_text = price_match.group(1).replace(",", "")
-                            try:
-                                price = float(price_text)
-                                price_strategy_used = f"Strategy 5: {desc}"
-                                break
-                            except:
-                                pass
-
-                if price is None:
-                    all_prices = re.findall(r'₹\s*([\d,]+)', card_text)
-                    if all_prices:
-                        for price_str in all_prices:
-                            try:
-                                price_text = price_str.replace(",", "")
-                                if float(price_text) > 0:
-                                    price = float(price_text)
-                                    price_strategy_used = "Strategy 6: First ₹ amount"
-                                    break
-                            except:
-                                pass
+                price, price_strategy_used = await extract_price(card, card_text, "amazon_in")
 
                 rating = None
                 rating_match = re.search(r'(\d+\.?\d*)\s+out\s+of\s+5', card_text)
@@ -223,6 +127,7 @@ async def amazon_search_products_async(
                 traceback.print_exc()
                 continue
 
-        await browser.close()
+        selector_stats.save()
+        await close_browser(context, browser)
 
     return products
@@ -4,6 +4,10 @@ import urllib.parse
 from typing import List
 from playwright.async_api import async_playwright
 from .models import Product
+from .scraper_runtime import resolve_url, capture_context_options, prepare_context, close_browser
+from .extraction_telemetry import note_cards
+from .selector_stats import selector_stats
+from .amazon_prices import extract_price
 
 async def amazon_us_search_products_async(
     query: str,
@@ -22,8 +26,10 @@ async def amazon_us_search_products_async(
             locale="en-US",
             timezone_id="America/New_York",
             geolocation={"longitude": -74.0060, "latitude": 40.7128},  # New York, USA
-            permissions=["geolocation"]
+            permissions=["geolocation"],
+            **capture_context_options("amazon_us", query),
         )
+        await prepare_context(context, "amazon_us", query)
         page = await context.new_page()
 
         # Set additional headers and cookies to ensure US experience
@@ -32,7 +38,7 @@ async def amazon_us_search_products_async(
         })
 
         encoded_query = urllib.parse.quote_plus(query)
-        url = f"https://www.amazon.com/s?k={encoded_query}"
+        url = resolve_url("amazon_us", f"https://www.amazon.com/s?k={encoded_query}")
         print(f"Navigating to: {url}")
 
         try:
@@ -50,11 +56,12 @@ async def amazon_us_search_products_async(
             await page.wait_for_selector("div[data-component-type='s-search-result']", timeout=10000)
         except Exception as e:
             print(f"Error loading Amazon.com page: {e}")
-            await browser.close()
+            await close_browser(context, browser)
             return []
 
         cards = await page.query_selector_all("div[data-component-type='s-search-result']")
         print(f"Found {len(cards)} Amazon.com product cards")
+        note_cards(min(len(cards), max_results))
 
         for idx, card in enumerate(cards):
             if len(products) >= max_results:
@@ -90,171 +97,8 @@ async def amazon_us_search_products_async(
                 # Get full card text for extraction (used by multiple strategies)
                 card_text = await card.inner_text()
 
-                # Price extraction with comprehensive strategies
-                price = None
-                price_strategy_used = None
-
-                # Strategy 0: Extract from variant option buttons FIRST (highest priority)
-                # These appear in products with multiple size/type options
-                try:
-                    # Look for variant buttons that contain "option(s) from $XX.XX"
-                    variant_buttons = await card.query_selector_all("button, .a-button-inner, [role='button'], li, .a-button-text")
-                    for button in variant_buttons:
-                        button_text = await button.inner_text()
-                        # Normalize whitespace (handle newlines between "from" and price)
-                        button_text = " ".join(button_text.split())
-
-                        # Try patterns in order of specificity
-                        patterns = [
-                            r'\d+\s+options?\s+from\s*\$\s*([\d,]+\.\d{2})',  # "2 options from $14.47"
-                            r'\d+\s+options?\s+from\s*\$\s*([\d,]+)',         # "2 options from $14" (no decimals)
-                            r'from\s*\$\s*([\d,]+\.\d{2})',                   # "from $15.99"
-                            r'from\s*\$\s*([\d,]+)'                           # "from $15" (no decimals)
-                        ]
-
-                        for pattern in patterns:
-                            variant_match = re.search(pattern, button_text, re.IGNORECASE)
-                            if variant_match:
-                                price_text = variant_match.group(1).replace(",", "")
-                                try:
-                                    price = float(price_text)
-                                    price_strategy_used = f"Strategy 0: Variant button - {pattern[:30]}"
-                                    break
-                                except:
-                                    continue
-
-                        if price:
-                            break
-                except Exception as e:
-                    pass
-
-                # Strategy 1: Standard hidden price element (a-offscreen within a-price)
-                try:
-                    price_el = await card.query_selector(".a-price .a-offscreen")
-                    if price_el:
-                        price_text = await price_el.inner_text()
-                        price_text = price_text.replace("$", "").replace(",", "").strip()
-                        price = float(price_text)
-                        price_strategy_used = "Strategy 1: .a-price .a-offscreen"
-                except:
-                    pass
-
-                # Strategy 2: Price whole + fraction (e.g. "19" + "99")
-                if price is None:
-                    try:
-                        price_whole = await card.query_selector(".a-price-whole")
-                        price_fraction = await card.query_selector(".a-price-fraction")
-                        if price_whole:
-                            whole_text = await price_whole.inner_text()
-                            fraction_text = await price_fraction.inner_text() if price_fraction else "00"
-                            whole_text = whole_text.replace(".", "").replace(",", "").strip()
-                            fraction_text = fraction_text.replace(".", "").replace(",", "").strip()
-                            price = float(f"{whole_text}.{fraction_text}")
-                            price_strategy_used = "Strategy 2: .a-price-whole + .a-price-fraction"
-                    except:
-                        pass
-
-                # Strategy 3: Multiple offscreen selectors
-                if price is None:
-                    offscreen_selectors = [
-                        "span.a-offscreen",
-                        ".a-price span.a-offscreen",
-                        "span[aria-hidden='true'] + span.a-offscreen"
-                    ]
-                    for selector in offscreen_selectors:
-                        try:
-                            price_el = await card.query_selector(selector)
-                            if price_el:
-                                price_text = await price_el.inner_text()
-                                price_text = price_text.replace("$", "").replace(",", "").strip()
-                                if price_text and price_text.replace(".", "").isdigit():
-                                    price = float(price_text)
-                                    price_strategy_used = f"Strategy 3: {selector}"
-                                    break
-                        except:
-                            continue
-
-                # Strategy 4: Look for a-price elements with visible price
-                if price is None:
-                    try:
-                        price_symbols = await card.query_selector_all(".a-price-symbol")
-                        for symbol_el in price_symbols:
-                            symbol_parent = await symbol_el.evaluate_handle("el => el.parentElement")
-                            if symbol_parent:
-                                parent_text = await symbol_parent.inner_text()
-                                # Extract numeric value
-                                numeric = re.search(r'([\d,]+\.?\d*)', parent_text)
-                                if numeric:
-                                    price_text = numeric.group(1).replace(",", "")
-                                    price = float(price_text)
-                                    price_strategy_used = "Strategy 4: .a-price-symbol parent"
-                                    break
-                    except:
-                        pass
-
-                # Strategy 4b: Extract price from variant option buttons (for multi-variant products)
-                if price is None:
-                    try:
-                        # Look for variant buttons/options that contain price text
-                        variant_selectors = [
-                            ".a-button-text",
-                            "[data-a-button-text]",
-                            ".a-size-base.a-color-base",
-                            "li.a-spacing-mini"
-                        ]
-                        for selector in variant_selectors:
-                            variant_els = await card.query_selector_all(selector)
-                            for variant_el in variant_els:
-                                variant_text = await variant_el.inner_text()
-                                # Match patterns like "1 option from $15.99" or "2 options from $14.47"
-                                variant_price_match = re.search(r'from\s+\$\s*([\d,]+\.\d{2})', variant_text)
-                                if variant_price_match:
-                                    price_text = variant_price_match.group(1).replace(",", "")
-                                    price = float(price_text)
-                                    price_strategy_used = f"Strategy 4b: Variant button - {selector}"
-                                    break
-                            if price:
-                                break
-                    except:
-                        pass
-
-                # Strategy 5: Regex on full card text - multiple patterns (prioritize variant patterns)
-                if price is None:
-                    price_patterns = [
-                        # Variant patterns (higher priority for multi-option cards)
-                        (r'\d+\s+options?\s+from\s+\$\s*([\d,]+\.\d{2})', "Pattern: X option(s) from $XX.XX"),
-                        (r'from\s+\$\s*([\d,]+\.\d{2})', "Pattern: from $XX.XX"),
-                        # Standard patterns
-                        (r'Price:\s*\$\s*([\d,]+\.\d{2})', "Pattern: Price: $XX.XX"),
-                        (r'\$\s*([\d,]+\.\d{2})', "Pattern: $XX.XX"),
-                        (r'\$\s*([\d,]+)', "Pattern: $XX (no decimals)"),
-                        (r'([\d,]+\.\d{2})\s+with', "Pattern: XX.XX with"),
-                    ]
-                    for pattern, desc in price_patterns:
-                        price_match = re.search(pattern, card_text)
-                        if price_match:
-                            price_text = price_match.group(1).replace(",", "")
-                            try:
-                                price = float(price_text)
-                                price_strategy_used = f"Strategy 5: {desc}"
-                                break
-                            except:
-                                pass
-
-                # Strategy 6: Last resort - find ANY dollar amount in card
-                if price is None:
-                    all_prices = re.findall(r'\$\s*([\d,]+\.?\d*)', card_text)
-                    if all_prices:
-                        # Take the first valid price found
-                        for price_str in all_prices:
-                            try:
-                                price_text = price_str.replace(",", "")
-                                if float(price_text) > 0:
-                                    price = float(price_text)
-                                    price_strategy_used = "Strategy 6: First $ amount"
-                                    break
-                            except:
-                                pass
+                # Price: DOM strategies in learned order, then card-text patterns
+                price, price_strategy_used = await extract_price(card, card_text, "amazon_us")
 
                 # Debug output for price extraction
                 if price is None:
@@ -302,6 +146,7 @@ async def amazon_us_search_products_async(
                 traceback.print_exc()
                 continue
 
-        await browser.close()
+        selector_stats.save()
+        await close_browser(context, browser)
 
     return products
@@ -4,6 +4,8 @@ import re
 from typing import List
 from playwright.async_api import async_playwright
 from .models import Product
+from .scraper_runtime import resolve_url, capture_context_options, prepare_context, close_browser
+from .extraction_telemetry import note_cards
 
 async def bestbuy_search_products_async(
     query: str,
@@ -17,17 +19,20 @@ async def bestbuy_search_products_async(
         context = await browser.new_context(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
             viewport={"width": 1920, "height": 1080},
+            **capture_context_options("bestbuy", query),
         )
+        await prepare_context(context, "bestbuy", query)
         page = await context.new_page()
 
         encoded_query = urllib.parse.quote_plus(query)
-        url = f"https://www.bestbuy.com/site/searchpage.jsp?st={encoded_query}"
+        url = resolve_url("bestbuy", f"https://www.bestbuy.com/site/searchpage.jsp?st={encoded_query}")
 
         try:
             await page.goto(url, wait_until="domcontentloaded", timeout=45000)
             await page.wait_for_timeout(3000)
 
             cards = await page.query_selector_all('li.sku-item')
+            note_cards(min(len(cards), max_results))
 
             for card in cards[:max_results]:
                 try:
@@ -107,9 +112,12 @@ async def bestbuy_search_products_async(
                 except:
                     continue
 
-        except:
-            pass
+        except Exception as e:
+            print(f"Error scraping Best Buy: {e}")
+            if not products:
+                # Surface the failure (circuit breaker); partial results are still returned
+                raise
         finally:
-            await browser.close()
+            await close_browser(context, browser)
 
     return products
@@ -3,6 +3,9 @@ import urllib.parse
 from typing import List
 from playwright.async_api import async_playwright
 from .models import Product
+from .scraper_runtime import resolve_url, capture_context_options, prepare_context, close_browser
+from .extraction_telemetry import note_cards, note_strategy
+from .selector_stats import selector_stats
 
 async def etsy_search_products_async(
     query: str,
@@ -16,12 +19,14 @@ async def etsy_search_products_async(
         context = await browser.new_context(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36",
             locale="en-US",
-            timezone_id="America/New_York"
+            timezone_id="America/New_York",
+            **capture_context_options("etsy", query),
         )
+        await prepare_context(context, "etsy", query)
         page = await context.new_page()
 
         encoded_query = urllib.parse.quote_plus(query)
-        url = f"https://www.etsy.com/search?q={encoded_query}"
+        url = resolve_url("etsy", f"https://www.etsy.com/search?q={encoded_query}")
         print(f"Navigating to: {url}")
 
         try:
@@ -37,20 +42,26 @@ async def etsy_search_products_async(
             ]
 
             cards = []
-            for selector in selectors_to_try:
+            card_tried = []
+            for selector in selector_stats.order("etsy", "card", selectors_to_try):
+                card_tried.append(selector)
                 cards = await page.query_selector_all(selector)
                 if len(cards) > 0:
                     print(f"Found {len(cards)} Etsy product cards using selector: {selector}")
                     break
 
+            note_cards(min(len(cards), max_results))
+
             if len(cards) == 0:
                 print("No product cards found with any selector")
-                await browser.close()
+                selector_stats.record("etsy", "card", card_tried, None)
+                selector_stats.save()
+                await close_browser(context, browser)
                 return []
 
         except Exception as e:
             print(f"Error loading Etsy page: {e}")
-            await browser.close()
+            await close_browser(context, browser)
             return []
 
         for idx, card in enumerate(cards):
@@ -64,20 +75,23 @@ async def etsy_search_products_async(
                     continue
 
                 title = None
-                title_selectors = [
+                title_selectors = selector_stats.order("etsy", "title", [
                     'h3.wt-text-caption',
                     'h3',
                     'h2',
                     'a.listing-link',
                     'div.v2-listing-card__title'
-                ]
+                ])
+                tried = []
                 for selector in title_selectors:
+                    tried.append(selector)
                     title_el = await card.query_selector(selector)
                     if title_el:
                         title = await title_el.inner_text()
                         title = title.strip() if title else None
                         if title and len(title) >= 5:
                             break
+                selector_stats.record("etsy", "title", tried, tried[-1] if title and len(title) >= 5 else None)
 
                 if not title or len(title) < 5:
                     continue
@@ -104,14 +118,16 @@ async def etsy_search_products_async(
                 price = None
                 import re
 
-                price_selectors = [
+                price_selectors = selector_stats.order("etsy", "price", [
                     'span.currency-value',
                     'span.currency-symbol + span',
                     'div.n-listing-card__price span',
                     'p.wt-text-title-01'
-                ]
+                ])
 
+                tried = []
                 for selector in price_selectors:
+                    tried.append(selector)
                     price_el = await card.query_selector(selector)
                     if price_el:
                         price_text = await price_el.inner_text()
@@ -122,6 +138,7 @@ async def etsy_search_products_async(
                                 break
                             except:
                                 pass
+                selector_stats.record("etsy", "price", tried, tried[-1] if price is not None else None)
 
                 if price is None:
                     price_patterns = [
@@ -134,6 +151,7 @@ async def etsy_search_products_async(
                         if price_match:
                             try:
                                 price = float(price_match.group(1).replace(",", ""))
+                                note_strategy("price", "text")
                                 break
                             except:
                                 pass
@@ -185,6 +203,9 @@ async def etsy_search_products_async(
                 traceback.print_exc()
                 continue
 
-        await browser.close()
+        # A card selector only counts as a hit if its matches turned into products
+        selector_stats.record("etsy", "card", card_tried, card_tried[-1] if products else None)
+        selector_stats.save()
+        await close_browser(context, browser)
 
     return products
@@ -0,0 +1,280 @@
+"""
+Scraper worker processes.
+
+Each worker process owns its own Playwright instances and browsers and runs
+up to SCRAPER_WORKER_CONCURRENCY scrapes at a time, so scraping scales with
+CPU cores instead of sharing the API process's GIL and memory. Jobs travel
+over a multiprocessing queue; results (Product objects plus the scrape's
+extraction report) come back on a SimpleQueue, whose unbuffered put means
+a worker that dies mid-job has always reported which jobs it held.
+
+A supervisor thread in the API process restarts workers that die (failing
+the jobs they were running) and workers retire themselves once their RSS
+passes SCRAPER_WORKER_MAX_RSS_MB or after SCRAPER_WORKER_MAX_JOBS jobs, so
+leaks from long-lived browsers never accumulate.
+
+SCRAPER_PROCESSES=0 keeps the previous behaviour of scraping in threads of
+the API process.
+"""
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+
+try:
+    from .extraction_telemetry import ExtractionReport, extraction_telemetry
+except ImportError:
+    from shopapp.extraction_telemetry import ExtractionReport, extraction_telemetry
+
+SCRAPER_PROCESSES = int(os.getenv("SCRAPER_PROCESSES", str(min(4, max(1, (os.cpu_count() or 2) // 2)))))
+SCRAPER_WORKER_CONCURRENCY = int(os.getenv("SCRAPER_WORKER_CONCURRENCY", "2"))
+SCRAPER_WORKER_MAX_RSS_MB = int(os.getenv("SCRAPER_WORKER_MAX_RSS_MB", "1024"))
+SCRAPER_WORKER_MAX_JOBS = int(os.getenv("SCRAPER_WORKER_MAX_JOBS", "200"))
+
+
+class WorkerCrashed(RuntimeError):
+    """The worker process running a job exited before finishing it"""
+
+
+def _rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        # Peak, not current, where /proc is unavailable (ru_maxrss is KB on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker_main(tasks, results, concurrency: int, max_rss_mb: int, max_jobs: int) -> None:
+    """Worker process loop: take jobs until told to stop or due for recycling"""
+    # Ctrl+C goes to the whole process group; the API process shuts workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        from .scrape_scheduler import scrape
+    except ImportError:
+        from shopapp.scrape_scheduler import scrape
+
+    pid = os.getpid()
+    free = threading.Semaphore(concurrency)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="scrape")
+    taken = 0
+    reason = "stopped"
+
+    def run(job_id: int, marketplace: str, query: str, max_results: int) -> None:
+        report = ExtractionReport(marketplace)
+        try:
+            products = scrape(marketplace, query, max_results, report)
+            results.put(("done", job_id, pid, (products, report), None))
+        except Exception as e:
+            results.put(("done", job_id, pid, None, f"{type(e).__name__}: {e}"))
+        finally:
+            free.release()
+
+    while True:
+        free.acquire()
+        if _rss_mb() > max_rss_mb:
+            reason = f"rss {_rss_mb():.0f}MB"
+            break
+        if taken >= max_jobs:
+            reason = f"{taken} jobs"
+            break
+        item = tasks.get()
+        if item is None:
+            break
+        job_id, marketplace, query, max_results = item
+        results.put(("started", job_id, pid, None, None))
+        taken += 1
+        executor.submit(run, job_id, marketplace, query, max_results)
+
+    executor.shutdown(wait=True)
+    results.put(("exit", None, pid, None, reason))
+
+
+class ScraperPool:
+    """
+    Pool of scraper processes fed through one shared job queue.
+
+    `submit` returns a concurrent.futures.Future resolved with the scraped
+    products (or WorkerCrashed / RuntimeError), usable from any thread or
+    event loop via asyncio.wrap_future.
+    """
+
+    def __init__(
+        self,
+        processes: int = SCRAPER_PROCESSES,
+        concurrency: int = SCRAPER_WORKER_CONCURRENCY,
+        max_rss_mb: int = SCRAPER_WORKER_MAX_RSS_MB,
+        max_jobs: int = SCRAPER_WORKER_MAX_JOBS,
+    ):
+        self.processes = processes
+        self.concurrency = max(1, concurrency)
+        self.max_rss_mb = max_rss_mb
+        self.max_jobs = max_jobs
+        # spawn: a forked child would inherit the API's event loop and threads
+        self._ctx = multiprocessing.get_context("spawn")
+        self._tasks = None
+        self._results = None
+        self._workers: List[Any] = []
+        self._futures: Dict[int, Future] = {}
+        self._queued: Set[int] = set()
+        self._running: Dict[int, Set[int]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.restarts = 0
+        self.recycled = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def capacity(self) -> int:
+        """Scrapes the workers can run at once"""
+        return max(0, self.processes) * self.concurrency
+
+    @property
+    def active(self) -> bool:
+        return bool(self._workers) and not self._stopping.is_set()
+
+    def start(self) -> "ScraperPool":
+        if self.active or self.processes <= 0:
+            return self
+        self._stopping.clear()
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.SimpleQueue()
+        self._workers = [self._spawn() for _ in range(self.processes)]
+        self._threads = [
+            threading.Thread(target=self._read_results, name="scraper-pool-results", daemon=True),
+            threading.Thread(target=self._supervise, name="scraper-pool-supervisor", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        print(f"Scraper pool started: {self.processes} processes x {self.concurrency} browsers")
+        return self
+
+    def _spawn(self):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self._tasks, self._results, self.concurrency, self.max_rss_mb, self.max_jobs),
+            name="scraper-worker",
+            daemon=True,
+        )
+        process.start()
+        with self._lock:
+            self._running[process.pid] = set()
+        return process
+
+    def submit(self, marketplace: str, query: str, max_results: int = 10) -> Future:
+        if not self.active:
+            raise RuntimeError("Scraper pool is not running")
+        future: Future = Future()
+        job_id = next(self._ids)
+        with self._lock:
+            self._futures[job_id] = future
+            self._queued.add(job_id)
+        self._tasks.put((job_id, marketplace, query, max_results))
+        return future
+
+    def _resolve(self, job_id: int, products: Optional[List[Any]], error: Optional[BaseException]) -> None:
+        with self._lock:
+            future = self._futures.pop(job_id, None)
+            self._queued.discard(job_id)
+        if future is None or future.done():
+            return
+        if error is None:
+            self.completed += 1
+            future.set_result(products or [])
+        else:
+            self.failed += 1
+            future.set_exception(error)
+
+    def _read_results(self) -> None:
+        while True:
+            try:
+                kind, job_id, pid, products, detail = self._results.get()
+            except (EOFError, OSError):
+                break
+            if kind == "closed":
+                break
+            if kind == "started":
+                with self._lock:
+                    self._queued.discard(job_id)
+                    self._running.setdefault(pid, set()).add(job_id)
+            elif kind == "done":
+                with self._lock:
+                    self._running.get(pid, set()).discard(job_id)
+                if detail:
+                    self._resolve(job_id, None, RuntimeError(detail))
+                    continue
+                products, report = products
+                # Yield stats live in the API process, next to /metrics
+                extraction_telemetry.record(report, products)
+                self._resolve(job_id, products, None)
+            elif kind == "exit" and detail != "stopped":
+                print(f"Scraper worker {pid} retiring after {detail}")
+
+    def _supervise(self) -> None:
+        while not self._stopping.wait(0.5):
+            for i, process in enumerate(self._workers):
+                if process.is_alive():
+                    continue
+                process.join(timeout=0)
+                with self._lock:
+                    lost = self._running.pop(process.pid, set())
+                if process.exitcode == 0:
+                    self.recycled += 1
+                else:
+                    self.restarts += 1
+                    print(f"Scraper worker {process.pid} died (exit {process.exitcode}); restarting")
+                # Give a finished job's result a moment to arrive before declaring it lost
+                time.sleep(0.2 if lost else 0)
+                for job_id in lost:
+                    self._resolve(job_id, None, WorkerCrashed(f"worker {process.pid} exited with {process.exitcode}"))
+                if not self._stopping.is_set():
+                    self._workers[i] = self._spawn()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop workers after their current jobs; fail whatever is still waiting"""
+        if not self._workers:
+            return
+        self._stopping.set()
+        for _ in self._workers:
+            self._tasks.put(None)
+        deadline = time.monotonic() + timeout
+        for process in self._workers:
+            process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        with self._lock:
+            pending = list(self._futures)
+        for job_id in pending:
+            self._resolve(job_id, None, RuntimeError("Scraper pool shut down"))
+        self._workers = []
+        self._results.put(("closed", None, None, None, None))
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "processes": len(self._workers),
+                "alive": sum(1 for p in self._workers if p.is_alive()),
+                "browsers_per_process": self.concurrency,
+                "capacity": self.capacity,
+                "queue_depth": len(self._queued),
+                "running": sum(len(jobs) for jobs in self._running.values()),
+                "completed": self.completed,
+                "failed": self.failed,
+                "restarts": self.restarts,
+                "recycled": self.recycled,
+            }
+
+
+scraper_pool = ScraperPool()
@@ -0,0 +1,144 @@
+import os
+import re
+import hashlib
+import importlib
+import urllib.parse
+from typing import Callable, Dict, List, Tuple
+
+# Marketplace registry: key -> (module, scraper function, display name, region)
+MARKETPLACES: Dict[str, Tuple[str, str, str, str]] = {
+    "flipkart": ("scraper", "flipkart_search_products_async", "Flipkart", "india"),
+    "amazon_in": ("scraper_amazon", "amazon_search_products_async", "Amazon.in", "india"),
+    "walmart": ("scraper_walmart", "walmart_search_products_async", "Walmart", "usa"),
+    "target": ("scraper_target", "target_search_products_async", "Target", "usa"),
+    "amazon_us": ("scraper_amazon_us", "amazon_us_search_products_async", "Amazon.com", "usa"),
+    "etsy": ("scraper_etsy", "etsy_search_products_async", "Etsy", "usa"),
+    "bestbuy": ("scraper_bestbuy", "bestbuy_search_products_async", "Best Buy", "usa"),
+}
+
+# Point scrapers at a stand-in server, e.g. "http://127.0.0.1:8765/{marketplace}"
+ORIGIN_OVERRIDE_ENV = "SHOPPER_MARKETPLACE_ORIGIN"
+
+# Capture mode: "record" writes a HAR per (marketplace, query), "replay" serves it back
+CAPTURE_MODE_ENV = "SHOPPER_SCRAPER_CAPTURE"
+CAPTURE_DIR_ENV = "SHOPPER_CAPTURE_DIR"
+DEFAULT_CAPTURE_DIR = "captures"
+
+# Injected on replay so page scripts see the same clock and random sequence every run
+DETERMINISM_SCRIPT = """
+(() => {
+    let seed = 0x2545F491;
+    Math.random = function () {
+        seed |= 0; seed = seed + 0x6D2B79F5 | 0;
+        let t = Math.imul(seed ^ seed >>> 15, 1 | seed);
+        t = t + Math.imul(t ^ t >>> 7, 61 | t) ^ t;
+        return ((t ^ t >>> 14) >>> 0) / 4294967296;
+    };
+    const fixedNow = 1704067200000;
+    const start = performance.now();
+    const RealDate = Date;
+    const clock = () => fixedNow + (performance.now() - start);
+    // A plain function, not a class: pages may call Date() without `new`
+    function FixedDate(...args) {
+        if (!new.target) { return new RealDate(clock()).toString(); }
+        return args.length === 0 ? new RealDate(clock()) : new RealDate(...args);
+    }
+    Object.setPrototypeOf(FixedDate, RealDate);
+    FixedDate.prototype = RealDate.prototype;
+    FixedDate.now = clock;
+    window.Date = FixedDate;
+})();
+"""
+
+
+def resolve_url(marketplace: str, url: str) -> str:
+    """
+    Rewrite a marketplace URL to the configured stand-in origin.
+
+    Without an override the URL is returned untouched, so live scraping
+    behaviour is unchanged.
+    """
+    override = os.getenv(ORIGIN_OVERRIDE_ENV)
+    if not override:
+        return url
+
+    parsed = urllib.parse.urlparse(url)
+    base = override.rstrip("/").replace("{marketplace}", marketplace)
+    resolved = f"{base}{parsed.path}"
+    if parsed.query:
+        resolved += f"?{parsed.query}"
+    return resolved
+
+
+def load_scraper(marketplace: str) -> Callable:
+    """Import and return the async search function for a marketplace key"""
+    module_name, func_name, _, _ = MARKETPLACES[marketplace]
+    try:
+        module = importlib.import_module(f"{__package__}.{module_name}")
+    except (ImportError, TypeError):
+        module = importlib.import_module(f"shopapp.{module_name}")
+    return getattr(module, func_name)
+
+
+def marketplaces_for_region(location: str) -> List[str]:
+    """Marketplace keys scraped for a region ("india" or "usa")"""
+    region = "india" if (location or "").lower() == "india" else "usa"
+    return [key for key, entry in MARKETPLACES.items() if entry[3] == region]
+
+
+def display_name(marketplace: str) -> str:
+    return MARKETPLACES[marketplace][2]
+
+
+def capture_mode() -> str:
+    mode = (os.getenv(CAPTURE_MODE_ENV) or "").lower()
+    return mode if mode in ("record", "replay") else ""
+
+
+def capture_path(marketplace: str, query: str) -> str:
+    """HAR archive location for a (marketplace, query) pair"""
+    slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")[:60] or "query"
+    digest = hashlib.sha1(query.encode("utf-8")).hexdigest()[:8]
+    base_dir = os.getenv(CAPTURE_DIR_ENV) or DEFAULT_CAPTURE_DIR
+    return os.path.join(base_dir, marketplace, f"{slug}-{digest}.har")
+
+
+def capture_context_options(marketplace: str, query: str) -> dict:
+    """Extra browser.new_context() kwargs for the active capture mode"""
+    if capture_mode() != "record":
+        return {}
+
+    path = capture_path(marketplace, query)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    print(f"Recording {marketplace} traffic to {path}")
+    return {
+        "record_har_path": path,
+        "record_har_content": "embed",
+        "record_har_mode": "full",
+    }
+
+
+async def prepare_context(context, marketplace: str, query: str) -> None:
+    """
+    Apply replay routing to a freshly created browser context.
+
+    In replay mode every request is answered from the recorded archive and
+    anything not in it is aborted, so runs never touch the network.
+    """
+    if capture_mode() != "replay":
+        return
+
+    path = capture_path(marketplace, query)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No recorded capture for {marketplace} / '{query}' at {path}")
+
+    await context.add_init_script(DETERMINISM_SCRIPT)
+    await context.route_from_har(path, not_found="abort")
+
+
+async def close_browser(context, browser) -> None:
+    """Close the context before the browser so recorded HARs are flushed"""
+    try:
+        await context.close()
+    finally:
+        await browser.close()
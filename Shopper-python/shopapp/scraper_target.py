@@ -3,6 +3,9 @@ import urllib.parse
 from typing import List
 from playwright.async_api import async_playwright
 from .models import Product
+from .scraper_runtime import resolve_url, capture_context_options, prepare_context, close_browser
+from .extraction_telemetry import note_cards, note_strategy
+from .selector_stats import selector_stats
 
 async def target_search_products_async(
     query: str,
@@ -16,12 +19,14 @@ async def target_search_products_async(
         context = await browser.new_context(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36",
             locale="en-US",
-            timezone_id="America/New_York"
+            timezone_id="America/New_York",
+            **capture_context_options("target", query),
         )
+        await prepare_context(context, "target", query)
         page = await context.new_page()
 
         encoded_query = urllib.parse.quote_plus(query)
-        url = f"https://www.target.com/s?searchTerm={encoded_query}"
+        url = resolve_url("target", f"https://www.target.com/s?searchTerm={encoded_query}")
         print(f"Navigating to: {url}")
 
         try:
@@ -37,20 +42,26 @@ async def target_search_products_async(
             ]
 
             cards = []
-            for selector in selectors_to_try:
+            card_tried = []
+            for selector in selector_stats.order("target", "card", selectors_to_try):
+                card_tried.append(selector)
                 cards = await page.query_selector_all(selector)
                 if len(cards) > 0:
                     print(f"Found {len(cards)} Target product cards using selector: {selector}")
                     break
 
+            note_cards(min(len(cards), max_results))
+
             if len(cards) == 0:
                 print("No product cards found with any selector")
-                await browser.close()
+                selector_stats.record("target", "card", card_tried, None)
+                selector_stats.save()
+                await close_browser(context, browser)
                 return []
 
         except Exception as e:
             print(f"Error loading Target page: {e}")
-            await browser.close()
+            await close_browser(context, browser)
             return []
 
         for idx, card in enumerate(cards):
@@ -61,20 +72,23 @@ async def target_search_products_async(
                 card_text = await card.inner_text()
 
                 title = None
-                title_selectors = [
+                # The bare 'a' fallback stays last: it matches almost anything
+                title_selectors = selector_stats.order("target", "title", [
                     'a[data-test="product-title"]',
                     '[data-test="product-title"] a',
                     'a.Link-sc',
                     'a h3',
-                    'a'
-                ]
+                ]) + ['a']
+                tried = []
                 for selector in title_selectors:
+                    tried.append(selector)
                     title_el = await card.query_selector(selector)
                     if title_el:
                         title = await title_el.inner_text()
                         title = title.strip() if title else None
                         if title and len(title) >= 5:
                             break
+                selector_stats.record("target", "title", tried, tried[-1] if title and len(title) >= 5 else None)
 
                 if not title or len(title) < 5:
                     continue
@@ -101,14 +115,16 @@ async def target_search_products_async(
                 price = None
                 import re
 
-                price_selectors = [
+                price_selectors = selector_stats.order("target", "price", [
                     'span[data-test="current-price"]',
                     '[data-test="product-price"]',
                     'span.styles__CurrentPriceFontSize',
                     'div.h-text-bs'
-                ]
+                ])
 
+                tried = []
                 for selector in price_selectors:
+                    tried.append(selector)
                     price_el = await card.query_selector(selector)
                     if price_el:
                         price_text = await price_el.inner_text()
@@ -119,6 +135,7 @@ async def target_search_products_async(
                                 break
                             except:
                                 pass
+                selector_stats.record("target", "price", tried, tried[-1] if price is not None else None)
 
                 if price is None:
                     price_patterns = [
@@ -131,6 +148,7 @@ async def target_search_products_async(
                         if price_match:
                             try:
                                 price = float(price_match.group(1).replace(",", ""))
+                                note_strategy("price", "text")
                                 break
                             except:
                                 pass
@@ -183,6 +201,9 @@ async def target_search_products_async(
                 traceback.print_exc()
                 continue
 
-        await browser.close()
+        # A card selector only counts as a hit if its matches turned into products
+        selector_stats.record("target", "card", card_tried, card_tried[-1] if products else None)
+        selector_stats.save()
+        await close_browser(context, browser)
 
     return products
@@ -5,6 +5,8 @@ import json
 from typing import List
 from playwright.async_api import async_playwright
 from .models import Product
+from .scraper_runtime import resolve_url, capture_context_options, prepare_context, close_browser
+from .extraction_telemetry import note_cards, note_strategy
 
 async def walmart_search_products_async(
     query: str,
@@ -18,11 +20,13 @@ async def walmart_search_products_async(
         context = await browser.new_context(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
             viewport={"width": 1920, "height": 1080},
+            **capture_context_options("walmart", query),
         )
+        await prepare_context(context, "walmart", query)
         page = await context.new_page()
 
         encoded_query = urllib.parse.quote_plus(query)
-        url = f"https://www.walmart.com/search?q={encoded_query}"
+        url = resolve_url("walmart", f"https://www.walmart.com/search?q={encoded_query}")
 
         try:
             await page.goto(url, wait_until="domcontentloaded", timeout=45000)
@@ -35,6 +39,8 @@ async def walmart_search_products_async(
                 try:
                     data = json.loads(json_match.group(1))
                     items = data.get('props', {}).get('pageProps', {}).get('initialData', {}).get('searchResult', {}).get('itemStacks', [{}])[0].get('items', [])
+                    note_cards(min(len(items), max_results))
+                    note_strategy("cards", "next_data")
 
                     for item in items[:max_results]:
                         try:
@@ -78,6 +84,8 @@ async def walmart_search_products_async(
 
             if len(products) == 0:
                 cards = await page.query_selector_all('[data-item-id]')
+                note_cards(min(len(cards), max_results))
+                note_strategy("cards", "dom")
 
                 for card in cards[:max_results]:
                     try:
@@ -150,9 +158,12 @@ async def walmart_search_products_async(
                     except:
                         continue
 
-        except:
-            pass
+        except Exception as e:
+            print(f"Error scraping Walmart: {e}")
+            if not products:
+                # Surface the failure (circuit breaker); partial results are still returned
+                raise
         finally:
-            await browser.close()
+            await close_browser(context, browser)
 
     return products
@@ -0,0 +1,161 @@
+"""
+Adaptive ordering of fallback selectors and extraction strategies.
+
+Scrapers keep lists of alternatives per field (card container, title,
+price, ...) and stop at the first that works; every miss before it costs a
+browser round-trip. This store keeps, per (marketplace, field), an
+exponentially weighted success rate for each alternative and hands the
+list back best-first, so most cards resolve on the first try and a markup
+change shifts the order within a few scrapes. Ties (and alternatives never
+tried) keep the order written in the scraper.
+
+Only alternatives that yield the same value may be reordered; callers keep
+value-changing ones (e.g. Amazon's "N options from" price) in fixed
+positions and count a hit only when it produced usable data. So that a
+precise selector demoted by one bad page is not shadowed forever by a
+generic one, rates decay toward the prior with a half-life of
+SELECTOR_STATS_HALF_LIFE_S, and a SELECTOR_STATS_EXPLORE share of lookups
+use the written order, which re-tests the preferred alternatives.
+
+Stats persist as JSON at SELECTOR_STATS_PATH, written at most every
+SELECTOR_STATS_SAVE_S seconds at the end of a scrape. Scraper pool
+processes each keep their own copy; the last write wins, which is fine for
+an ordering hint.
+"""
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    from .extraction_telemetry import note_strategy
+except ImportError:
+    from shopapp.extraction_telemetry import note_strategy
+
+SELECTOR_STATS_PATH = os.getenv("SELECTOR_STATS_PATH", "selector_stats.json")
+# Weight of the newest outcome; 0.2 means roughly the last 5-10 attempts count
+SELECTOR_STATS_ALPHA = float(os.getenv("SELECTOR_STATS_ALPHA", "0.2"))
+SELECTOR_STATS_SAVE_S = float(os.getenv("SELECTOR_STATS_SAVE_S", "30"))
+# Rates drift halfway back to the prior after this long without being tried
+SELECTOR_STATS_HALF_LIFE_S = float(os.getenv("SELECTOR_STATS_HALF_LIFE_S", "21600"))
+# Share of lookups that ignore the stats and use the written order
+SELECTOR_STATS_EXPLORE = float(os.getenv("SELECTOR_STATS_EXPLORE", "0.05"))
+# Rate assumed for an alternative that has never been tried
+PRIOR_RATE = 0.5
+
+
+class SelectorStats:
+    """EWMA success rate per (marketplace, field, alternative); thread-safe"""
+
+    def __init__(
+        self,
+        path: str = SELECTOR_STATS_PATH,
+        alpha: float = SELECTOR_STATS_ALPHA,
+        half_life_s: float = SELECTOR_STATS_HALF_LIFE_S,
+        explore: float = SELECTOR_STATS_EXPLORE,
+    ):
+        self.path = path
+        self.alpha = alpha
+        self.half_life_s = half_life_s
+        self.explore = explore
+        self._stats: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self._saved_at = 0.0
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._stats = json.load(f)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                print(f"Selector stats unreadable, starting fresh: {e}")
+            self._loaded = True
+
+    @staticmethod
+    def _group(marketplace: str, field: str) -> str:
+        return f"{marketplace}/{field}"
+
+    def _rate(self, entry: Dict[str, float], now: float) -> float:
+        """Stored rate decayed toward the prior for the time since it was last updated"""
+        rate = entry.get("rate", PRIOR_RATE)
+        age = now - entry.get("at", now)
+        if self.half_life_s > 0 and age > 0:
+            rate = PRIOR_RATE + (rate - PRIOR_RATE) * 0.5 ** (age / self.half_life_s)
+        return rate
+
+    def order(self, marketplace: str, field: str, candidates: Sequence[Any], key=str) -> List[Any]:
+        """`candidates` best-first; `key` names a candidate (default str(candidate))"""
+        if self.explore > 0 and random.random() < self.explore:
+            return list(candidates)
+        self._load()
+        now = time.time()
+        with self._lock:
+            group = self._stats.get(self._group(marketplace, field), {})
+            # Rounded so that alternatives decayed to about the prior tie again
+            rates = [round(self._rate(group.get(key(c), {}), now), 2) for c in candidates]
+        ranked = sorted(range(len(candidates)), key=lambda i: (-rates[i], i))
+        return [candidates[i] for i in ranked]
+
+    def record(self, marketplace: str, field: str, tried: Sequence[str], winner: Optional[str]) -> None:
+        """
+        Outcome of one lookup: every alternative in `tried` before `winner`
+        missed, `winner` hit. winner=None means all of `tried` missed.
+        The winner is also noted in the scrape's extraction report.
+        """
+        if winner is not None:
+            note_strategy(field, winner)
+        self._load()
+        now = time.time()
+        with self._lock:
+            group = self._stats.setdefault(self._group(marketplace, field), {})
+            for name in tried:
+                hit = name == winner
+                entry = group.setdefault(name, {"rate": PRIOR_RATE, "hits": 0, "tries": 0})
+                rate = self._rate(entry, now)
+                entry["rate"] = round(rate + self.alpha * ((1.0 if hit else 0.0) - rate), 4)
+                entry["at"] = round(now)
+                entry["tries"] += 1
+                if hit:
+                    entry["hits"] += 1
+                    break
+            self._dirty = True
+
+    def save(self, force: bool = False) -> None:
+        """Write the stats if they changed and the last write is old enough"""
+        with self._lock:
+            if not self._dirty or (not force and time.monotonic() - self._saved_at < SELECTOR_STATS_SAVE_S):
+                return
+            payload = json.dumps(self._stats, indent=1, sort_keys=True)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Selector stats save failed: {e}")
+
+    def stats(self, marketplace: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+        self._load()
+        with self._lock:
+            return {
+                group: {name: dict(entry) for name, entry in entries.items()}
+                for group, entries in self._stats.items()
+                if marketplace is None or group.startswith(f"{marketplace}/")
+            }
+
+
+selector_stats = SelectorStats()
@@ -0,0 +1,203 @@
+"""
+Cold-start helpers for the API process.
+
+- LazyModule defers heavy imports (langchain, openai, playwright, numpy)
+  until first use.
+- BackgroundWarmup performs those imports and builds shared agents in a
+  thread after the server is already accepting health checks.
+- profile_imports / measure_startup report where import time goes and
+  whether the API comes up within its startup budget.
+
+Usage (from Shopper-python/):
+    python -m shopapp.startup --profile-imports --top 25
+    python -m shopapp.startup --measure
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Seconds from API import to accepting requests before a warning is logged
+STARTUP_BUDGET_S = float(os.getenv("SHOPPER_STARTUP_BUDGET_S", "1.5"))
+# Print an import-time profile in the background at startup
+IMPORT_PROFILE_ENV = "SHOPPER_IMPORT_PROFILE"
+
+
+class LazyModule:
+    """
+    Module proxy that imports on first attribute access.
+
+    Importing is guarded by a lock, so a request thread and the warmup
+    thread never import the same module twice concurrently.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        """True once imported, through this proxy or elsewhere"""
+        return self._module is not None or self._name in sys.modules
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+
+class BackgroundWarmup:
+    """
+    Runs named warmup steps in a daemon thread and records how long each took.
+
+    A failing step is logged and skipped; the rest still run. Callers that
+    need warm state wait with `wait` / `wait_async`.
+    """
+
+    def __init__(self, steps: List[Tuple[str, Callable[[], Any]]]):
+        self.steps = steps
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def start(self) -> "BackgroundWarmup":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        for name, step in self.steps:
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                self.errors[name] = f"{type(e).__name__}: {e}"
+                print(f"Warmup step '{name}' failed: {e}")
+            self.timings[name] = round(time.perf_counter() - start, 3)
+        total = sum(self.timings.values())
+        print(f"Warmup finished in {total:.2f}s: {self.timings}")
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    async def wait_async(self, timeout: Optional[float] = None) -> bool:
+        if self.ready:
+            return True
+        return await asyncio.to_thread(self._done.wait, timeout)
+
+    def status(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "timings": dict(self.timings), "errors": dict(self.errors)}
+
+
+def profile_imports(module: str = "shopapp.api", top: int = 20) -> List[Tuple[str, float, float]]:
+    """
+    Import `module` in a fresh interpreter with -X importtime
+
+    Returns the `top` imports by cumulative time as (name, self_ms, cumulative_ms).
+    """
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "profile")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)", line)
+        if match:
+            rows.append((match.group(4), int(match.group(1)) / 1000, int(match.group(2)) / 1000))
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows[:top]
+
+
+def print_import_profile(module: str = "shopapp.api", top: int = 20) -> None:
+    rows = profile_imports(module, top)
+    print(f"Import profile for {module} (top {len(rows)} by cumulative time)")
+    print(f"{'module':<60} {'self ms':>9} {'cum ms':>9}")
+    for name, self_ms, cum_ms in rows:
+        print(f"{name:<60} {self_ms:>9.1f} {cum_ms:>9.1f}")
+
+
+def start_import_profile_if_requested() -> None:
+    """Print the import profile from a background thread when SHOPPER_IMPORT_PROFILE is set"""
+    if os.getenv(IMPORT_PROFILE_ENV, "").lower() in ("1", "true", "yes"):
+        threading.Thread(target=print_import_profile, name="import-profile", daemon=True).start()
+
+
+def measure_startup(module: str = "shopapp.api") -> Dict[str, float]:
+    """
+    Time a fresh process from interpreter start to a served /healthz
+
+    Runs the app's lifespan through FastAPI's TestClient, so this covers
+    imports plus startup handlers but not the background warmup.
+    """
+    script = (
+        "import time; t0 = time.perf_counter()\n"
+        f"import {module} as m\n"
+        "t1 = time.perf_counter()\n"
+        "from fastapi.testclient import TestClient\n"
+        "with TestClient(m.app) as c:\n"
+        "    c.get('/healthz')\n"
+        "    t2 = time.perf_counter()\n"
+        "print(f'{t1 - t0:.3f} {t2 - t0:.3f}')\n"
+    )
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "profile")
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip()[-2000:])
+    import_s, healthz_s = (float(v) for v in proc.stdout.strip().splitlines()[-1].split())
+    return {"import_s": import_s, "first_healthz_s": healthz_s, "process_wall_s": round(wall, 3)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="API cold-start profiling")
+    parser.add_argument("--module", default="shopapp.api")
+    parser.add_argument("--profile-imports", action="store_true", help="Print the slowest imports")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--measure", action="store_true",
+                        help="Time import + startup to first /healthz and check the budget")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_S)
+    args = parser.parse_args(argv)
+
+    if not (args.profile_imports or args.measure):
+        parser.error("choose --profile-imports and/or --measure")
+
+    if args.profile_imports:
+        print_import_profile(args.module, args.top)
+
+    if args.measure:
+        result = measure_startup(args.module)
+        print(f"import: {result['import_s']:.3f}s, first /healthz: {result['first_healthz_s']:.3f}s "
+              f"(budget {args.budget:.2f}s)")
+        if result["first_healthz_s"] > args.budget:
+            print("Startup budget exceeded")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
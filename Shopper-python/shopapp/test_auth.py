@@ -0,0 +1,49 @@
+from shopapp import auth
+
+JWKS = {"keys": [{"kid": "k1", "kty": "RSA", "use": "sig", "n": "abc", "e": "AQAB"}]}
+
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return JWKS
+
+
+def test_jwks_is_fetched_once_and_refreshed_sparingly(monkeypatch):
+    calls = []
+
+    def fake_get(url, timeout):
+        calls.append(url)
+        return FakeResponse()
+
+    clock = [1000.0]
+    monkeypatch.setattr(auth.requests, "get", fake_get)
+    monkeypatch.setattr(auth.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(auth, "_jwks", None)
+    monkeypatch.setattr(auth, "_jwks_fetched_at", 0.0)
+
+    assert auth.get_public_key() == JWKS
+    assert auth.get_public_key() == JWKS
+    # An unknown key id forces a refetch, but not more than once a minute
+    assert auth.get_public_key(force_refresh=True) == JWKS
+    assert len(calls) == 1
+    clock[0] += auth.JWKS_MIN_REFRESH_S
+    auth.get_public_key(force_refresh=True)
+    assert len(calls) == 2
+    clock[0] += auth.JWKS_CACHE_TTL_S
+    auth.get_public_key()
+    assert len(calls) == 3
+
+
+def test_stale_jwks_is_kept_when_auth0_is_unreachable(monkeypatch):
+    def failing_get(url, timeout):
+        raise OSError("unreachable")
+
+    monkeypatch.setattr(auth.requests, "get", failing_get)
+    monkeypatch.setattr(auth, "_jwks", JWKS)
+    monkeypatch.setattr(auth, "_jwks_fetched_at", -auth.JWKS_CACHE_TTL_S * 2)
+    assert auth.get_public_key() == JWKS
+    assert auth._find_rsa_key(JWKS, "k1")["n"] == "abc"
+    assert auth._find_rsa_key(JWKS, "k2") == {}
@@ -0,0 +1,53 @@
+import pytest
+
+from shopapp.cache import TTLCache, fingerprint
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("shopapp.cache.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_fingerprint_ignores_key_order_but_not_values():
+    a = fingerprint({"query": "mug", "prefs": {"min": 1, "max": 5}})
+    b = fingerprint({"prefs": {"max": 5, "min": 1}, "query": "mug"})
+    assert a == b and len(a) == 64
+    assert a != fingerprint({"query": "mug", "prefs": {"min": 1, "max": 6}})
+    assert fingerprint(["a", "b"]) != fingerprint(["b", "a"])
+
+
+def test_entries_expire(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30)
+    assert cache.expires_in("a") == 10
+    clock[0] += 10
+    assert cache.get("a") is None
+    assert "a" not in cache and cache.expires_in("a") is None
+    assert cache.get("b") == 2 and cache.expires_in("b") == 20
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_pop_clear_and_stats(clock):
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("missing", "default") == "default"
+    assert cache.stats() == {"size": 1, "maxsize": 4, "ttl_s": 60, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+    assert cache.pop("a") == 1 and cache.pop("a", "gone") == "gone"
+    cache.set("b", 2)
+    cache.clear()
+    assert len(cache) == 0
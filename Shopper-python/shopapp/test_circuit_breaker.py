@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from shopapp.circuit_breaker import (
+    CLOSED, EMPTY, ERROR, HALF_OPEN, OPEN, SUCCESS, TIMEOUT,
+    CircuitBreaker, CircuitOpen, classify,
+)
+
+
+def make_breaker(**kwargs):
+    kwargs = {"window_s": 60, "min_calls": 4, "failure_rate": 0.5, "open_s": 10, "max_open_s": 25, **kwargs}
+    return CircuitBreaker("walmart", **kwargs)
+
+
+def trip(breaker, now=0.0):
+    for outcome in (SUCCESS, ERROR, EMPTY, TIMEOUT):
+        breaker.record(outcome, now)
+
+
+def test_classify():
+    assert classify([object()]) == SUCCESS
+    assert classify([]) == EMPTY
+    assert classify(None, ValueError("selector missing")) == ERROR
+    assert classify(None, asyncio.TimeoutError()) == TIMEOUT
+    assert classify(None, Exception("Timeout 60000ms exceeded")) == TIMEOUT
+
+
+def test_opens_only_after_min_calls_at_failure_rate():
+    breaker = make_breaker()
+    for outcome in (ERROR, ERROR, ERROR):
+        breaker.record(outcome, 0)
+    assert breaker.state == CLOSED
+
+    breaker.record(SUCCESS, 1)
+    assert breaker.state == OPEN and breaker.times_opened == 1
+    assert breaker.is_open(5) and breaker.retry_in(5) == 6
+
+
+def test_old_failures_leave_the_window():
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(ERROR, 0)
+    breaker.record(SUCCESS, 100)
+    assert breaker.state == CLOSED
+    assert breaker.stats(100)["calls"] == 1
+
+
+def test_skips_are_counted_while_open():
+    breaker = make_breaker()
+    trip(breaker)
+    assert not breaker.allow(1)
+    with pytest.raises(CircuitOpen) as info:
+        breaker.check(4)
+    assert info.value.retry_after == 6
+    assert breaker.stats(4)["skipped"] == 2
+
+
+def test_half_open_probe_success_closes():
+    breaker = make_breaker()
+    trip(breaker)
+    assert breaker.allow(10)
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow(10)  # only one probe at a time
+
+    breaker.record(SUCCESS, 11)
+    assert breaker.state == CLOSED and breaker.open_s == 10
+    assert breaker.stats(11)["calls"] == 0
+
+
+def test_half_open_probe_failure_doubles_cool_down_up_to_max():
+    breaker = make_breaker()
+    trip(breaker)
+    assert breaker.allow(10)
+    breaker.record(TIMEOUT, 10)
+    assert breaker.state == OPEN and breaker.open_s == 20
+    assert breaker.retry_in(15) == 15
+
+    assert breaker.allow(30)
+    breaker.record(ERROR, 30)
+    assert breaker.open_s == 25 and breaker.times_opened == 3
+
+    assert breaker.allow(55)
+    breaker.record(SUCCESS, 55)
+    assert breaker.state == CLOSED and breaker.open_s == 10
+
+
+def test_late_results_while_open_are_ignored():
+    breaker = make_breaker()
+    trip(breaker)
+    breaker.record(SUCCESS, 2)
+    assert breaker.state == OPEN and breaker.stats(2)["calls"] == 4
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import pytest
+
+from shopapp.agents.dag_executor import DAGExecutionError, DAGExecutor, Node
+
+
+def run(nodes, initial=None):
+    executor = DAGExecutor(nodes)
+    return executor, asyncio.run(executor.run(initial or {}))
+
+
+async def slow(query):
+    await asyncio.sleep(5)
+    return "never"
+
+
+def test_independent_nodes_overlap():
+    async def wait(query):
+        await asyncio.sleep(0.2)
+        return query
+
+    start = time.perf_counter()
+    _, values = run(
+        [
+            Node("a", wait, inputs=["query"]),
+            Node("b", wait, inputs=["query"]),
+            Node("c", lambda a, b: a + b, inputs=["a", "b"]),
+        ],
+        {"query": "x"},
+    )
+    assert values["c"] == "xx"
+    assert time.perf_counter() - start < 0.35
+
+
+def test_timeout_uses_fallback():
+    executor, values = run(
+        [Node("ideas", slow, inputs=["query"], timeout=0.05, fallback=lambda query: [query])],
+        {"query": "mug"},
+    )
+    assert values["ideas"] == ["mug"]
+    assert executor.timings["ideas"]["status"] == "timeout"
+
+
+def test_failure_without_fallback_names_the_node():
+    def boom(query):
+        raise ValueError("bad intent")
+
+    with pytest.raises(DAGExecutionError, match="Node 'intent' failed: bad intent"):
+        run([Node("intent", boom, inputs=["query"])], {"query": "mug"})
+
+
+def test_failing_fallback_is_wrapped_and_names_the_node():
+    def broken_fallback(query):
+        raise KeyError("cache")
+
+    executor = DAGExecutor([Node("ideas", slow, inputs=["query"], timeout=0.05, fallback=broken_fallback)])
+    with pytest.raises(DAGExecutionError, match="Node 'ideas'") as info:
+        asyncio.run(executor.run({"query": "mug"}))
+    assert isinstance(info.value.__cause__, KeyError)
+    assert executor.timings["ideas"]["status"] == "fallback error: KeyError"
+
+
+def test_multiple_outputs_and_missing_inputs():
+    _, values = run([Node("split", lambda query: {"head": query[0], "tail": query[1:]},
+                          inputs=["query"], outputs=["head", "tail"])], {"query": "mug"})
+    assert (values["head"], values["tail"]) == ("m", "ug")
+
+    with pytest.raises(DAGExecutionError, match="never became ready"):
+        run([Node("rank", lambda products: products, inputs=["products"])])
@@ -0,0 +1,56 @@
+from shopapp.agents.entity_resolution import EntityResolutionAgent
+from shopapp.models import Product
+
+
+def product(title, price, marketplace, currency="USD"):
+    slug = title.lower().replace(" ", "-")
+    return Product(marketplace=marketplace, title=title, url=f"https://{marketplace}.example/{slug}", price=price, currency=currency)
+
+
+def test_same_listing_on_two_stores_is_merged():
+    resolved = EntityResolutionAgent().resolve([
+        product("Apple iPhone 15 128GB Black", 799.0, "Amazon.com"),
+        product("Apple iPhone 15 (128GB) - Black", 829.0, "Best Buy"),
+    ])
+    assert len(resolved) == 1
+    assert resolved[0].price == 799.0
+    assert [offer.marketplace for offer in resolved[0].offers] == ["Amazon.com", "Best Buy"]
+
+
+def test_tier_words_keep_models_apart():
+    resolved = EntityResolutionAgent().resolve([
+        product("Apple iPhone 15 128GB Black", 799.0, "Amazon.com"),
+        product("Apple iPhone 15 Pro 128GB Black", 999.0, "Best Buy"),
+    ])
+    assert len(resolved) == 2
+    assert all(not p.offers for p in resolved)
+
+
+def test_different_model_numbers_are_not_merged():
+    resolved = EntityResolutionAgent().resolve([
+        product("Sony WH-1000XM4 Wireless Noise Cancelling Headphones", 248.0, "Amazon.com"),
+        product("Sony WH1000XM5 Wireless Noise Cancelling Headphones", 329.0, "Walmart"),
+    ])
+    assert len(resolved) == 2
+
+
+def test_same_model_number_merges_despite_title_differences():
+    resolved = EntityResolutionAgent().resolve([
+        product("Sony WH-1000XM5 Wireless Noise Cancelling Headphones, Black", 329.0, "Amazon.com"),
+        product("Sony WH1000XM5 Headphones", 349.0, "Walmart"),
+    ])
+    assert len(resolved) == 1
+    assert len(resolved[0].offers) == 2
+
+
+def test_vague_listing_does_not_chain_different_models():
+    resolved = EntityResolutionAgent().resolve([
+        product("Sony WH-1000XM4 Wireless Noise Cancelling Headphones Black", 248.0, "Amazon.com"),
+        product("Sony Wireless Noise Cancelling Headphones Black", 279.0, "Target"),
+        product("Sony WH-1000XM5 Wireless Noise Cancelling Headphones Black", 329.0, "Walmart"),
+    ])
+    xm4 = next(p for p in resolved if "XM4" in p.title)
+    xm5 = next(p for p in resolved if "XM5" in p.title)
+    assert xm4 is not xm5
+    assert "Walmart" not in [offer.marketplace for offer in xm4.offers]
+    assert "Amazon.com" not in [offer.marketplace for offer in xm5.offers]
@@ -0,0 +1,81 @@
+from shopapp.extraction_telemetry import ExtractionReport, ExtractionTelemetry, summarize
+from shopapp.models import Product
+
+
+def scrape(telemetry, cards, count, rated=True, marketplace="walmart"):
+    report = ExtractionReport(marketplace)
+    report.cards = cards
+    products = [
+        Product(marketplace=marketplace, title=f"Item {i}", url=f"u{i}", price=10.0 + i,
+                rating=4.0 if rated else None, thumbnail_url=f"https://img/{i}.jpg")
+        for i in range(count)
+    ]
+    return telemetry.record(report, products)
+
+
+def events(telemetry, metric):
+    return [entry["event"] for entry in telemetry.alert_log if entry["metric"] == metric]
+
+
+def test_rating_drop_raises_once_freezes_baseline_and_clears_on_recovery():
+    telemetry = ExtractionTelemetry()
+    for _ in range(10):
+        scrape(telemetry, cards=20, count=20)
+    assert telemetry.stats()["alerts"] == []
+
+    # Markup change: ratings stop being found
+    scrape(telemetry, cards=20, count=20, rated=False)
+    scrape(telemetry, cards=20, count=20, rated=False)
+    assert events(telemetry, "rating") == ["raised"]
+    baseline = telemetry.stats()["marketplaces"]["walmart"]["baseline"]["rating"]
+    assert baseline > 0.9
+
+    for _ in range(6):
+        scrape(telemetry, cards=20, count=20, rated=False)
+    walmart = telemetry.stats()["marketplaces"]["walmart"]
+    assert events(telemetry, "rating") == ["raised"]
+    assert walmart["alerts"] == ["rating"]
+    assert walmart["baseline"]["rating"] == baseline
+    assert walmart["recent"]["rating"] < 0.05
+    # Unaffected metrics keep updating and stay quiet
+    assert events(telemetry, "price") == []
+
+    for _ in range(3):
+        scrape(telemetry, cards=20, count=20)
+    assert events(telemetry, "rating") == ["raised", "cleared"]
+    assert telemetry.stats()["alerts"] == []
+
+
+def test_no_alerts_before_min_scrapes():
+    telemetry = ExtractionTelemetry()
+    scrape(telemetry, cards=20, count=20)
+    for _ in range(3):
+        scrape(telemetry, cards=20, count=20, rated=False)
+    assert list(telemetry.alert_log) == []
+
+
+def test_missing_cards_and_empty_scrapes_are_safe():
+    report = ExtractionReport("etsy")
+    summary = summarize(report, [])
+    assert summary["cards"] is None and summary["yield"] is None
+    assert all(summary[field] is None for field in ("price", "rating", "thumbnail", "rating_count"))
+
+    telemetry = ExtractionTelemetry()
+    # A marketplace that never reports cards and often finds nothing
+    for count in [0, 3, 0, 0, 2, 0, 0, 0, 1, 0]:
+        scrape(telemetry, cards=None, count=count, marketplace="etsy")
+    etsy = telemetry.stats()["marketplaces"]["etsy"]
+    assert "yield" not in etsy["recent"]
+    assert list(telemetry.alert_log) == []
+
+
+def test_one_empty_scrape_is_not_an_outage():
+    telemetry = ExtractionTelemetry()
+    for _ in range(10):
+        scrape(telemetry, cards=20, count=20)
+    scrape(telemetry, cards=0, count=0)
+    assert list(telemetry.alert_log) == []
+
+    # ... but a run of them is
+    scrape(telemetry, cards=0, count=0)
+    assert events(telemetry, "products") == ["raised"]
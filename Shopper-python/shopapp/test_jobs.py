@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+import pytest
+
+from shopapp.jobs import DONE, FAILED, InMemoryJobStore, JobQueue, JobStore, QueueFullError, SQLiteJobStore
+
+
+class RecordingSQLiteStore(SQLiteJobStore):
+    """Remembers which threads called get()"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = set()
+
+    def get(self, job_id):
+        self.threads.add(threading.get_ident())
+        return super().get(job_id)
+
+
+async def echo(params):
+    return {"query": params["query"]}
+
+
+async def failing(params):
+    raise ValueError("scrape exploded")
+
+
+def test_job_store_is_abstract():
+    with pytest.raises(TypeError):
+        JobStore()
+
+    class Partial(JobStore):
+        def create(self, job):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+@pytest.mark.parametrize("runner, status", [(echo, DONE), (failing, FAILED)])
+def test_sqlite_store_runs_off_the_event_loop(tmp_path, runner, status):
+    store = RecordingSQLiteStore(str(tmp_path / "jobs.db"))
+
+    async def main():
+        queue = JobQueue(runner, store=store, workers=1).start()
+        job = await queue.submit({"query": "mug"})
+        finished = await queue.wait(job["id"], timeout=5)
+        await queue.stop()
+        return threading.get_ident(), finished
+
+    loop_thread, finished = asyncio.run(main())
+    assert finished["status"] == status
+    if status == DONE:
+        assert finished["result"] == {"query": "mug"}
+    else:
+        assert finished["error"] == "scrape exploded"
+    assert store.threads and loop_thread not in store.threads
+
+
+def test_full_queue_is_refused_and_unstarted_jobs_fail_on_stop():
+    async def main():
+        queue = JobQueue(echo, store=InMemoryJobStore(), max_queued=1)  # no workers started
+        job = await queue.submit({"query": "mug"})
+        with pytest.raises(QueueFullError):
+            await queue.submit({"query": "lamp"})
+        await queue.stop()
+        return queue.store.get(job["id"])
+
+    job = asyncio.run(main())
+    assert job["status"] == FAILED
+    assert "shut down" in job["error"]
@@ -0,0 +1,69 @@
+import time
+
+from shopapp.agents.deal_detection import DealDetectionAgent
+from shopapp.models import Product
+from shopapp.price_history import PriceHistoryStore, canonical_product_id
+
+DAY = 86400
+# Within the retention window, so compaction keeps the rows
+START = int(time.time()) - 30 * DAY
+
+
+def listing(asin, price):
+    return Product(marketplace="Amazon.com", title=f"Listing {asin}", url=f"https://www.amazon.com/dp/{asin}?ref=sr_1", price=price, currency="USD")
+
+
+def record_series(store, asin, prices, start=START):
+    for day, price in enumerate(prices):
+        store.record([listing(asin, price)], now=start + day * DAY)
+
+
+def test_canonical_id_ignores_tracking_parameters():
+    assert canonical_product_id("https://www.amazon.com/Some-Slug/dp/B0ABCDEF12/ref=sr_1?tag=x") == \
+        canonical_product_id("https://www.amazon.com/dp/B0ABCDEF12")
+
+
+def test_lookup_sees_buffered_and_compacted_rows(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    record_series(store, "B0AAAAAAAA", [60.0, 55.0, 50.0])
+    before = store.lookup([listing("B0AAAAAAAA", 55.0)])[0]
+
+    store.compact()
+    record_series(store, "B0AAAAAAAA", [65.0], start=START + 10 * DAY)
+    after = store.lookup([listing("B0AAAAAAAA", 55.0)])[0]
+    store.close()
+
+    assert before == {"points": 3, "low": 50.0, "median": 55.0, "high": 60.0, "percentile": 33.3, "previous_low": 50.0}
+    assert (after["points"], after["low"], after["high"], after["median"]) == (4, 50.0, 65.0, 57.5)
+
+    reopened = PriceHistoryStore(str(tmp_path))
+    assert reopened.lookup([listing("B0AAAAAAAA", 55.0)])[0]["points"] == 4
+
+
+def test_unchanged_price_is_recorded_at_most_hourly(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    assert store.record([listing("B0BBBBBBBB", 20.0)], now=START) == 1
+    assert store.record([listing("B0BBBBBBBB", 20.0)], now=START + 60) == 0
+    assert store.record([listing("B0BBBBBBBB", 19.0)], now=START + 120) == 1
+
+
+def test_all_time_low_needs_a_real_drop(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    # Current scrapes are recorded before deal detection looks them up
+    record_series(store, "B0FLAT0050", [50.0, 50.0, 50.0])
+    record_series(store, "B0FLAT0080", [80.0, 80.0, 80.0, 80.0])
+    record_series(store, "B0DROP0045", [60.0, 55.0, 58.0, 45.0])
+    record_series(store, "B0BACKUP60", [50.0, 55.0, 60.0])
+
+    products = [
+        listing("B0FLAT0050", 50.0),
+        listing("B0FLAT0080", 80.0),
+        listing("B0DROP0045", 45.0),
+        listing("B0BACKUP60", 60.0),
+    ]
+    deals = DealDetectionAgent(history=store).analyze_deals(products, "USA")
+    store.close()
+
+    assert [deals[i]["price_history"]["is_all_time_low"] for i in range(4)] == [False, False, True, False]
+    assert "All-Time Low" not in deals[0]["tags"] and "All-Time Low" not in deals[1]["tags"]
+    assert "All-Time Low" in deals[2]["tags"]
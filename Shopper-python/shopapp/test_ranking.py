@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+import pytest
+
+from shopapp.models import Product, ProductSearchPreferences
+from shopapp.ranking import rank_products, score_product, score_products, top_k_indices
+
+WORDS = ["Apple", "app", "Samsung", "wireless", "Noise", "Cancelling", "pro", "case", "USB-C", "Sony"]
+
+
+def random_product(rng, i):
+    return Product(
+        marketplace=rng.choice(["amazon", "flipkart"]),
+        title=" ".join(rng.sample(WORDS, rng.randint(1, 5))),
+        url=f"https://example.com/{i}",
+        price=rng.choice([None, 0.0, round(rng.uniform(1, 5000), 2)]),
+        rating=rng.choice([None, round(rng.uniform(0, 5), 1)]),
+        rating_count=rng.choice([None, 0, rng.randint(1, 100000)]),
+        is_sponsored=rng.random() < 0.3,
+        primary_features=rng.sample(WORDS, rng.randint(0, 3)),
+    )
+
+
+PREFERENCES = [
+    ProductSearchPreferences(query="anything"),
+    ProductSearchPreferences(
+        query="headphones",
+        min_price=500,
+        max_price=2500,
+        min_rating=3.5,
+        prefer_brands=["Sony", "app"],
+        exclude_brands=["Apple"],
+        must_have_features=["noise cancelling", "wireless"],
+        nice_to_have_features=["usb-c", "Case"],
+    ),
+    ProductSearchPreferences(query="cheap", max_price=100, must_have_features=["PRO"]),
+]
+
+
+@pytest.mark.parametrize("prefs", PREFERENCES)
+def test_batch_scores_match_scalar_reference(prefs):
+    rng = random.Random(29)
+    products = [random_product(rng, i) for i in range(300)]
+    expected = [score_product(p, prefs) for p in products]
+    np.testing.assert_allclose(score_products(products, prefs), expected, rtol=1e-12, atol=1e-9)
+
+
+@pytest.mark.parametrize("prefs", PREFERENCES)
+def test_ranking_matches_stable_sort_of_scalar_scores(prefs):
+    rng = random.Random(30)
+    products = [random_product(rng, i) for i in range(200)]
+    scored = [(p, score_product(p, prefs)) for p in products]
+    expected = sorted(scored, key=lambda x: x[1], reverse=True)[:10]
+    ranked = rank_products(products, prefs, top_k=10)
+    assert [p.url for p, _ in ranked] == [p.url for p, _ in expected]
+
+
+def test_overlapping_terms_each_count():
+    prefs = ProductSearchPreferences(query="phone", prefer_brands=["app", "apple"])
+    product = Product(marketplace="amazon", title="Apple iPhone", url="u")
+    assert score_products([product], prefs)[0] == score_product(product, prefs) == 20
+
+
+def test_top_k_breaks_ties_by_input_order():
+    scores = np.array([1.0, 3.0, 3.0, 2.0, 3.0])
+    assert top_k_indices(scores, 2).tolist() == [1, 2]
+    assert top_k_indices(scores, 10).tolist() == [1, 2, 4, 3, 0]
+    assert top_k_indices(scores, 0).tolist() == []
+    assert top_k_indices(np.zeros(0), 3).tolist() == []
+    assert rank_products([], PREFERENCES[0]) == []
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from shopapp.agents import ranking
+from shopapp.agents.ranking import IntelligentRankingAgent
+from shopapp.cache import TTLCache
+from shopapp.models import Product
+
+INTENT = {"understanding": {"product_category": "headphones", "budget_max": 400}, "constraints": {}}
+
+
+class StubLLM:
+    """Ranks the candidate table by title, Z to A, and counts its calls"""
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    def invoke(self, messages):
+        self.calls += 1
+        if self.fail:
+            raise TimeoutError("LLM unavailable")
+        rows = [line.split("|") for line in messages[-1].content.split("Products to rank:\n")[1].splitlines()[1:]]
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return AIMessage(content=json.dumps([
+            {"product_index": int(row[0]), "rank": rank, "overall_score": 90 - rank, "reasoning": row[1]}
+            for rank, row in enumerate(rows, 1)
+        ]))
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(ranking, "ranking_cache", TTLCache())
+    agent = IntelligentRankingAgent(api_key="test")
+    agent.llm = StubLLM()
+    return agent
+
+
+def products():
+    return [
+        Product(marketplace="Amazon.com", title=f"{name} Headphones", url=f"https://shop.example/{name}",
+                price=price, rating=4.5)
+        for name, price in [("Anker", 60.0), ("Bose", 280.0), ("Sony", 300.0), ("JBL", 90.0)]
+    ]
+
+
+def urls(results):
+    return [r["product"].url for r in results]
+
+
+def rank(agent, items, intent=INTENT):
+    return agent.rank_products(items, intent, {}, {}, "usa")
+
+
+def test_cache_hit_skips_the_llm(agent):
+    first = rank(agent, products())
+    second = rank(agent, products())
+    assert agent.llm.calls == 1
+    assert urls(first) == urls(second) == [
+        "https://shop.example/Sony", "https://shop.example/JBL",
+        "https://shop.example/Bose", "https://shop.example/Anker",
+    ]
+    assert [r["reasoning"] for r in second] == [r["reasoning"] for r in first]
+
+
+def test_hit_remaps_indices_by_url_when_candidates_are_reordered(agent):
+    first = rank(agent, products())
+    reordered = list(reversed(products()))
+    second = rank(agent, reordered)
+    assert agent.llm.calls == 1
+    assert urls(second) == urls(first)
+    # Each result still carries its own product's details
+    assert all(r["reasoning"] == r["product"].title for r in second)
+
+
+def test_price_or_intent_change_misses(agent):
+    rank(agent, products())
+
+    repriced = products()
+    repriced[1] = repriced[1].model_copy(update={"price": 199.0})
+    rank(agent, repriced)
+    assert agent.llm.calls == 2
+
+    rank(agent, products(), {**INTENT, "understanding": {**INTENT["understanding"], "budget_max": 150}})
+    assert agent.llm.calls == 3
+
+
+def test_fallback_rankings_are_not_cached(agent):
+    agent.llm = StubLLM(fail=True)
+    rank(agent, products())
+    assert len(ranking.ranking_cache) == 0
+
+    agent.llm = StubLLM()
+    rank(agent, products())
+    rank(agent, products())
+    assert agent.llm.calls == 1
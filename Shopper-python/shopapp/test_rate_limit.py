@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from shopapp import enrichment
+from shopapp.circuit_breaker import CircuitBreakers
+from shopapp.models import Product
+from shopapp.rate_limit import KeyedLimiter, RateLimited, TokenBucket, parse_rates, user_key
+from shopapp.scrape_scheduler import BrowserSlots
+
+
+def test_bucket_allows_a_burst_then_paces_at_the_rate():
+    bucket = TokenBucket(rate=1.0, burst=3)
+    bucket.updated = now = 100.0
+    assert [bucket.reserve(10, now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Reservations queue up one refill interval apart
+    assert bucket.reserve(10, now) == pytest.approx(1.0)
+    assert bucket.reserve(10, now) == pytest.approx(2.0)
+    assert bucket.reserve(1.5, now) is None
+    assert bucket.delay(now + 10) == 0.0
+
+
+def test_limiter_rejects_beyond_max_wait_and_counts():
+    limiter = KeyedLimiter("marketplace", rate_per_min=60, burst=1, max_wait=1.5)
+    assert limiter.reserve("walmart") == 0.0
+    assert limiter.reserve("walmart") == pytest.approx(1.0, abs=0.05)
+    with pytest.raises(RateLimited) as raised:
+        limiter.reserve("walmart")
+    assert raised.value.retry_after_header == "1"
+    # Other keys have their own bucket; a caller can only tighten max_wait
+    assert limiter.reserve("target") == 0.0
+    with pytest.raises(RateLimited):
+        limiter.reserve("target", max_wait=0.5)
+    stats = limiter.stats()
+    assert (stats["granted"], stats["delayed"], stats["rejected"]) == (3, 1, 2)
+
+
+def test_check_only_fails_when_every_key_is_backlogged():
+    limiter = KeyedLimiter("marketplace", rate_per_min=60, burst=1, max_wait=1.5)
+    limiter.reserve("walmart")
+    limiter.reserve("walmart")
+    limiter.check(["walmart", "target"])
+    with pytest.raises(RateLimited):
+        limiter.check(["walmart"])
+
+
+def test_disabled_limiter_never_waits():
+    limiter = KeyedLimiter("user", rate_per_min=0, burst=1, max_wait=0)
+    assert [limiter.reserve("ip:1.2.3.4") for _ in range(5)] == [0.0] * 5
+
+
+def test_user_buckets_are_bounded():
+    limiter = KeyedLimiter("user", rate_per_min=10, burst=1, max_wait=0, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.reserve(key)
+    assert limiter.stats()["tracked"] == 2
+
+
+def test_helpers():
+    assert parse_rates("flipkart=20, amazon_in=30,bad") == {"flipkart": 20.0, "amazon_in": 30.0}
+    assert user_key({"sub": "auth0|1"}, "1.2.3.4") == "user:auth0|1"
+    assert user_key({}, None) == "ip:unknown"
+
+
+def test_enrichment_skips_open_circuits_and_paces_page_loads(monkeypatch):
+    breakers = CircuitBreakers()
+    breakers.get("target").state = "open"
+    breakers.get("target").opened_at = float("inf")
+    limiter = KeyedLimiter("marketplace", rate_per_min=60, burst=1, max_wait=20)
+    monkeypatch.setattr(enrichment, "circuit_breakers", breakers)
+    monkeypatch.setattr(enrichment, "marketplace_limiter", limiter)
+    monkeypatch.setattr(enrichment, "capture_mode", lambda: False)
+    enrichment.details_cache.clear()
+
+    loaded = []
+
+    def fake_fetch(targets, deadline):
+        loaded.extend(targets)
+        return {url: {"primary_features": ["x"]} for _, url, _ in targets}
+
+    monkeypatch.setattr(enrichment, "_fetch_pages_sync", fake_fetch)
+    products = [
+        Product(marketplace="Walmart", title=f"Item {i}", url=f"https://www.walmart.com/ip/{i}", price=10.0)
+        for i in range(4)
+    ] + [Product(marketplace="Target", title="Item", url="https://www.target.com/p/A-1", price=10.0)]
+
+    slots = BrowserSlots(1)
+    details = asyncio.run(enrichment.fetch_details(products, deadline_s=3.5, slots=slots))
+
+    # Target's circuit is open; Walmart's tokens come at 0s, 1s, 2s and the 4th would miss the deadline
+    assert [key for key, _, _ in loaded] == ["walmart"] * 3
+    assert [round(delay) for _, _, delay in loaded] == [0, 1, 2]
+    assert len(details) == 3
+    assert slots.in_use == 0
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/search-deep-agent", {"query": "headphones", "marketplace": "usa"}),
+    ("/search", {"query": "headphones", "marketplace": "usa", "mode": "deep-agent"}),
+])
+def test_deep_agent_search_answers_429_when_marketplaces_are_backed_up(monkeypatch, path, body):
+    from fastapi.testclient import TestClient
+    from shopapp import api
+
+    limiter = KeyedLimiter("marketplace", rate_per_min=1, burst=1, max_wait=0)
+    for key in api.marketplaces_for_region("usa"):
+        limiter.reserve(key)
+
+    async def no_agent(app):
+        raise AssertionError("the deep agent must not run")
+
+    monkeypatch.setattr(api, "marketplace_limiter", limiter)
+    monkeypatch.setattr(api, "_get_deep_agent", no_agent)
+    response = TestClient(api.app).post(path, json=body)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
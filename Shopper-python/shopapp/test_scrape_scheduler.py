@@ -0,0 +1,45 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from shopapp import scrape_scheduler
+from shopapp.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreakers
+from shopapp.rate_limit import KeyedLimiter
+from shopapp.scrape_scheduler import BrowserSlots, ScrapeJob
+
+
+def test_budget_cancel_before_the_thread_starts_still_frees_the_slot(monkeypatch):
+    breakers = CircuitBreakers()
+    breaker = breakers.get("walmart")
+    breaker.state, breaker.opened_at = OPEN, -1e9  # cool-down over: next scrape is a probe
+    monkeypatch.setattr(scrape_scheduler, "circuit_breakers", breakers)
+    unlimited = KeyedLimiter("marketplace", rate_per_min=0, burst=1, max_wait=0)
+    monkeypatch.setattr(scrape_scheduler, "marketplace_limiter", unlimited)
+    monkeypatch.setattr(scrape_scheduler, "scrape", lambda marketplace, query, max_results, report: ["late result"])
+    monkeypatch.setattr(scrape_scheduler, "_record_prices", lambda products: None)
+    monkeypatch.setattr(scrape_scheduler.extraction_telemetry, "record", lambda report, products: None)
+    slots = BrowserSlots(1)
+    busy = threading.Event()
+
+    async def main():
+        # The only executor thread is busy, so the scrape stays queued past the budget
+        executor = ThreadPoolExecutor(max_workers=1)
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(executor)
+        loop.run_in_executor(None, busy.wait)
+
+        jobs = [ScrapeJob("mug", "walmart", 0, 5)]
+        result = await scrape_scheduler.fan_out(jobs, time_budget=0.1, slots=slots)
+        assert result["timed_out"] == 1
+        assert breaker.state == HALF_OPEN and slots.in_use == 1
+
+        await asyncio.sleep(0.05)  # let the cancellation reach the queued executor future
+        busy.set()
+        await asyncio.wait_for(slots.acquire(), timeout=2)
+        slots.release()
+        executor.shutdown(wait=True)
+
+    asyncio.run(main())
+    assert slots.in_use == 0
+    # The probe ran after all and its success closed the circuit
+    assert breaker.state == CLOSED and breaker.probing == 0
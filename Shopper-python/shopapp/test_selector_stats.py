@@ -0,0 +1,102 @@
+import asyncio
+
+from shopapp import amazon_prices
+from shopapp.selector_stats import SelectorStats
+
+CARDS = ["div[data-search-results-lg] > div", "li.wt-list-unstyled", "div.v2-listing-card"]
+HOUR = 3600
+
+
+def make_stats(tmp_path, **kwargs):
+    kwargs.setdefault("explore", 0)
+    return SelectorStats(str(tmp_path / "selector_stats.json"), **kwargs)
+
+
+def test_order_prefers_recent_successes_and_keeps_written_order_on_ties(tmp_path):
+    stats = make_stats(tmp_path)
+    assert stats.order("etsy", "card", CARDS) == CARDS
+
+    for _ in range(3):
+        stats.record("etsy", "card", CARDS, CARDS[2])
+    assert stats.order("etsy", "card", CARDS) == [CARDS[2], CARDS[0], CARDS[1]]
+
+
+def test_only_alternatives_up_to_the_winner_are_counted(tmp_path):
+    stats = make_stats(tmp_path)
+    stats.record("etsy", "card", CARDS, CARDS[1])
+    entries = stats.stats()["etsy/card"]
+    assert (entries[CARDS[0]]["tries"], entries[CARDS[0]]["hits"]) == (1, 0)
+    assert (entries[CARDS[1]]["tries"], entries[CARDS[1]]["hits"]) == (1, 1)
+    assert CARDS[2] not in entries
+
+
+def test_demoted_selector_recovers_through_decay(tmp_path, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr("shopapp.selector_stats.time.time", lambda: clock[0])
+    stats = make_stats(tmp_path, half_life_s=6 * HOUR)
+
+    # One transient miss of the precise selector, then the generic one keeps matching
+    stats.record("etsy", "card", CARDS[:2], CARDS[1])
+    for _ in range(20):
+        stats.record("etsy", "card", [CARDS[1]], CARDS[1])
+    assert stats.order("etsy", "card", CARDS)[0] == CARDS[1]
+
+    # Without further tries both drift back to the prior, where written order wins
+    clock[0] += 10 * 24 * HOUR
+    assert stats.order("etsy", "card", CARDS) == CARDS
+
+
+def test_exploration_uses_written_order(tmp_path):
+    stats = make_stats(tmp_path, explore=1.0)
+    for _ in range(5):
+        stats.record("etsy", "card", CARDS, CARDS[2])
+    assert stats.order("etsy", "card", CARDS) == CARDS
+
+
+def test_stats_persist(tmp_path):
+    stats = make_stats(tmp_path)
+    stats.record("target", "title", ["h3", "a"], "a")
+    stats.save(force=True)
+    reloaded = make_stats(tmp_path)
+    assert reloaded.order("target", "title", ["h3", "a"]) == ["a", "h3"]
+
+
+class FakeElement:
+    def __init__(self, text):
+        self.text = text
+
+    async def inner_text(self):
+        return self.text
+
+
+class FakeCard:
+    """Result card with a default-variant price and an "options from" button"""
+
+    def __init__(self, selectors):
+        self.selectors = selectors
+
+    async def query_selector(self, selector):
+        text = self.selectors.get(selector)
+        return FakeElement(text) if text is not None else None
+
+    async def query_selector_all(self, selector):
+        text = self.selectors.get(selector)
+        return [FakeElement(text)] if text is not None else []
+
+
+def test_variant_price_keeps_priority_over_reordered_strategies(tmp_path, monkeypatch):
+    stats = make_stats(tmp_path)
+    monkeypatch.setattr(amazon_prices, "selector_stats", stats)
+    # Plenty of cards without variants, where only the offscreen price exists
+    for _ in range(20):
+        stats.record("amazon_us", "price", ["variant_options"], None)
+        stats.record("amazon_us", "price", ["offscreen"], "offscreen")
+
+    card = FakeCard({
+        amazon_prices.VARIANT_BUTTONS: "2 options from\n$14.47",
+        ".a-price .a-offscreen": "$19.99",
+    })
+    assert asyncio.run(amazon_prices.extract_price(card, "", "amazon_us")) == (14.47, "variant_options")
+
+    plain = FakeCard({".a-price .a-offscreen": "$19.99"})
+    assert asyncio.run(amazon_prices.extract_price(plain, "", "amazon_us")) == (19.99, "offscreen")
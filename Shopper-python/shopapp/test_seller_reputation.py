@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from shopapp.agents.market_analysis import MarketSnapshot
+from shopapp.agents.seller_reputation import SellerReputationAgent
+from shopapp.models import Product
+
+CATEGORIES = {
+    "Kindle Paperwhite E-Reader": 140.0,
+    "Gaiam Yoga Mat Premium Thick": 30.0,
+    "Sony Wireless Noise Cancelling Headphones": 300.0,
+    "Stainless Steel Insulated Water Bottle": 25.0,
+}
+MARKETPLACES = ["Amazon.com", "Walmart", "Target", "Etsy", "Best Buy", "Some Outlet"]
+
+
+def random_products(seed, count=60):
+    rng = random.Random(seed)
+    products = []
+    for i in range(count):
+        title, typical = rng.choice(list(CATEGORIES.items()))
+        products.append(Product(
+            marketplace=rng.choice(MARKETPLACES),
+            title=f"{title} {rng.choice(['', 'Bundle', 'Gift Edition', 'Renewed'])}".strip(),
+            url=f"https://example.com/{i}",
+            # Mostly around the typical price, with outliers both ways and missing prices
+            price=rng.choice([None, 0.0, typical * rng.uniform(0.2, 2.5), typical * rng.uniform(0.8, 1.2)]),
+            rating=rng.choice([None, 0.0, round(rng.uniform(1, 5), 1)]),
+            rating_count=rng.choice([None, 0, rng.randint(1, 4), rng.randint(5, 2000)]),
+        ))
+    return products
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_batch_matches_per_product_reference(seed):
+    agent = SellerReputationAgent()
+    products = random_products(seed)
+    snapshot = MarketSnapshot(products)
+    batch = agent.batch_analyze(products, snapshot)
+    assert sorted(batch) == list(range(len(products)))
+    for idx in range(len(products)):
+        assert batch[idx] == agent.analyze_seller(snapshot, idx), products[idx]
+
+
+def test_cheap_items_are_judged_within_their_category():
+    agent = SellerReputationAgent()
+    products = [
+        Product(marketplace="Amazon.com", title="Kindle Paperwhite E-Reader", url="a", price=140.0, rating=4.6),
+        Product(marketplace="Walmart", title="Kindle Paperwhite E-Reader 16GB", url="b", price=150.0, rating=4.5),
+        Product(marketplace="Target", title="Gaiam Yoga Mat Premium", url="c", price=25.0, rating=4.4),
+        Product(marketplace="Etsy", title="Gaiam Yoga Mat Premium Thick", url="d", price=30.0, rating=4.7),
+    ]
+    batch = agent.batch_analyze(products)
+    assert all(rep["details"]["price_status"] == "normal" for rep in batch.values())
@@ -0,0 +1,60 @@
+from shopapp.utils.title_clustering import TitleClusterer, title_tokens
+
+
+def clusters_of(titles):
+    labels = TitleClusterer().cluster(titles).tolist()
+    return {title: label for title, label in zip(titles, labels)}
+
+
+def test_tokens_drop_units_colours_and_quantities():
+    assert title_tokens("Apple iPhone 15 (128 GB) - Black") == ["apple", "iphone"]
+    assert title_tokens("Gaiam Yoga Mat Premium 6mm Thick") == ["gaiam", "yoga", "mat", "premium", "thick"]
+    assert title_tokens("BalanceFrom Yoga Mat 1/4-Inch") == ["balancefrom", "yoga", "mat"]
+
+
+def test_shared_units_and_colours_do_not_join_categories():
+    titles = [
+        "Apple iPhone 15 (128 GB) - Black",
+        "Apple iPhone 15 Pro 256GB",
+        "Kindle Paperwhite",
+        "Kindle Paperwhite 16GB Black",
+        "Samsung Galaxy S24 Ultra 256GB Black",
+        "Black Running Shoes for Men Size 10",
+    ]
+    labels = clusters_of(titles)
+    assert labels["Apple iPhone 15 (128 GB) - Black"] == labels["Apple iPhone 15 Pro 256GB"]
+    assert labels["Kindle Paperwhite"] == labels["Kindle Paperwhite 16GB Black"]
+    assert len({
+        labels["Apple iPhone 15 (128 GB) - Black"],
+        labels["Kindle Paperwhite"],
+        labels["Samsung Galaxy S24 Ultra 256GB Black"],
+        labels["Black Running Shoes for Men Size 10"],
+    }) == 4
+
+
+def test_yoga_mats_cluster_together():
+    mats = [
+        "Gaiam Yoga Mat Premium 6mm Thick",
+        "Liforme Yoga Mat Black 4mm",
+        "BalanceFrom GoYoga All-Purpose Yoga Mat 1/4-Inch Extra Thick",
+        "Amazon Basics Yoga Mat 1/2-Inch Extra Thick Exercise Mat",
+        "Manduka PRO Yoga Mat 6mm",
+    ]
+    labels = clusters_of(["Kindle Paperwhite 16GB Black"] + mats)
+    assert len({labels[m] for m in mats}) == 1
+    assert labels["Kindle Paperwhite 16GB Black"] != labels[mats[0]]
+
+
+def test_no_chaining_through_intermediate_titles():
+    # b is close to both a and c, but a and c have nothing in common
+    a = "Wireless Mouse Ergonomic"
+    b = "Wireless Mouse Keyboard Combo Desk"
+    c = "Keyboard Desk Organizer Shelf"
+    labels = clusters_of([a, b, c])
+    assert labels[a] == labels[b]
+    assert labels[c] != labels[a]
+
+
+def test_labels_follow_first_appearance():
+    labels = TitleClusterer().cluster(["", "Kindle Paperwhite", "Kindle Paperwhite Signature", "Yoga Mat Thick"])
+    assert labels.tolist() == [0, 1, 1, 2]
@@ -0,0 +1,337 @@
+"""
+Thumbnail proxy: fetch marketplace images once, downsize, cache on disk.
+
+Images are stored under THUMB_CACHE_DIR keyed by sha256(url, width) and
+evicted least-recently-used once the directory exceeds its byte budget.
+Every cached file has a strong ETag (hash of its bytes), so browsers and
+CDNs can keep it for a year and revalidate for free. Concurrent requests
+for the same image share one upstream fetch.
+
+Only hosts of known marketplace image CDNs are fetched, so the endpoint
+cannot be used to reach arbitrary (internal) addresses.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import re
+import threading
+import urllib.parse
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import requests
+
+try:
+    from PIL import Image
+except ImportError:  # Resizing is skipped without Pillow; originals are served as-is
+    Image = None
+
+THUMB_CACHE_DIR = os.getenv("THUMB_CACHE_DIR", "thumb_cache")
+THUMB_CACHE_MAX_BYTES = int(os.getenv("THUMB_CACHE_MAX_MB", "256")) * 1024 * 1024
+THUMB_FETCH_TIMEOUT_S = float(os.getenv("THUMB_FETCH_TIMEOUT_S", "10"))
+# Larger sources are refused outright
+MAX_SOURCE_BYTES = 8 * 1024 * 1024
+# Requested widths snap to these, so one image has at most a few variants on disk
+WIDTHS = (160, 320, 480, 640)
+DEFAULT_WIDTH = 320
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+ALLOWED_HOST_SUFFIXES = tuple(
+    suffix.strip().lower()
+    for suffix in os.getenv(
+        "THUMB_ALLOWED_HOSTS",
+        "flixcart.com,media-amazon.com,ssl-images-amazon.com,images-amazon.com,"
+        "walmartimages.com,scene7.com,etsystatic.com,bbystatic.com",
+    ).split(",")
+    if suffix.strip()
+)
+
+_CONTENT_TYPES = {"webp": "image/webp", "jpg": "image/jpeg", "png": "image/png", "gif": "image/gif"}
+_EXTENSIONS = {value: key for key, value in _CONTENT_TYPES.items()}
+
+# CDN URL size markers, rewritten so the CDN already returns a small image
+_FLIPKART_SIZE_RE = re.compile(r"/image/\d+/\d+/")
+_AMAZON_SIZE_RE = re.compile(r"\._[A-Z0-9_,]+_\.(jpg|jpeg|png|webp)$", re.I)
+
+
+class ThumbnailError(Exception):
+    """Carries the HTTP status the endpoint should answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def snap_width(width: Optional[int]) -> int:
+    if not width:
+        return DEFAULT_WIDTH
+    return next((w for w in WIDTHS if w >= width), WIDTHS[-1])
+
+
+def validate_source(url: str) -> str:
+    """Reject anything that is not an https(s) image on an allowed CDN host"""
+    if not url or url.startswith("data:"):
+        # Lazy-load placeholders inlined by the marketplace
+        raise ThumbnailError(404, "No image")
+    parsed = urllib.parse.urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if parsed.scheme not in ("http", "https") or not host:
+        raise ThumbnailError(400, "Unsupported image URL")
+    if not any(host == suffix or host.endswith("." + suffix) for suffix in ALLOWED_HOST_SUFFIXES):
+        raise ThumbnailError(400, f"Image host not allowed: {host}")
+    return url
+
+
+def sized_source_url(url: str, width: int) -> str:
+    """Ask the CDN for roughly the size we need instead of the full image"""
+    if "flixcart.com" in url:
+        return _FLIPKART_SIZE_RE.sub(f"/image/{width}/{width}/", url, count=1)
+    if "amazon.com" in url:
+        return _AMAZON_SIZE_RE.sub(lambda m: f"._AC_UL{width}_.{m.group(1)}", url)
+    return url
+
+
+def cache_key(url: str, width: int) -> str:
+    return hashlib.sha256(f"{width}:{url}".encode("utf-8")).hexdigest()
+
+
+class ThumbnailCache:
+    """
+    Disk cache of processed thumbnails with byte-budget LRU eviction.
+
+    The index (key -> path, size, etag) lives in memory and is rebuilt from
+    the directory on first use, ordered by file mtime; hits refresh mtime,
+    so recency survives restarts.
+    """
+
+    def __init__(self, directory: str = THUMB_CACHE_DIR, max_bytes: int = THUMB_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._index: "OrderedDict[str, Tuple[str, int, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            entries = []
+            if os.path.isdir(self.directory):
+                for root, _, files in os.walk(self.directory):
+                    for name in files:
+                        key, _, ext = name.partition(".")
+                        if ext not in _CONTENT_TYPES:
+                            continue
+                        path = os.path.join(root, name)
+                        stat = os.stat(path)
+                        entries.append((stat.st_mtime, key, path, stat.st_size))
+            for _, key, path, size in sorted(entries):
+                self._index[key] = (path, size, "")
+                self.total_bytes += size
+            self._loaded = True
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str, str]]:
+        """(content, content_type, etag) for a cached thumbnail"""
+        self._load()
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+        path, size, etag = entry
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._index.pop(key, None)
+                self.total_bytes -= size
+                self.misses += 1
+            return None
+        if not etag:
+            etag = _etag(content)
+            with self._lock:
+                if key in self._index:
+                    self._index[key] = (path, size, etag)
+        with self._lock:
+            self.hits += 1
+        return content, _CONTENT_TYPES[path.rsplit(".", 1)[1]], etag
+
+    def put(self, key: str, content: bytes, content_type: str) -> str:
+        """Store a thumbnail atomically; returns its ETag"""
+        self._load()
+        ext = _EXTENSIONS.get(content_type, "jpg")
+        folder = os.path.join(self.directory, key[:2])
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{key}.{ext}")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+        etag = _etag(content)
+        evicted = []
+        with self._lock:
+            previous = self._index.pop(key, None)
+            if previous:
+                self.total_bytes -= previous[1]
+                if previous[0] != path:
+                    evicted.append(previous[0])
+            self._index[key] = (path, len(content), etag)
+            self.total_bytes += len(content)
+            while self.total_bytes > self.max_bytes and len(self._index) > 1:
+                _, (old_path, old_size, _) = self._index.popitem(last=False)
+                self.total_bytes -= old_size
+                evicted.append(old_path)
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+        return etag
+
+    async def fetch(self, url: str, width: Optional[int] = None) -> Tuple[bytes, str, str]:
+        """
+        Cached thumbnail for `url`, fetching and resizing it on a miss
+
+        Concurrent misses for the same (url, width) wait on a single fetch.
+        Raises ThumbnailError on invalid URLs or upstream failures.
+        """
+        validate_source(url)
+        width = snap_width(width)
+        key = cache_key(url, width)
+
+        cached = await asyncio.to_thread(self.get, key)
+        if cached is not None:
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await asyncio.to_thread(self._fetch_and_store, key, url, width)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters get the error; retrieve it here so it is never reported as unhandled
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _fetch_and_store(self, key: str, url: str, width: int) -> Tuple[bytes, str, str]:
+        sized_url = sized_source_url(url, width)
+        content, content_type = download(sized_url)
+        if content is None and sized_url != url:
+            content, content_type = download(url)
+        if content is None:
+            raise ThumbnailError(502, "Image could not be fetched")
+
+        content, content_type = resize(content, content_type, width)
+        etag = self.put(key, content, content_type)
+        return content, content_type, etag
+
+    def stats(self) -> Dict[str, object]:
+        self._load()
+        with self._lock:
+            return {
+                "files": len(self._index),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "inflight": len(self._inflight),
+                "resizing": Image is not None,
+            }
+
+
+def _etag(content: bytes) -> str:
+    return '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+
+def download(url: str, max_redirects: int = 3) -> Tuple[Optional[bytes], str]:
+    """Fetch an image (size-capped); (None, "") on any failure"""
+    try:
+        with requests.get(
+            url,
+            timeout=THUMB_FETCH_TIMEOUT_S,
+            stream=True,
+            allow_redirects=False,
+            headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"},
+        ) as response:
+            if response.is_redirect and max_redirects > 0:
+                # Follow by hand so every hop passes the host allowlist
+                target = urllib.parse.urljoin(url, response.headers.get("Location", ""))
+                try:
+                    validate_source(target)
+                except ThumbnailError:
+                    return None, ""
+                return download(target, max_redirects - 1)
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if response.status_code != 200 or not content_type.startswith("image/"):
+                return None, ""
+            chunks, size = [], 0
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > MAX_SOURCE_BYTES:
+                    return None, ""
+                chunks.append(chunk)
+            return b"".join(chunks), content_type
+    except requests.RequestException as e:
+        print(f"Thumbnail fetch failed for {url}: {e}")
+        return None, ""
+
+
+def resize(content: bytes, content_type: str, width: int) -> Tuple[bytes, str]:
+    """Downsize to `width` (WebP); originals pass through without Pillow"""
+    if Image is None:
+        if content_type not in _EXTENSIONS:
+            raise ThumbnailError(415, f"Unsupported image type {content_type}")
+        return content, content_type
+
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            if image.width <= 2 and image.height <= 2:
+                # Tracking pixel / lazy-load placeholder
+                raise ThumbnailError(404, "No image")
+            image.thumbnail((width, width))
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+            out = io.BytesIO()
+            image.save(out, format="WEBP", quality=80, method=4)
+            return out.getvalue(), "image/webp"
+    except ThumbnailError:
+        raise
+    except Exception as e:
+        raise ThumbnailError(415, f"Unreadable image: {e}")
+
+
+thumbnail_cache = ThumbnailCache()
+
+
+def thumb_headers(etag: str, content_type: Optional[str] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if content_type:
+        headers["Content-Type"] = content_type
+    return headers
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
@@ -0,0 +1,177 @@
+import re
+import zlib
+from typing import Dict, Iterable, List, Set
+import numpy as np
+
+# Words that say nothing about what kind of product a listing is
+STOPWORDS = {
+    "a", "an", "and", "the", "for", "with", "of", "in", "on", "to", "by", "from",
+    "new", "pack", "set", "combo", "free", "best", "latest", "original", "genuine",
+    "men", "women", "mens", "womens", "kids", "unisex", "size", "color", "colour",
+}
+
+# Colours and units tell variants of one product apart, not kinds of products
+COLOR_WORDS = {
+    "black", "white", "blue", "red", "green", "grey", "gray", "silver", "gold", "pink",
+    "purple", "yellow", "orange", "brown", "beige", "navy", "maroon", "multicolor", "multicolour",
+}
+UNIT_WORDS = {
+    "gb", "tb", "mb", "mm", "cm", "inch", "inches", "ft", "mah", "hz", "ml", "kg",
+    "lb", "lbs", "oz", "pcs", "pc", "ct", "count", "piece", "pieces",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Numbers and quantities with their unit attached ("128", "6mm", "5000mah", "1tb")
+_QUANTITY_RE = re.compile(r"^\d+[a-z]{0,4}$")
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def title_tokens(title: str) -> List[str]:
+    """Lowercased descriptive words of a product title (quantities, colours and stopwords dropped)"""
+    words = _TOKEN_RE.findall((title or "").lower())
+    return [
+        w for w in words
+        if len(w) > 1 and not _QUANTITY_RE.match(w)
+        and w not in STOPWORDS and w not in COLOR_WORDS and w not in UNIT_WORDS
+    ]
+
+
+class TitleClusterer:
+    """
+    Groups comparable products by title similarity using MinHash + LSH.
+
+    Each title becomes a set of words, summarised by a fixed-size MinHash
+    signature. Signatures are split into bands; titles that share a band
+    bucket are candidate neighbours. Titles are assigned in order: each one
+    joins the cluster whose representative (its first member) is most
+    similar, if that similarity clears `threshold`, and otherwise starts a
+    new cluster. Only representatives are compared, so a chain of loosely
+    related titles ("iphone black" ~ "kindle black") cannot merge two kinds
+    of products.
+
+    Similarity is computed exactly on the word sets: the share of the
+    smaller title's words found in the other one, with at least
+    MIN_SHARED_WORDS words in common ("liforme yoga mat" vs "gaiam premium
+    thick yoga mat" = 2/3).
+    """
+
+    # Words two titles must share to be comparable (fewer if a title is that short)
+    MIN_SHARED_WORDS = 2
+
+    def __init__(self, num_perm: int = 32, bands: int = 32, threshold: float = 0.5, seed: int = 7):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    @classmethod
+    def similarity(cls, a: Set[str], b: Set[str]) -> float:
+        """Overlap of two word sets relative to the smaller one; 0 below MIN_SHARED_WORDS"""
+        if not a or not b:
+            return 0.0
+        shared = len(a & b)
+        if shared < min(cls.MIN_SHARED_WORDS, len(a), len(b)):
+            return 0.0
+        return shared / min(len(a), len(b))
+
+    def signature(self, tokens: Iterable[str]) -> np.ndarray:
+        """MinHash signature of a single token set"""
+        return self.signatures([list(tokens)])[0]
+
+    def signatures(self, token_sets: List[List[str]]) -> np.ndarray:
+        """
+        MinHash signatures for many token sets at once, shape (n, num_perm)
+
+        All token hashes are permuted in one array operation and reduced per
+        title; a title with no tokens gets an all-max signature.
+        """
+        n = len(token_sets)
+        result = np.full((n, self.num_perm), _MAX_HASH, dtype=np.uint64)
+
+        hashed = [sorted({zlib.crc32(t.encode("utf-8")) for t in tokens}) for tokens in token_sets]
+        lengths = np.array([len(h) for h in hashed], dtype=np.int64)
+        if not lengths.any():
+            return result
+
+        flat = np.fromiter((h for hs in hashed for h in hs), dtype=np.uint64, count=int(lengths.sum()))
+        # (a * h + b) mod p folded to 32 bits; uint64 wraparound keeps it a valid hash family
+        permuted = (flat[:, None] * self._a[None, :] + self._b[None, :]) % _MERSENNE_PRIME
+        permuted &= _MAX_HASH
+
+        non_empty = lengths > 0
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))[non_empty]
+        result[non_empty] = np.minimum.reduceat(permuted, offsets, axis=0)
+        return result
+
+    def cluster(self, titles: List[str]) -> np.ndarray:
+        """
+        Cluster titles into groups of comparable products
+
+        Returns an int array of cluster labels (0..k-1, in order of first
+        appearance). Titles without descriptive words stay in their own cluster.
+        """
+        n = len(titles)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        token_sets = [title_tokens(t) for t in titles]
+        words = [set(tokens) for tokens in token_sets]
+        signatures = self.signatures(token_sets)
+
+        # Bucket id of every title in every band, shape (n, bands)
+        bands = signatures.reshape(n, self.bands, self.rows)
+        bucket_ids = np.empty((n, self.bands), dtype=np.int64)
+        for band in range(self.bands):
+            band_rows = np.ascontiguousarray(bands[:, band, :])
+            keys = band_rows.view(np.dtype((np.void, band_rows.dtype.itemsize * self.rows))).ravel()
+            bucket_ids[:, band] = np.unique(keys, return_inverse=True)[1].ravel()
+
+        labels = np.empty(n, dtype=np.int64)
+        representatives: List[int] = []
+        # Per band: bucket id -> clusters whose representative is in that bucket
+        buckets: List[Dict[int, List[int]]] = [{} for _ in range(self.bands)]
+
+        for i in range(n):
+            best, best_similarity = None, self.threshold
+            if words[i]:
+                candidates = set()
+                for band, bucket in enumerate(bucket_ids[i].tolist()):
+                    candidates.update(buckets[band].get(bucket, ()))
+                for label in sorted(candidates):
+                    similarity = self.similarity(words[i], words[representatives[label]])
+                    if similarity >= best_similarity and (best is None or similarity > best_similarity):
+                        best, best_similarity = label, similarity
+
+            if best is not None:
+                labels[i] = best
+                continue
+
+            labels[i] = len(representatives)
+            representatives.append(i)
+            if words[i]:
+                for band, bucket in enumerate(bucket_ids[i].tolist()):
+                    buckets[band].setdefault(bucket, []).append(labels[i])
+        return labels
+
+
+_default_clusterer = None
+
+
+def get_clusterer() -> TitleClusterer:
+    """Shared clusterer with the default parameters (hash coefficients built once)"""
+    global _default_clusterer
+    if _default_clusterer is None:
+        _default_clusterer = TitleClusterer()
+    return _default_clusterer
+
+
+def cluster_titles(titles: List[str]) -> np.ndarray:
+    """Cluster labels for a list of product titles"""
+    return get_clusterer().cluster(titles)
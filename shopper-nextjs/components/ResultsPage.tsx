@@ -1,4 +1,5 @@
 import { Product } from '@/lib/types'
+import { thumbnailUrl } from '@/lib/api'
 
 interface ResultsPageProps {
   query: string
@@ -45,10 +46,15 @@ export function ResultsPage({ query, products, analysis, quickNotes, onBack }: R
             <div className="product-image-container">
               {product.image_url ? (
                 <img
-                  src={product.image_url}
+                  src={thumbnailUrl(product.image_url)}
                   alt={product.title}
                   className="product-image"
                   onError={(e) => {
+                    // Proxy unavailable: try the marketplace image once, then the placeholder
+                    if (product.image_url && e.currentTarget.src !== product.image_url) {
+                      e.currentTarget.src = product.image_url
+                      return
+                    }
                     e.currentTarget.src = 'data:image/svg+xml,%3Csvg xmlns="http://www.w3.org/2000/svg" width="200" height="200"%3E%3Crect fill="%23333" width="200" height="200"/%3E%3Ctext fill="%23666" font-family="sans-serif" font-size="14" x="50%25" y="50%25" text-anchor="middle" dominant-baseline="middle"%3ENo Image%3C/text%3E%3C/svg%3E'
                   }}
                 />
@@ -2,6 +2,9 @@ import { SearchResponse, SearchMode, LogEntry } from './types'
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://127.0.0.1:8000'
 
+// Product columns the results page renders; the backend drops the rest
+const PRODUCT_FIELDS = 'title,price,rating,url,image_url,source'
+
 async function getAccessToken(): Promise<string | null> {
   try {
     const response = await fetch('/api/auth/token')
@@ -15,6 +18,11 @@ async function getAccessToken(): Promise<string | null> {
   return null
 }
 
+// Product images go through the backend thumbnail proxy (downsized, cached, ETag'd)
+export function thumbnailUrl(imageUrl: string, width: number = 320): string {
+  return `${API_BASE_URL}/thumb?url=${encodeURIComponent(imageUrl)}&w=${width}`
+}
+
 export async function searchProducts(
   query: string,
   location: string = 'india',
@@ -28,7 +36,7 @@ export async function searchProducts(
     headers['Authorization'] = `Bearer ${token}`
   }
 
-  const response = await fetch(`${API_BASE_URL}/search`, {
+  const response = await fetch(`${API_BASE_URL}/search?fields=${PRODUCT_FIELDS}`, {
     method: 'POST',
     headers,
     body: JSON.stringify({ query, marketplace: location, mode }),
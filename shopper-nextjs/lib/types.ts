@@ -11,6 +11,7 @@ export interface SearchResponse {
   products: Product[]
   analysis: string
   quick_notes?: string
+  unavailable_sources?: string[]
 }
 
 export interface LogEntry {